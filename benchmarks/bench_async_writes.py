@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark of the series write modes against a local mongod
+
+Compare:
+
+- sync: process_series_data() - one find + one bulk_write per bulk_size
+- gevent-series: old async mode - one greenlet, find_one and insert/update
+  per series
+- gevent-batch: process_series_data_async() - batches of bulk_size in
+  concurrent greenlets
+- pipeline: process_series_data_pipeline() - writer threads
+
+Each mode run twice: first load (inserts) and update (all series changed).
+Round-trips are counted with a pymongo command listener.
+
+    python benchmarks/bench_async_writes.py
+    python benchmarks/bench_async_writes.py --series 20000 --obs 100 --writers 4
+"""
+
+from gevent.monkey import patch_all
+patch_all()
+
+import argparse
+from copy import deepcopy
+from datetime import datetime
+import logging
+import time
+
+import pymongo
+from pymongo import monitoring
+from gevent.pool import Pool
+
+from dlstats import constants
+from dlstats.fetchers._commons import (Fetcher, Datasets, Series,
+                                       SeriesIterator, series_digest,
+                                       series_update)
+
+RELEASE_DATE = datetime(2015, 1, 1)
+
+class CommandCounter(monitoring.CommandListener):
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+COUNTER = CommandCounter()
+
+class BenchSeriesIterator(SeriesIterator):
+
+    def __init__(self, dataset, series_list):
+        super().__init__(dataset)
+        self.series_list = series_list
+        self.rows = ((deepcopy(row), None) for row in self.series_list)
+
+    def build_series(self, bson):
+        return bson
+
+def build_series_list(count, obs, value="1.0"):
+    series_list = []
+    for i in range(count):
+        values = []
+        for ordinal in range(obs):
+            values.append({"period": str(1970 + ordinal),
+                           "ordinal": ordinal,
+                           "value": value,
+                           "release_date": RELEASE_DATE,
+                           "attributes": None})
+        series_list.append({
+            "provider_name": "BENCH",
+            "dataset_code": "d1",
+            "name": "series %s" % i,
+            "key": "key%s" % i,
+            "slug": "bench-d1-key%s" % i,
+            "start_date": 0,
+            "end_date": obs - 1,
+            "values": values,
+            "attributes": None,
+            "dimensions": {"Country": "C%s" % i},
+            "frequency": "A",
+        })
+    return series_list
+
+class GeventSeries(Series):
+    """Previous async mode: one greenlet per series"""
+
+    def process_series_data_async(self):
+        pool = Pool(100)
+        try:
+            while True:
+                try:
+                    data = next(self.data_iterator)
+                except StopIteration:
+                    break
+                if self.accept_series_data(data):
+                    pool.spawn(self.update_series_async, data)
+        finally:
+            pool.join()
+            self.update_dataset_lists_finalize()
+
+    def update_series_async(self, data):
+        col = self.fetcher.db[constants.COL_SERIES]
+        query = {'provider_name': self.provider_name,
+                 'dataset_code': self.dataset_code,
+                 'key': data["key"]}
+        old_bson = col.find_one(query, {"tags": False})
+        data['digest'] = series_digest(data)
+        if not old_bson:
+            col.insert_one(series_update(data, last_update=self.last_update))
+            return
+        bson = series_update(data, old_bson=old_bson,
+                             last_update=self.last_update)
+        if bson:
+            col.update_one({'_id': old_bson['_id']},
+                           {'$set': {"values": bson["values"],
+                                     "digest": bson["digest"]}})
+
+def run(db, mode, series_list, args):
+    async_framework = "pipeline" if mode == "pipeline" else "gevent"
+    f = Fetcher(provider_name="BENCH", db=db, is_indexes=False,
+                async_mode=mode != "sync",
+                async_framework=async_framework,
+                pipeline_writers=args.writers)
+    d = Datasets(provider_name="BENCH", dataset_code="d1", name="d1",
+                 last_update=datetime.now(), fetcher=f,
+                 is_load_previous_version=False)
+    klass = GeventSeries if mode == "gevent-series" else Series
+    s = klass(dataset=d, provider_name="BENCH", dataset_code="d1",
+              last_update=datetime.now(), bulk_size=args.bulk_size,
+              fetcher=f)
+    s.data_iterator = BenchSeriesIterator(d, series_list)
+
+    count = COUNTER.count
+    start = time.perf_counter()
+    if mode == "sync":
+        s.process_series_data()
+    elif mode == "pipeline":
+        s.process_series_data_pipeline()
+    else:
+        s.process_series_data_async()
+    end = time.perf_counter() - start
+    return end, COUNTER.count - count
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mongo-url", default="mongodb://localhost/dlstats_bench")
+    parser.add_argument("--series", type=int, default=5000)
+    parser.add_argument("--obs", type=int, default=50)
+    parser.add_argument("--bulk-size", type=int, default=500)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--modes", nargs="+",
+                        default=["sync", "gevent-series", "gevent-batch",
+                                 "pipeline"])
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    client = pymongo.MongoClient(args.mongo_url, event_listeners=[COUNTER])
+    db = client.get_default_database()
+
+    first_list = build_series_list(args.series, args.obs)
+    update_list = build_series_list(args.series, args.obs, value="2.0")
+
+    fmt = "{0:>14} | {1:>8} | {2:>10} | {3:>12} | {4:>14}"
+    print(fmt.format("Mode", "Step", "Time (s)", "Round-trips", "Series/s"))
+    for mode in args.modes:
+        db[constants.COL_SERIES].drop()
+        db[constants.COL_SERIES].create_index([("provider_name", 1),
+                                               ("dataset_code", 1),
+                                               ("key", 1)], unique=True)
+        for step, series_list in [("load", first_list),
+                                  ("update", update_list)]:
+            duration, trips = run(db, mode, series_list, args)
+            print(fmt.format(mode, step, "%.3f" % duration, trips,
+                             "%.0f" % (len(series_list) / duration)))
+
+    db[constants.COL_SERIES].drop()
+
+if __name__ == "__main__":
+    main()
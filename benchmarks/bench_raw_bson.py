@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark of the RawBSONDocument encoding stage (Fetcher.raw_bson)
+
+encode: without mongod, CPU time of the write path for one batch:
+
+- dict: documents encoded by the writer (BSON of the insert command)
+- raw: documents encoded by prepare_series_bulk() (encoder stage), the
+  writer only copy the bytes in the insert command
+
+pipeline: with --mongo-url, process_series_data_pipeline() with and
+without raw_bson against a local mongod: first load (inserts) and update
+(all series changed).
+
+The bson C extension hold the GIL: encoder threads do not encode in
+parallel with the parser, the gain is a write path limited to the copy of
+the bytes while the encoders prepare the next batches.
+
+    python benchmarks/bench_raw_bson.py
+    python benchmarks/bench_raw_bson.py --series 20000 --obs 100
+    python benchmarks/bench_raw_bson.py --mongo-url mongodb://localhost/dlstats_bench
+"""
+
+import argparse
+from copy import deepcopy
+from datetime import datetime
+import logging
+import time
+
+from bson import BSON
+import pymongo
+
+from dlstats import constants
+from dlstats.fetchers._commons import (Fetcher, Datasets, Series,
+                                       SeriesIterator)
+
+RELEASE_DATE = datetime(2015, 1, 1)
+
+class BenchSeriesIterator(SeriesIterator):
+
+    def __init__(self, dataset, series_list):
+        super().__init__(dataset)
+        self.series_list = series_list
+        self.rows = ((deepcopy(row), None) for row in self.series_list)
+
+    def build_series(self, bson):
+        return bson
+
+def build_series_list(count, obs, value="1.0"):
+    series_list = []
+    for i in range(count):
+        values = []
+        for ordinal in range(obs):
+            values.append({"period": str(1970 + ordinal),
+                           "ordinal": ordinal,
+                           "value": value,
+                           "release_date": RELEASE_DATE,
+                           "attributes": None})
+        series_list.append({
+            "provider_name": "BENCH",
+            "dataset_code": "d1",
+            "name": "series %s" % i,
+            "key": "key%s" % i,
+            "slug": "bench-d1-key%s" % i,
+            "start_date": 0,
+            "end_date": obs - 1,
+            "start_ts": datetime(1970, 1, 1),
+            "end_ts": datetime(1970 + obs - 1, 12, 31, 23, 59, 59),
+            "values": values,
+            "attributes": None,
+            "dimensions": {"Country": "C%s" % i},
+            "frequency": "A",
+        })
+    return series_list
+
+def create_series(db, raw_bson, args):
+    f = Fetcher(provider_name="BENCH", db=db, is_indexes=False,
+                async_mode=True, async_framework="pipeline",
+                pipeline_writers=args.writers, raw_bson=raw_bson)
+    d = Datasets(provider_name="BENCH", dataset_code="d1", name="d1",
+                 last_update=datetime.now(), fetcher=f,
+                 is_load_previous_version=False)
+    return Series(dataset=d, provider_name="BENCH", dataset_code="d1",
+                  last_update=datetime.now(), bulk_size=args.bulk_size,
+                  fetcher=f)
+
+def bench_encode(series_list, args):
+    """Seconds of prepare (encoder) and of command encoding (writer)"""
+    results = {}
+    for raw_bson in [False, True]:
+        s = create_series(None, raw_bson, args)
+        s.series_keys = {}
+        prepare = write = 0.0
+        for i in range(0, len(series_list), args.bulk_size):
+            batch = deepcopy(series_list[i:i + args.bulk_size])
+            start = time.perf_counter()
+            bulk = s.prepare_series_bulk(batch)
+            prepare += time.perf_counter() - start
+
+            start = time.perf_counter()
+            BSON.encode({"insert": constants.COL_SERIES,
+                         "documents": [r._doc for r in bulk["requests"]]})
+            write += time.perf_counter() - start
+        results[raw_bson] = (prepare, write)
+    return results
+
+def bench_pipeline(db, series_list, raw_bson, args):
+    s = create_series(db, raw_bson, args)
+    s.data_iterator = BenchSeriesIterator(s.dataset, series_list)
+    start = time.perf_counter()
+    s.process_series_data_pipeline()
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mongo-url")
+    parser.add_argument("--series", type=int, default=5000)
+    parser.add_argument("--obs", type=int, default=50)
+    parser.add_argument("--bulk-size", type=int, default=500)
+    parser.add_argument("--writers", type=int, default=4)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    first_list = build_series_list(args.series, args.obs)
+    update_list = build_series_list(args.series, args.obs, value="2.0")
+
+    fmt = "{0:>8} | {1:>12} | {2:>12} | {3:>16}"
+    print(fmt.format("Mode", "Prepare (s)", "Write (s)", "Write series/s"))
+    for raw_bson, (prepare, write) in sorted(bench_encode(first_list, args).items()):
+        print(fmt.format("raw" if raw_bson else "dict", "%.3f" % prepare,
+                         "%.3f" % write, "%.0f" % (len(first_list) / write)))
+
+    if not args.mongo_url:
+        return
+
+    client = pymongo.MongoClient(args.mongo_url)
+    db = client.get_default_database()
+
+    print()
+    fmt = "{0:>8} | {1:>8} | {2:>10} | {3:>10}"
+    print(fmt.format("Mode", "Step", "Time (s)", "Series/s"))
+    for raw_bson in [False, True]:
+        db[constants.COL_SERIES].drop()
+        db[constants.COL_SERIES].create_index([("provider_name", 1),
+                                               ("dataset_code", 1),
+                                               ("key", 1)], unique=True)
+        for step, series_list in [("load", first_list),
+                                  ("update", update_list)]:
+            duration = bench_pipeline(db, series_list, raw_bson, args)
+            print(fmt.format("raw" if raw_bson else "dict", step,
+                             "%.3f" % duration,
+                             "%.0f" % (len(series_list) / duration)))
+
+    db[constants.COL_SERIES].drop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark of the series revisions engines
+
+Compare the groupby implementation with the columnar implementation
+on synthetic series.
+
+    python benchmarks/bench_revisions.py
+    python benchmarks/bench_revisions.py --sizes 10000 100000 --ratio 0.05
+"""
+
+import argparse
+from copy import deepcopy
+from datetime import datetime
+import gc
+import random
+import time
+
+from dlstats.fetchers._commons import _revisions_groupby, _revisions_columnar
+
+RELEASE_DATE = datetime(2015, 1, 1)
+LAST_UPDATE = datetime(2016, 1, 1)
+
+def build_values(size, offset=0, ratio=0.0, seed=0):
+    rnd = random.Random(seed)
+    values = []
+    for ordinal in range(offset, offset + size):
+        value = "1.0"
+        attributes = None
+        if ratio and rnd.random() < ratio:
+            value = "2.0"
+        if ratio and rnd.random() < ratio:
+            attributes = {"obs-status": "e"}
+        values.append({"period": str(ordinal), 
+                       "ordinal": ordinal, 
+                       "value": value,
+                       "release_date": RELEASE_DATE,
+                       "attributes": attributes})
+    return values
+
+def run(func, old_values, new_values, repeat):
+    best = None
+    for i in range(repeat):
+        _old = deepcopy(old_values)
+        _new = deepcopy(new_values)
+        gc.disable()
+        start = time.perf_counter()
+        func(_new, _old, LAST_UPDATE)
+        end = time.perf_counter() - start
+        gc.enable()
+        if best is None or end < best:
+            best = end
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", 
+                        default=[10000, 50000, 100000])
+    parser.add_argument("--ratio", type=float, default=0.01,
+                        help="ratio of revised observations")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    fmt = "{0:>10} | {1:>12} | {2:>12} | {3:>8}"
+    print(fmt.format("Obs", "groupby (s)", "columnar (s)", "speedup"))
+    for size in args.sizes:
+        old_values = build_values(size)
+        '''overlap on 90% and 10% of new observations'''
+        new_values = build_values(size, offset=size // 10, 
+                                  ratio=args.ratio, seed=size)
+
+        result1 = _revisions_groupby(deepcopy(new_values), 
+                                     deepcopy(old_values), LAST_UPDATE)
+        result2 = _revisions_columnar(deepcopy(new_values), 
+                                      deepcopy(old_values), LAST_UPDATE)
+        if result1 != result2:
+            raise Exception("results differ for size[%s]" % size)
+
+        t1 = run(_revisions_groupby, old_values, new_values, args.repeat)
+        t2 = run(_revisions_columnar, old_values, new_values, args.repeat)
+        print(fmt.format(size, "%.4f" % t1, "%.4f" % t2, "%.1fx" % (t1 / t2)))
+
+if __name__ == "__main__":
+    main()
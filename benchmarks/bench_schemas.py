@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark of the series validation backends
+
+Validate the same series with schemas.series_schema (voluptuous) and
+schemas.series_schema_compiled and print the cost by observation.
+
+    python benchmarks/bench_schemas.py
+    python benchmarks/bench_schemas.py --series 500 --obs 200 --revisions 2
+"""
+
+import argparse
+from datetime import datetime
+import time
+
+from dlstats.fetchers import schemas
+
+RELEASE_DATE = datetime(2015, 1, 1)
+
+def build_series_list(count, obs, revisions=0):
+    series_list = []
+    for i in range(count):
+        values = []
+        for ordinal in range(obs):
+            value = {"period": str(1970 + ordinal),
+                     "ordinal": ordinal,
+                     "value": "1.0",
+                     "release_date": RELEASE_DATE,
+                     "attributes": None}
+            if revisions:
+                value["revisions"] = [{"value": "0.%s" % r,
+                                       "attributes": None,
+                                       "revision_date": RELEASE_DATE}
+                                      for r in range(revisions)]
+            values.append(value)
+        series_list.append({
+            "provider_name": "BENCH",
+            "dataset_code": "d1",
+            "name": "series %s" % i,
+            "key": "key%s" % i,
+            "slug": "bench-d1-key%s" % i,
+            "start_date": 0,
+            "end_date": obs - 1,
+            "start_ts": datetime(1970, 1, 1),
+            "end_ts": datetime(1970 + obs - 1, 12, 31),
+            "values": values,
+            "attributes": None,
+            "dimensions": {"Country": "C%s" % i},
+            "frequency": "A",
+        })
+    return series_list
+
+def run(validator, series_list, repeat):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        for bson in series_list:
+            validator(bson)
+        end = time.perf_counter() - start
+        if best is None or end < best:
+            best = end
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--series", type=int, default=200)
+    parser.add_argument("--obs", type=int, default=100)
+    parser.add_argument("--revisions", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    series_list = build_series_list(args.series, args.obs, args.revisions)
+    count_obs = args.series * args.obs
+
+    fmt = "{0:>12} | {1:>10} | {2:>14} | {3:>8}"
+    print(fmt.format("Backend", "Time (s)", "us/observation", "Speedup"))
+    reference = None
+    for backend in schemas.SCHEMAS_VALIDATION_BACKENDS:
+        validator = schemas.get_series_validator(backend)
+        duration = run(validator, series_list, args.repeat)
+        reference = reference or duration
+        print(fmt.format(backend, "%.3f" % duration,
+                         "%.2f" % (duration * 1000000 / count_obs),
+                         "%.1fx" % (reference / duration)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark of the memoized slug service
+
+Replay the slugify() calls made by SeriesIterator.clean_field for the
+series dimensions and attributes of the eurostat nama_10_fcs sample
+(dlstats/tests/resources/eurostat) with slugify and with dlstats.slugs.
+
+    python benchmarks/bench_slugify.py
+    python benchmarks/bench_slugify.py --repeat 5 --loops 10
+"""
+
+import argparse
+import os
+import time
+import zipfile
+
+from lxml import etree
+from slugify import slugify
+
+from dlstats import slugs
+
+RESOURCES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                             "..", "dlstats", "tests",
+                                             "resources", "eurostat"))
+
+DEFAULT_FILEPATH = os.path.join(RESOURCES_DIR, "nama_10_fcs.sdmx.zip")
+
+def load_words(filepath):
+    """Return the list of keys and values of series and observations
+    attributes, in order"""
+    words = []
+    with zipfile.ZipFile(filepath) as zf:
+        filename = [name for name in zf.namelist() if name.endswith(".sdmx.xml")][0]
+        with zf.open(filename) as fp:
+            for event, element in etree.iterparse(fp, events=("end",)):
+                localname = etree.QName(element.tag).localname
+                if localname == "Series":
+                    for key, value in element.attrib.items():
+                        words.extend([key, value])
+                    element.clear()
+                elif localname == "Obs":
+                    for key, value in element.attrib.items():
+                        if not key in ["TIME_PERIOD", "OBS_VALUE"]:
+                            words.extend([key, value])
+    return words
+
+def run(func, words, repeat, loops):
+    best = None
+    for i in range(repeat):
+        slugs.configure_slug_cache()
+        start = time.perf_counter()
+        for j in range(loops):
+            for word in words:
+                func(word)
+        end = time.perf_counter() - start
+        if best is None or end < best:
+            best = end
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--filepath", default=DEFAULT_FILEPATH)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--loops", type=int, default=1,
+                        help="number of replays of the sample by run")
+    args = parser.parse_args()
+
+    words = load_words(args.filepath)
+    print("calls[%s] - distinct values[%s]" % (len(words) * args.loops,
+                                               len(set(words))))
+
+    slugify_time = run(lambda w: slugify(w, save_order=True), words,
+                       args.repeat, args.loops)
+    slug_time = run(slugs.slug, words, args.repeat, args.loops)
+
+    print("%-12s %10.3f seconds" % ("slugify", slugify_time))
+    print("%-12s %10.3f seconds" % ("slugs.slug", slug_time))
+    print("speedup      %10.1fx" % (slugify_time / slug_time))
+    print("cache stats  %s" % slugs.get_stats())
+
+if __name__ == "__main__":
+    main()
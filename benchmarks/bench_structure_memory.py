@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+"""Peak memory of SDMX 2.1 structure parsing
+
+Parse a structure file with XMLStructure_2_1, with and without the
+streaming mode, each in a new python process, and print the peak RSS.
+
+Without --filepath, a large structure file is built from the ECB sample
+(dlstats/tests/resources/xmlutils/ecb/ecb-datastructure-2.1.xml): its
+schemes and structures are copied --scale times, like a references=all
+response.
+
+Codes are already cleared by process_codelist() in both modes: the gain of
+the streaming mode is the elements not cleared by the handlers (Concept,
+Category, Agency...) and the unprocessed children of message:Structures.
+
+    python benchmarks/bench_structure_memory.py
+    python benchmarks/bench_structure_memory.py --scale 200
+    python benchmarks/bench_structure_memory.py --filepath dsd-EXR.xml --provider ECB
+"""
+
+import argparse
+from copy import deepcopy
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from lxml import etree
+
+RESOURCES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                             "..", "dlstats", "tests",
+                                             "resources", "xmlutils"))
+
+DEFAULT_FILEPATH = os.path.join(RESOURCES_DIR, "ecb", "ecb-datastructure-2.1.xml")
+
+NS_MES = "http://www.sdmx.org/resources/sdmxml/schemas/v2_1/message"
+NS_STR = "http://www.sdmx.org/resources/sdmxml/schemas/v2_1/structure"
+
+def build_file(filepath, scale):
+    """Copy scale times the schemes and structures of each child of
+    message:Structures (Codelists, Concepts, DataStructures...)"""
+    tree = etree.parse(filepath)
+    for container in tree.find(".//{%s}Structures" % NS_MES):
+        originals = list(container)
+        for i in range(1, scale):
+            for item in originals:
+                copy = deepcopy(item)
+                if container.tag == "{%s}Codelists" % NS_STR:
+                    copy.attrib["id"] = "%s_%s" % (item.attrib["id"], i)
+                container.append(copy)
+
+    fd, path = tempfile.mkstemp(suffix=".xml")
+    os.close(fd)
+    tree.write(path, xml_declaration=True, encoding="UTF-8")
+    return path
+
+def peak_rss_kb():
+    """VmHWM of the process - ru_maxrss keep the peak of the parent
+    process after fork/exec"""
+    try:
+        with open("/proc/self/status") as fp:
+            for line in fp:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except IOError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def child(filepath, provider_name, streaming):
+    from dlstats.xml_utils import XMLStructure_2_1
+
+    start = time.perf_counter()
+    xml = XMLStructure_2_1(provider_name=provider_name, streaming=streaming)
+    xml.process(filepath)
+    end = time.perf_counter() - start
+
+    peak_kb = peak_rss_kb()
+    print("%s %s %s %.3f" % (peak_kb, len(xml.codelists), len(xml.concepts), end))
+
+def run(filepath, provider_name, streaming):
+    cmd = [sys.executable, os.path.abspath(__file__), "--child",
+           "--filepath", filepath, "--provider", provider_name]
+    if streaming:
+        cmd.append("--streaming")
+    output = subprocess.check_output(cmd, universal_newlines=True)
+    peak_kb, codelists, concepts, seconds = output.strip().splitlines()[-1].split()
+    return int(peak_kb), int(codelists), int(concepts), float(seconds)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--filepath")
+    parser.add_argument("--provider", default="ECB")
+    parser.add_argument("--scale", type=int, default=100,
+                        help="copies of the structures of the ECB sample")
+    parser.add_argument("--streaming", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.filepath, args.provider, args.streaming)
+        return
+
+    filepath = args.filepath
+    if not filepath:
+        filepath = build_file(DEFAULT_FILEPATH, args.scale)
+
+    try:
+        print("file[%s] - size[%.1f MB]" % (filepath, os.path.getsize(filepath) / 1024 / 1024))
+        fmt = "%-10s %14s %10s %10s %10s"
+        print(fmt % ("mode", "peak RSS (MB)", "codelists", "concepts", "seconds"))
+        for streaming in [False, True]:
+            peak_kb, codelists, concepts, seconds = run(filepath, args.provider, streaming)
+            print(fmt % ("streaming" if streaming else "tree",
+                         "%.1f" % (peak_kb / 1024), codelists, concepts,
+                         "%.3f" % seconds))
+    finally:
+        if not args.filepath:
+            os.remove(filepath)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark of the XML data parsing loop
+
+For each DATA_* sample of dlstats/tests/resources/xml_samples.py, compare
+the events loop of XMLDataBase.process():
+
+- before: iterparse of all elements and series tag built (fixtag) or
+  QName instance created for each end event
+- after: tag filtered iterparse (ITERPARSE_TAG) and series tag computed
+  once by is_series_tag()
+
+Events/second is the count of events of the whole document (loop before)
+by second for both loops: the filtered loop receive only a few of them.
+
+    python benchmarks/bench_xml_parse.py
+    python benchmarks/bench_xml_parse.py --repeat 5 --samples DATA_EUROSTAT
+"""
+
+import argparse
+import time
+
+from lxml import etree
+
+from dlstats import xml_utils
+from dlstats.tests.resources import xml_samples
+
+DEFAULT_SAMPLES = [name for name in dir(xml_samples) if name.startswith("DATA_")]
+
+def is_localname_klass(xml):
+    return type(xml).is_series_tag is not xml_utils.XMLDataBase.is_series_tag
+
+def loop_before(xml, filepath):
+    tree_iterator = etree.iterparse(filepath, events=['end', 'start-ns'])
+    nsmap = xml_utils.get_nsmap(tree_iterator)
+    by_localname = is_localname_klass(xml)
+    events = 0
+    for event, element in tree_iterator:
+        events += 1
+        if event == 'end':
+            if by_localname:
+                etree.QName(element.tag).localname == 'Series'
+            else:
+                element.tag == '{' + nsmap[xml.ns_tag_data] + '}' + 'Series'
+    return events
+
+def loop_after(xml, filepath):
+    xml._load_data(filepath)
+    events = 0
+    for event, element in xml.tree_iterator:
+        events += 1
+        if event == 'end':
+            xml.is_series_tag(element)
+    return events
+
+def run(func, xml, filepath, repeat):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        events = func(xml, filepath)
+        end = time.perf_counter() - start
+        if best is None or end < best:
+            best = end
+    return events, best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--samples", nargs="+", default=DEFAULT_SAMPLES)
+    args = parser.parse_args()
+
+    fmt = "%-20s %-8s %14s %10s %14s"
+    print(fmt % ("sample", "loop", "python events", "seconds", "events/second"))
+
+    for name in args.samples:
+        sample = getattr(xml_samples, name)
+        klass = xml_utils.XML_STRUCTURE_KLASS[sample["klass"]]
+        try:
+            xml = klass(**sample["kwargs"])
+        except Exception as err:
+            print("%-20s skipped - error[%s]" % (name, err))
+            continue
+
+        filepath = sample["filepath"]
+        document_events = None
+        for label, func in [("before", loop_before), ("after", loop_after)]:
+            events, seconds = run(func, xml, filepath, args.repeat)
+            document_events = document_events or events
+            print(fmt % (name, label, events, "%.3f" % seconds,
+                         "%.0f" % (document_events / seconds)))
+
+if __name__ == "__main__":
+    main()
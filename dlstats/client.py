@@ -73,6 +73,32 @@ opt_requests_cache_expire = click.option('--requests-cache-expire',
                                 type=int, 
                                 help='Requests cache expire. default 4 hours. 0 for disabled')
 
+opt_download_cache_path = click.option('--download-cache-path', 
+                               type=click.Path(exists=False),
+                               help='Enable download cache (conditional GET) in this path')
+
+opt_download_cache_max_size = click.option('--download-cache-max-size', 
+                                default=10 * 1024, 
+                                type=int, 
+                                show_default=True,
+                                help='Download cache max size (MB)')
+
+opt_download_cache_max_age = click.option('--download-cache-max-age', 
+                                default=30, 
+                                type=int, 
+                                show_default=True,
+                                help='Download cache max age (days) of unused files')
+
+opt_structure_cache_path = click.option('--structure-cache-path', 
+                               type=click.Path(exists=False),
+                               help='Enable cache of parsed SDMX structures (DSD, codelists) in this path')
+
+opt_structure_cache_size = click.option('--structure-cache-size', 
+                                default=100, 
+                                type=int, 
+                                show_default=True,
+                                help='Structures kept in memory')
+
 cmd_folder = os.path.abspath(
                     os.path.join(os.path.dirname(__file__), 'commands'))
 
@@ -82,6 +108,9 @@ class Context(object):
                  cache_enable=False,  
                  requests_cache_enable=None, requests_cache_path=None, 
                  requests_cache_expire=None,               
+                 download_cache_path=None, download_cache_max_size=None,
+                 download_cache_max_age=None,
+                 structure_cache_path=None, structure_cache_size=None,
                  debug=False, silent=False, pretty=False, quiet=False):
 
         self.mongo_url = mongo_url
@@ -97,6 +126,13 @@ class Context(object):
         self.requests_cache_path = requests_cache_path
         self.requests_cache_expire = requests_cache_expire
         
+        self.download_cache_path = download_cache_path
+        self.download_cache_max_size = download_cache_max_size
+        self.download_cache_max_age = download_cache_max_age
+        
+        self.structure_cache_path = structure_cache_path
+        self.structure_cache_size = structure_cache_size
+        
         self.log_level = log_level
         self.log_config = log_config
         self.log_file = log_file
@@ -122,6 +158,12 @@ class Context(object):
         if self.requests_cache_enable:
             self._set_requests_cache()
 
+        if self.download_cache_path:
+            self._set_download_cache()
+
+        if self.structure_cache_path:
+            self._set_structure_cache()
+
     def _set_log_file(self):
         from logging import FileHandler
         handler = FileHandler(filename=self.log_file)
@@ -133,6 +175,24 @@ class Context(object):
         from dlstats import cache
         cache.configure_cache(cache_url=CACHE_URL)
             
+    def _set_download_cache(self):
+        from dlstats import download_cache
+        cache_settings = {"cache_path": self.download_cache_path}
+        if self.download_cache_max_size:
+            cache_settings["max_size"] = self.download_cache_max_size * 1024 * 1024
+        if self.download_cache_max_age:
+            cache_settings["max_age"] = self.download_cache_max_age * 24 * 60 * 60
+        download_cache.configure_download_cache(**cache_settings)
+        self.log("Use download cache in %s" % self.download_cache_path)
+
+    def _set_structure_cache(self):
+        from dlstats import structure_cache
+        cache_settings = {"cache_path": self.structure_cache_path}
+        if self.structure_cache_size:
+            cache_settings["maxsize"] = self.structure_cache_size
+        structure_cache.configure_structure_cache(**cache_settings)
+        self.log("Use structure cache in %s" % self.structure_cache_path)
+            
     def _set_requests_cache(self):
 
         cache_settings = {
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+import sys
 import time
 from operator import itemgetter
 import click
@@ -9,6 +10,7 @@ from widukind_common.tasks import consolidate
 
 from dlstats import constants
 from dlstats.fetchers import FETCHERS
+from dlstats.fetchers import report
 from dlstats import client
 from dlstats.utils import last_error
 
@@ -32,6 +34,10 @@ opt_async_mode = click.option('--async-mode',
               type=click.Choice(["gevent"]), 
               help='Async mode choice')
 
+opt_async_mode_run = click.option('--async-mode', 
+              type=click.Choice(["gevent", "pipeline"]), 
+              help='Async mode choice')
+
 
 @click.group()
 def cli():
@@ -90,6 +96,9 @@ def cmd_dataset_list(fetcher, **kwargs):
 @client.opt_requests_cache_enable
 @client.opt_requests_cache_path
 @client.opt_requests_cache_expire
+@client.opt_download_cache_path
+@client.opt_download_cache_max_size
+@client.opt_download_cache_max_age
 @click.option('--use-files', is_flag=True,
               help='Use existing files in tmpdir')
 @click.option('--not-remove', is_flag=True,
@@ -203,6 +212,11 @@ def cmd_calendar(fetcher=None, update=False, **kwargs):
 @client.opt_requests_cache_enable
 @client.opt_requests_cache_path
 @client.opt_requests_cache_expire
+@client.opt_download_cache_path
+@client.opt_download_cache_max_size
+@client.opt_download_cache_max_age
+@client.opt_structure_cache_path
+@client.opt_structure_cache_size
 @click.option('--max-errors', '-M', default=5, type=int, 
               show_default=True, help='Max errors accepted.')
 @click.option('--datatree', is_flag=True,
@@ -211,12 +225,36 @@ def cmd_calendar(fetcher=None, update=False, **kwargs):
               help='Use existing files in tmpdir')
 @click.option('--not-remove', is_flag=True,
               help='Not remove files after process')
+@click.option('--workers', '-w', default=1, type=int, 
+              show_default=True, 
+              help='Number of processes for load datasets in parallel.')
+@click.option('--pipeline-writers', default=2, type=int, 
+              show_default=True, 
+              help='Number of writer threads for --async-mode pipeline.')
+@click.option('--download-workers', default=4, type=int, 
+              show_default=True, 
+              help='Number of concurrent downloads of dataset slices.')
+@click.option('--bulk-adaptive', is_flag=True,
+              help='Adapt size of series bulks to documents size and latency.')
+@click.option('--compact-values', is_flag=True,
+              help='Write series values with the compact layout.')
+@click.option('--revisions-storage', 
+              type=click.Choice(['inline', 'collection']),
+              default='inline', show_default=True,
+              help='Store revisions in observations or in series_revisions collection.')
+@click.option('--delta-updates', is_flag=True,
+              help='Update only changed or appended observations of series.')
+@click.option('--raw-bson', is_flag=True,
+              help='Encode series to BSON before bulk writes (encoder threads with --async-mode pipeline).')
 @opt_fetcher
-@opt_async_mode
+@opt_async_mode_run
 @opt_dataset_multiple
 def cmd_run(fetcher=None, dataset=None, 
             max_errors=0, datatree=False, async_mode=None, 
-            use_files=False, not_remove=False, **kwargs):
+            use_files=False, not_remove=False, workers=1, 
+            pipeline_writers=2, bulk_adaptive=False, download_workers=4, 
+            compact_values=False, revisions_storage="inline", 
+            delta_updates=False, raw_bson=False, **kwargs):
     """Run Fetcher - All datasets or selected dataset"""
 
     ctx = client.Context(**kwargs)
@@ -226,14 +264,24 @@ def cmd_run(fetcher=None, dataset=None,
     if ctx.silent or click.confirm('Do you want to continue?', abort=True):
         
         _async_mode = False
-        if async_mode and async_mode == "gevent":
+        if async_mode in ["gevent", "pipeline"]:
             _async_mode = True
         
         f = FETCHERS[fetcher](db=ctx.mongo_database(),
                               max_errors=max_errors,
                               use_existing_file=use_files,
                               not_remove_files=not_remove,
-                              async_mode=_async_mode)
+                              async_mode=_async_mode,
+                              async_framework=async_mode or "gevent",
+                              pipeline_writers=pipeline_writers,
+                              bulk_adaptive=bulk_adaptive,
+                              download_workers=download_workers,
+                              compact_values=compact_values,
+                              revisions_storage=revisions_storage,
+                              delta_updates=delta_updates,
+                              raw_bson=raw_bson,
+                              workers=workers,
+                              mongo_url=ctx.mongo_url)
         
         if not dataset and not hasattr(f, "upsert_all_datasets"):
             ctx.log_error("upsert_all_datasets method is not implemented for this fetcher.")
@@ -244,7 +292,10 @@ def cmd_run(fetcher=None, dataset=None,
         if datatree:
             f.upsert_data_tree(force_update=True)
         
-        if dataset:
+        if dataset and workers > 1:
+            f.provider_verify()
+            f.run_datasets(list(dataset))
+        elif dataset:
             for ds in dataset:
                 f.wrap_upsert_dataset(ds)
         else:
@@ -253,13 +304,26 @@ def cmd_run(fetcher=None, dataset=None,
         #TODO: lock commun avec tasks ?
 
 #TODO: multi include/exclude fetcher        
-#TODO: options sort by: series, provider, dataset + asc/desc
 #TODO: categories
-#TODO: option pretty pour sortie json
 @cli.command('report', context_settings=client.DLSTATS_SETTINGS)
 @client.opt_mongo_url
 @opt_fetcher_not_required
-def cmd_report(fetcher=None, **kwargs):
+@click.option('--format', 'output_format',
+              type=click.Choice(["table", "json", "csv"]),
+              default="table", show_default=True,
+              help='Output format')
+@click.option('--sort',
+              type=click.Choice(sorted(report.REPORT_SORTS.keys())),
+              default="provider", show_default=True,
+              help='Sort by')
+@click.option('--desc', is_flag=True,
+              help='Descending sort')
+@click.option('--pretty', is_flag=True,
+              help='Indent json output')
+@click.option('--stored-counts', is_flag=True,
+              help='Use series count stored in datasets')
+def cmd_report(fetcher=None, output_format="table", sort="provider", 
+               desc=False, pretty=False, stored_counts=False, **kwargs):
     """Fetchers report"""
         
     """
@@ -275,36 +339,16 @@ def cmd_report(fetcher=None, **kwargs):
     """
     ctx = client.Context(**kwargs)
     db = ctx.mongo_database()
-    fmt = "{0:10} | {1:4} | {2:30} | {3:10} | {4:15} | {5:20} | {6:20}"
-    print("---------------------------------------------------------------------------------------------------------------------------")
-    print("MongoDB: %s :" % ctx.mongo_url)
-    print("---------------------------------------------------------------------------------------------------------------------------")
-    print(fmt.format("Provider", "Ver.", "Dataset", "Series", "Last Update", "First Download", "last Download"))
-    print("---------------------------------------------------------------------------------------------------------------------------")
-    query = {}
-    if fetcher:
-        query["name"] = fetcher
-        
-    for provider in db[constants.COL_PROVIDERS].find(query):
-        
-        for dataset in db[constants.COL_DATASETS].find({'provider_name': provider['name']}).sort("dataset_code"):
-            
-            series_count = db[constants.COL_SERIES].count({'provider_name': provider['name'], 
-                                                           "dataset_code": dataset['dataset_code']})
-            
-            if not provider['enable']:
-                _provider = "%s *" % provider['name']
-            else: 
-                _provider = provider['name']
-            
-            print(fmt.format(_provider, 
-                             provider['version'], 
-                             dataset['dataset_code'], 
-                             series_count,
-                             str(dataset['last_update'].strftime("%Y-%m-%d")), 
-                             str(dataset['download_first'].strftime("%Y-%m-%d - %H:%M")), 
-                             str(dataset['download_last'].strftime("%Y-%m-%d - %H:%M"))))
-    print("---------------------------------------------------------------------------------------------------------------------------")
+    
+    rows = report.get_report(db, provider_name=fetcher, sort=sort, 
+                             reverse=desc, stored_counts=stored_counts)
+    
+    if output_format == "json":
+        report.write_json(rows, sys.stdout, pretty=pretty)
+    elif output_format == "csv":
+        report.write_csv(rows, sys.stdout)
+    else:
+        report.write_table(rows, sys.stdout, mongo_url=ctx.mongo_url)
 
 @cli.command('tags', context_settings=client.DLSTATS_SETTINGS)
 @client.opt_verbose
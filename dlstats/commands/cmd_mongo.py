@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 import time
+import json
 from pprint import pprint
 
 import click
@@ -10,15 +11,10 @@ from widukind_common import tests_tools as utils
 
 from dlstats import constants
 from dlstats import client
-from dlstats.fetchers import schemas
+from dlstats.fetchers.compact import migrate_series
+from dlstats.fetchers.schemas_check import check_schemas, merge_reports
+from dlstats.utils import json_dump_convert
 
-#TODO: move to schemas module
-CURRENT_SCHEMAS = {
-    constants.COL_PROVIDERS: schemas.provider_schema,
-    constants.COL_DATASETS: schemas.dataset_schema,
-    constants.COL_SERIES: schemas.series_schema,
-    constants.COL_CATEGORIES: schemas.category_schema,
-}
 
 
 @click.group()
@@ -146,60 +142,62 @@ def cmd_report(**kwargs):
 @client.opt_silent
 @client.opt_debug
 @client.opt_mongo_url
-@click.option('--max-errors', '-M', default=0, type=int, show_default=True)
-def cmd_check_schemas(max_errors=None, **kwargs):
+@click.option('--max-errors', '-M', default=0, type=int, show_default=True,
+              help='Max errors by collection shard.')
+@click.option('--provider', '-p', help='Provider name')
+@click.option('--dataset', '-d', help='Dataset code')
+@click.option('--workers', '-w', default=1, type=int, show_default=True,
+              help='Number of processes for check collection shards in parallel.')
+@click.option('--batch-size', default=1000, type=int, show_default=True,
+              help='Documents by cursor batch.')
+@click.option('--json', 'json_output', is_flag=True,
+              help='Print the report of each shard as a JSON line.')
+def cmd_check_schemas(max_errors=None, provider=None, dataset=None, workers=1,
+                      batch_size=1000, json_output=False, **kwargs):
     """Check datas in DB with schemas
     """
     ctx = client.Context(**kwargs)
     ctx.log_warn("Attention, opération très longue")
     
     # dlstats mongo check-schemas --mongo-url mongodb://localhost/widukind -M 20 -S
-    
-    report = {}
+    # dlstats mongo check-schemas -p INSEE -w 8 --json -S
     
     if ctx.silent or click.confirm('Do you want to continue?', abort=True):
         
         start = time.time()
         
         db = ctx.mongo_database()
-        from pymongo import ReadPreference
-
-        for col in CURRENT_SCHEMAS.keys():
-            print("check %s..." % col)
-            
-            report[col] = {'error': 0, 'verified': 0, 'time': 0}
-            report[col]['count'] = db[col].count()
-            
-            s = time.time()
-            
-            _schema = CURRENT_SCHEMAS[col]
-            
-            #coll2 = coll1.with_options(read_preference=ReadPreference.SECONDARY_PREFERRED)
-            #find(limit=0)
-            #projection={‘_id’: False}
-            for doc in db[col].with_options(read_preference=ReadPreference.SECONDARY_PREFERRED).find():
-                _id = None
-                if max_errors and report[col]['error'] >= max_errors:
-                    ctx.log_warn("Max error attempt. Skip test !")
-                    break
-                try:
-                    report[col]['verified'] += 1
-                    _id = str(doc.pop('_id'))
-                    _schema(doc)
-                except Exception as err:
-                    report[col]['error'] += 1
-                    if ctx.verbose:
-                        ctx.log_error("%s - %s - %s" % (col, _id, str(err)))
-                    
-            report[col]['time'] = "%.3f" % (time.time() - s)
+
+        reports = []
+        for report in check_schemas(db, provider=provider, dataset=dataset,
+                                    workers=workers, max_errors=max_errors,
+                                    batch_size=batch_size,
+                                    mongo_url=ctx.mongo_url):
+            reports.append(report)
+            if json_output:
+                print(json.dumps(report, default=json_dump_convert), flush=True)
+                continue
+            print("check %s [%s/%s]..." % (report["collection"], 
+                                           report["shard"] + 1, 
+                                           report["shards"]))
+            if report["max_errors"]:
+                ctx.log_warn("Max error attempt. Skip test !")
+            if ctx.verbose:
+                for _id, error in report["errors"]:
+                    ctx.log_error("%s - %s - %s" % (report["collection"], _id, error))
         
+        report = merge_reports(reports)
         end = time.time() - start
 
+        if json_output:
+            print(json.dumps({"collections": report, "time": round(end, 3)}), flush=True)
+            return
+
         fmt = "{0:20} | {1:10} | {2:10} | {3:10} | {4:10}"
         print("--------------------------------------------------------------------")
         print(fmt.format("Collection", "Count", "Verified", "Errors", "Time"))
         for col, item in report.items():
-            print(fmt.format(col, item['count'], item['verified'], item['error'], item['time']))
+            print(fmt.format(col, item['count'], item['verified'], item['error'], "%.3f" % item['time']))
         print("--------------------------------------------------------------------")
         print("time elapsed : %.3f seconds " % end)
              
@@ -213,6 +211,45 @@ def cmd_check_schemas(max_errors=None, **kwargs):
         time elapsed : 210.042 seconds        
         """
     
+@cli.command('compact-series', context_settings=client.DLSTATS_SETTINGS)
+@client.opt_verbose
+@client.opt_silent
+@client.opt_debug
+@client.opt_mongo_url
+@click.option('--provider', '-p', help='Provider name')
+@click.option('--dataset', '-d', help='Dataset code')
+@click.option('--expand', is_flag=True, 
+              help='Convert compact series to the default layout')
+@click.option('--bulk-size', default=500, type=int, show_default=True)
+def cmd_compact_series(provider=None, dataset=None, expand=False, 
+                       bulk_size=500, **kwargs):
+    """Convert series values to the compact layout"""
+
+    ctx = client.Context(**kwargs)
+    
+    if ctx.silent or click.confirm('Do you want to continue?', abort=True):
+        
+        query = {}
+        if provider:
+            query['provider_name'] = provider
+        if dataset:
+            query['dataset_code'] = dataset
+        
+        start = time.time()
+        stats = migrate_series(ctx.mongo_database(), query=query, 
+                               compact=not expand, bulk_size=bulk_size)
+        end = time.time() - start
+        
+        ratio = 0
+        if stats['bytes_after']:
+            ratio = stats['bytes_before'] / stats['bytes_after']
+        
+        print("series converted : %s" % stats['count'])
+        print("bytes before     : %s" % stats['bytes_before'])
+        print("bytes after      : %s" % stats['bytes_after'])
+        print("ratio            : %.2f" % ratio)
+        print("time elapsed     : %.3f seconds" % end)
+
 @cli.command('clean', context_settings=client.DLSTATS_SETTINGS)
 @client.opt_verbose
 @client.opt_silent
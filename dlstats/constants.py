@@ -5,4 +5,11 @@ from widukind_common.constants import *
 
 CACHE_URL = os.environ.get('WIDUKIND_CACHE_URL', 'simple') #redis://localhost:6379/0
 
-SCHEMAS_VALIDATION_DISABLE = os.environ.get('WIDUKIND_SCHEMAS_VALIDATION_DISABLE', 'false')
\ No newline at end of file
+SCHEMAS_VALIDATION_DISABLE = os.environ.get('WIDUKIND_SCHEMAS_VALIDATION_DISABLE', 'false')
+
+SCHEMAS_VALIDATION_BACKEND = os.environ.get('WIDUKIND_SCHEMAS_VALIDATION_BACKEND', 'compiled') #voluptuous
+
+# validate 1 of N series
+SCHEMAS_VALIDATION_SAMPLE = int(os.environ.get('WIDUKIND_SCHEMAS_VALIDATION_SAMPLE', '1'))
+
+COL_SERIES_REVISIONS = "series_revisions"
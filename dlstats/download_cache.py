@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+import logging
+from collections import Counter
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+download_cache = None
+
+def file_digest(filepath):
+    """Return sha256 hexdigest of filepath content"""
+    sha = hashlib.sha256()
+    with open(filepath, "rb") as fp:
+        for chunk in iter(lambda: fp.read(1024 * 1024), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+class DownloadCache(object):
+    """On-disk cache of downloaded files with HTTP validators
+
+    Files are stored by content (sha256) in <cache_path>/objects and an
+    index (<cache_path>/index.json) map url to ETag, Last-Modified,
+    digest, size and last access.
+
+    Entries not used since max_age seconds are removed and the least
+    recently used entries are removed when total size exceed max_size.
+    The eviction run when total size exceed max_size or every 
+    evict_interval stores.
+
+    The index is read and written under a file lock (<cache_path>/index.lock)
+    shared by the processes of --workers.
+    """
+
+    INDEX_FILENAME = "index.json"
+    LOCK_FILENAME = "index.lock"
+
+    def __init__(self,
+                 cache_path=None,
+                 max_size=10 * 1024 * 1024 * 1024, #10GB
+                 max_age=60 * 60 * 24 * 30, #30 days
+                 evict_interval=100):
+
+        self.cache_path = cache_path or os.path.join(tempfile.gettempdir(),
+                                                     "dlstats-downloads")
+        self.max_size = max_size
+        self.max_age = max_age
+        self.evict_interval = evict_interval
+        self.objects_path = os.path.join(self.cache_path, "objects")
+        self.index_path = os.path.join(self.cache_path, self.INDEX_FILENAME)
+        self.lock_path = os.path.join(self.cache_path, self.LOCK_FILENAME)
+        self.lock = threading.Lock()
+        self.count_stores = 0
+
+        os.makedirs(self.objects_path, exist_ok=True)
+
+        msg = "enable download cache path[%s] max_size[%s] max_age[%s]"
+        logger.info(msg % (self.cache_path, self.max_size, self.max_age))
+
+    @contextmanager
+    def locked(self):
+        """Lock of the index between threads and processes"""
+        with self.lock:
+            with open(self.lock_path, "a") as fp:
+                if fcntl:
+                    fcntl.flock(fp.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl:
+                        fcntl.flock(fp.fileno(), fcntl.LOCK_UN)
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path) as fp:
+                return json.load(fp)
+        except ValueError:
+            logger.warning("invalid download cache index[%s]" % self.index_path)
+            return {}
+
+    def _save_index(self, index):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_path)
+        with os.fdopen(fd, "w") as fp:
+            json.dump(index, fp)
+        os.replace(tmp_path, self.index_path)
+
+    def object_path(self, digest):
+        return os.path.join(self.objects_path, digest[:2], digest)
+
+    def get(self, url):
+        """Return index entry for url or None"""
+        entry = self._load_index().get(url)
+        if entry and os.path.exists(self.object_path(entry["digest"])):
+            return entry
+        return None
+
+    def conditional_headers(self, url):
+        """Return If-None-Match/If-Modified-Since headers for url"""
+        headers = {}
+        entry = self.get(url)
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def restore(self, url, filepath):
+        """Copy cached content of url to filepath
+
+        :return: digest of the cached content or None if not found in cache
+        """
+        with self.locked():
+            index = self._load_index()
+            entry = index.get(url)
+            if not entry:
+                return None
+            object_path = self.object_path(entry["digest"])
+            if not os.path.exists(object_path):
+                return None
+
+            if os.path.exists(filepath):
+                os.remove(filepath)
+            try:
+                os.link(object_path, filepath)
+            except OSError:
+                shutil.copyfile(object_path, filepath)
+
+            entry["last_access"] = time.time()
+            self._save_index(index)
+
+        return entry["digest"]
+
+    def store(self, url, filepath, headers={}, digest=None):
+        """Store filepath content for url
+
+        :param str digest: file_digest() of filepath if already computed
+        :return: True if content is not the same as previous cached content
+        """
+        digest = digest or file_digest(filepath)
+
+        object_path = self.object_path(digest)
+        with self.locked():
+            if not os.path.exists(object_path):
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                tmp_path = "%s.tmp-%s" % (object_path, os.getpid())
+                try:
+                    os.link(filepath, tmp_path)
+                except OSError:
+                    shutil.copyfile(filepath, tmp_path)
+                os.replace(tmp_path, object_path)
+
+            index = self._load_index()
+            old_entry = index.get(url)
+            index[url] = {
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified"),
+                "digest": digest,
+                "size": os.path.getsize(object_path),
+                "last_access": time.time(),
+            }
+            if old_entry and old_entry["digest"] != digest:
+                self.remove_objects(index, [old_entry["digest"]])
+
+            self.count_stores += 1
+            if self.count_stores % self.evict_interval == 0 \
+                    or (self.max_size and self.total_size(index) > self.max_size):
+                self.evict(index)
+            self._save_index(index)
+
+        return not old_entry or old_entry["digest"] != digest
+
+    def total_size(self, index):
+        sizes = {}
+        for entry in index.values():
+            sizes[entry["digest"]] = entry["size"]
+        return sum(sizes.values())
+
+    def remove_objects(self, index, digests):
+        """Remove from disk the objects of digests not referenced by index"""
+        referenced = set([entry["digest"] for entry in index.values()])
+        for digest in set(digests) - referenced:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("download cache - evict[%s]" % digest)
+            try:
+                os.remove(self.object_path(digest))
+            except FileNotFoundError:
+                pass
+
+    def evict(self, index):
+        """Remove old entries then least recently used entries of index
+
+        Only the objects of the removed entries are removed from disk. 
+        Call with the lock.
+        """
+        removed = []
+        now = time.time()
+        for url, entry in list(index.items()):
+            if self.max_age and now - entry["last_access"] > self.max_age:
+                removed.append(index.pop(url)["digest"])
+
+        if self.max_size:
+            references = Counter()
+            sizes = {}
+            for entry in index.values():
+                references[entry["digest"]] += 1
+                sizes[entry["digest"]] = entry["size"]
+            total = sum(sizes.values())
+            entries = sorted(index.items(), key=lambda item: item[1]["last_access"])
+            for url, entry in entries:
+                if total <= self.max_size:
+                    break
+                del index[url]
+                removed.append(entry["digest"])
+                references[entry["digest"]] -= 1
+                if not references[entry["digest"]]:
+                    total -= sizes.pop(entry["digest"], 0)
+
+        self.remove_objects(index, removed)
+        return removed
+
+def configure_download_cache(**kwargs):
+    global download_cache
+    download_cache = DownloadCache(**kwargs)
+    return download_cache
+
+def remove_download_cache():
+    global download_cache
+    download_cache = None
@@ -2,8 +2,10 @@
 
 import time
 import os
+import glob
+import shutil
 import tempfile
-from operator import itemgetter
+from operator import itemgetter, ne
 from datetime import datetime
 import logging
 import pprint
@@ -11,29 +13,43 @@ from collections import OrderedDict
 from itertools import groupby
 import hashlib
 import json
+import multiprocessing
+import threading
+import queue
 
 import pymongo
+from bson import BSON
+from bson.errors import InvalidDocument
+from bson.raw_bson import RawBSONDocument
 from pymongo import ReturnDocument
 from pymongo import InsertOne, UpdateOne
-from slugify import slugify
-import pandas
+import numpy
 
-from widukind_common.utils import get_mongo_db
+from widukind_common.utils import get_mongo_db, get_mongo_url
 from widukind_common import errors
 
 from dlstats import constants
 from dlstats.fetchers import schemas
+from dlstats.fetchers.compact import compact_series, expand_series, is_compact
+from dlstats.fetchers import revisions
 from dlstats.utils import (last_error, 
                            clean_datetime, 
                            remove_file_and_dir, 
                            make_store_path,
-                           get_year,
                            json_dump_convert)
+from dlstats.periods import set_timestamps
+from dlstats import slugs
 
 logger = logging.getLogger(__name__)
 
 IS_SCHEMAS_VALIDATION_DISABLE = constants.SCHEMAS_VALIDATION_DISABLE == "true"
 
+# 1 series of BULK_BYTES_SAMPLE is encoded for the average BSON size (bulk_adaptive)
+BULK_BYTES_SAMPLE = 20
+
+series_validator = schemas.get_series_validator(constants.SCHEMAS_VALIDATION_BACKEND,
+                                                constants.SCHEMAS_VALIDATION_SAMPLE)
+
 class Fetcher(object):
     """Abstract base class for all fetchers"""
     
@@ -47,17 +63,40 @@ class Fetcher(object):
                  not_remove_files=False,
                  async_mode=False,
                  async_framework="gevent",
+                 workers=1,
+                 mongo_url=None,
+                 pipeline_writers=2,
+                 pipeline_queue_size=4,
+                 bulk_adaptive=False,
+                 download_workers=4,
+                 compact_values=False,
+                 revisions_storage="inline",
+                 delta_updates=False,
+                 raw_bson=False,
                  **kwargs):
         """
         :param str provider_name: Provider Name
         :param pymongo.database.Database db: MongoDB Database instance        
         :param bool is_indexes: Bypass create_or_update_indexes() if False 
-
-        :raises ValueError: if provider_name is None
+        :param int workers: Number of processes for load datasets
+        :param str mongo_url: MongoDB URL used by workers processes
+        :param int pipeline_writers: Number of concurrent batch writers (async modes)
+        :param int pipeline_queue_size: Max batches in queue (pipeline mode)
+        :param bool bulk_adaptive: Default of Datasets.bulk_adaptive
+        :param int download_workers: Concurrent downloads of dataset slices (1 for sequential)
+        :param bool compact_values: Write series values with the compact layout
+        :param str revisions_storage: "inline" (in observations) or "collection" (series_revisions)
+        :param bool delta_updates: Update only changed or appended observations of series
+        :param bool raw_bson: Encode series documents to RawBSONDocument before bulk_write
+
+        :raises ValueError: if provider_name is None or invalid revisions_storage
         """        
         if not provider_name:
             raise ValueError("provider_name is required")
 
+        if not revisions_storage in revisions.REVISIONS_STORAGES:
+            raise ValueError("invalid revisions_storage[%s]" % revisions_storage)
+
         self.provider_name = provider_name
         self.db = db or get_mongo_db()
         self.version = version
@@ -66,6 +105,19 @@ class Fetcher(object):
         self.not_remove_files = not_remove_files
         self.async_mode = async_mode
         self.async_framework = async_framework
+        self.workers = workers or 1
+        self.mongo_url = mongo_url
+        self.pipeline_writers = pipeline_writers
+        self.pipeline_queue_size = pipeline_queue_size
+        self.bulk_adaptive = bulk_adaptive
+        self.download_workers = download_workers
+        self.compact_values = compact_values
+        self.revisions_storage = revisions_storage
+        self.delta_updates = delta_updates
+        self.raw_bson = raw_bson
+        
+        if is_indexes and revisions_storage == revisions.REVISIONS_COLLECTION:
+            revisions.create_revisions_indexes(self.db)
         
         if self.async_mode:
             logger.info("ASYNC MODE ENABLE")
@@ -75,6 +127,8 @@ class Fetcher(object):
         self.provider = None
         
         self.errors = 0
+        # multiprocessing.Value - errors counter shared between workers
+        self.shared_errors = None
 
         self.categories_filter = [] #[category_code]
         self.datasets_filter = []   #[dataset_code]
@@ -83,10 +137,14 @@ class Fetcher(object):
         
         self.store_path = os.path.abspath(os.path.join(tempfile.gettempdir(), 
                                                        self.provider_name))
+        # base path of datasets directories (store_path if None)
+        self.datasets_store_path = None
         self.for_delete = []
         
         if IS_SCHEMAS_VALIDATION_DISABLE:
             logger.warning("schemas validation is disable")
+        elif constants.SCHEMAS_VALIDATION_SAMPLE > 1:
+            logger.warning("schemas validation of 1 of %s series" % constants.SCHEMAS_VALIDATION_SAMPLE)
     
     def upsert_calendar(self):
         try:
@@ -259,10 +317,31 @@ class Fetcher(object):
     def hook_after_dataset(self, dataset):
         self._hook_remove_temp_files(dataset)
 
+    def count_error(self):
+        """Increment errors counter (shared with other workers if exist)"""
+        if self.shared_errors is None:
+            self.errors += 1
+            return
+        
+        with self.shared_errors.get_lock():
+            self.shared_errors.value += 1
+            self.errors = self.shared_errors.value
+
     def load_datasets_first(self):
+        dataset_codes = [d["dataset_code"] for d in self.datasets_list()]
+        return self.run_datasets(dataset_codes)
+    
+    def run_datasets(self, dataset_codes):
+        """Upsert datasets one by one or with a pool of processes 
+        if workers > 1
+        
+        :param list dataset_codes: List of dataset_code
+        """
+
+        if self.workers > 1 and len(dataset_codes) > 1:
+            return self.run_datasets_parallel(dataset_codes)
 
-        for dataset in self.datasets_list():
-            dataset_code = dataset["dataset_code"]
+        for dataset_code in dataset_codes:
             try:
                 self.wrap_upsert_dataset(dataset_code)
             except Exception as err:
@@ -273,6 +352,84 @@ class Fetcher(object):
                                        dataset_code, 
                                        str(err)))
 
+    def get_worker_kwargs(self):
+        """Fetcher kwargs for create the fetcher instance of each worker"""
+        return dict(max_errors=self.max_errors,
+                    use_existing_file=self.use_existing_file,
+                    not_remove_files=self.not_remove_files,
+                    async_mode=self.async_mode,
+                    async_framework=self.async_framework,
+                    mongo_url=self.mongo_url,
+                    pipeline_writers=self.pipeline_writers,
+                    pipeline_queue_size=self.pipeline_queue_size,
+                    bulk_adaptive=self.bulk_adaptive,
+                    download_workers=self.download_workers,
+                    compact_values=self.compact_values,
+                    revisions_storage=self.revisions_storage,
+                    delta_updates=self.delta_updates,
+                    raw_bson=self.raw_bson)
+
+    def run_datasets_parallel(self, dataset_codes):
+        """Upsert datasets in a pool of processes
+        
+        Each worker use its own fetcher instance, MongoDB client and 
+        store path (<store_path>/worker-<pid>) for the fetcher files. The 
+        datasets directories (<store_path>/<dataset_code>) are shared with 
+        the parent fetcher: files are found by use_existing_file in next 
+        runs. The errors counter is shared between workers.
+        
+        :raises MaxErrors: if the maximum number of errors is exceeded
+        """
+        
+        workers = min(self.workers, len(dataset_codes))
+        
+        start = time.time()
+        msg = "parallel load START: provider[%s] - datasets[%s] - workers[%s]"
+        logger.info(msg % (self.provider_name, len(dataset_codes), workers))
+
+        shared_errors = multiprocessing.Value('i', self.errors)
+        
+        pool = multiprocessing.Pool(processes=workers,
+                                    initializer=_worker_init,
+                                    initargs=(self.__class__,
+                                              self.get_worker_kwargs(),
+                                              self.store_path,
+                                              shared_errors))
+        max_errors_msg = None
+        try:
+            results = pool.imap_unordered(_worker_upsert_dataset, 
+                                          dataset_codes)
+            for dataset_code, error, is_max_errors in results:
+                if is_max_errors:
+                    max_errors_msg = error
+                    break
+                if error:
+                    msg = "error for provider[%s] - dataset[%s]: %s"
+                    logger.critical(msg % (self.provider_name, 
+                                           dataset_code, 
+                                           error))
+        finally:
+            if max_errors_msg:
+                pool.terminate()
+            else:
+                pool.close()
+            pool.join()
+            self.errors = shared_errors.value
+            if not self.not_remove_files:
+                for dirname in glob.glob(os.path.join(self.store_path, "worker-*")):
+                    shutil.rmtree(dirname, ignore_errors=True)
+            end = time.time() - start
+            msg = "parallel load END: provider[%s] - errors[%s] - time[%.3f seconds]"
+            logger.info(msg % (self.provider_name, self.errors, end))
+
+        if max_errors_msg:
+            raise errors.MaxErrors(max_errors_msg)
+
+    def get_dataset_store_path(self, dataset_code):
+        """Directory of the files of a dataset"""
+        return make_store_path(base_path=self.datasets_store_path or self.store_path,
+                               dataset_code=dataset_code)
+
     def load_datasets_update(self):
         #TODO: log and/or warning
         return self.load_datasets_first()
@@ -291,6 +448,41 @@ class Fetcher(object):
         raise NotImplementedError("This method from the Fetcher class must"
                                   "be implemented.")
         
+_worker_fetcher = None
+
+def _worker_init(fetcher_klass, fetcher_kwargs, store_path, shared_errors):
+    """Create the fetcher instance of one worker process"""
+    global _worker_fetcher
+    
+    mongo_url = fetcher_kwargs.get("mongo_url") or get_mongo_url()
+    db = pymongo.MongoClient(mongo_url).get_default_database()
+    
+    _worker_fetcher = fetcher_klass(db=db, **fetcher_kwargs)
+    _worker_fetcher.shared_errors = shared_errors
+    _worker_fetcher.store_path = os.path.abspath(os.path.join(store_path, 
+                                                 "worker-%s" % os.getpid()))
+    _worker_fetcher.datasets_store_path = store_path
+
+def _worker_upsert_dataset(dataset_code):
+    """Upsert one dataset in worker process
+    
+    Return tuple (dataset_code, error message or None, is max errors)
+    """
+    fetcher = _worker_fetcher
+    
+    fetcher.errors = fetcher.shared_errors.value
+    if fetcher.max_errors and fetcher.errors >= fetcher.max_errors:
+        msg = "The maximum number of errors is exceeded for provider[%s]. MAX[%s]"
+        return dataset_code, msg % (fetcher.provider_name, fetcher.max_errors), True
+    
+    try:
+        fetcher.wrap_upsert_dataset(dataset_code)
+        return dataset_code, None, False
+    except errors.MaxErrors as err:
+        return dataset_code, str(err), True
+    except Exception as err:
+        return dataset_code, str(err), False
+
 class DlstatsCollection(object):
     """Abstract base class for objects that are stored and indexed by dlstats
     """
@@ -378,7 +570,7 @@ class Providers(DlstatsCollection):
     def slug(self):
         if not self.name:
             return 
-        return slugify(self.name, word_boundary=False, save_order=True)
+        return slugs.slug(self.name, cache=False)
 
     @property
     def bson(self):
@@ -443,7 +635,7 @@ class Categories(DlstatsCollection):
 
     def slug(self):
         txt = "-".join([self.provider_name, self.category_code])
-        return slugify(txt, word_boundary=False, save_order=True)
+        return slugs.slug(txt, cache=False)
 
     @property
     def bson(self):
@@ -540,6 +732,11 @@ class Datasets(DlstatsCollection):
                  last_update=None,
                  metadata=None,
                  bulk_size=500,
+                 bulk_adaptive=None,
+                 bulk_size_min=50,
+                 bulk_size_max=5000,
+                 bulk_bytes_max=8 * 1024 * 1024,
+                 bulk_latency_target=2.0,
                  fetcher=None, 
                  is_load_previous_version=True,
                  **kwargs):
@@ -549,6 +746,7 @@ class Datasets(DlstatsCollection):
         :param str name: Dataset name
         :param str doc_href: Dataset link
         :param int bulk_size: Batch size for mongo bulk
+        :param bool bulk_adaptive: Adapt bulk_size - see :class:`Series` (default: fetcher.bulk_adaptive)
         :param datetime.datetime last_update: Dataset Last updated 
         :param Fetcher fetcher: Fetcher instance
         :param bool is_load_previous_version: Bypass load previous version if False        
@@ -576,6 +774,13 @@ class Datasets(DlstatsCollection):
 
         self.download_first = None
         self.download_last = None
+        
+        self.series_count = None
+        
+        # download_cache digests of the files of the last successful update
+        self.download_digests = []
+        # digests of the files of this update (see SeriesIterator.check_download_changed)
+        self.pending_download_digests = []
 
         self.for_delete = []
 
@@ -585,11 +790,19 @@ class Datasets(DlstatsCollection):
             
         self.notes = None
         
+        if bulk_adaptive is None:
+            bulk_adaptive = getattr(self.fetcher, "bulk_adaptive", False)
+        
         self.series = Series(dataset=self,
                              provider_name=self.provider_name, 
                              dataset_code=self.dataset_code, 
                              last_update=self.last_update, 
                              bulk_size=self.bulk_size, 
+                             bulk_adaptive=bulk_adaptive,
+                             bulk_size_min=bulk_size_min,
+                             bulk_size_max=bulk_size_max,
+                             bulk_bytes_max=bulk_bytes_max,
+                             bulk_latency_target=bulk_latency_target,
                              fetcher=self.fetcher)
 
     def __repr__(self):
@@ -598,7 +811,7 @@ class Datasets(DlstatsCollection):
         
     def slug(self):
         txt = "-".join([self.provider_name, self.dataset_code])
-        return slugify(txt, word_boundary=False, save_order=True)
+        return slugs.slug(txt, cache=False)
         
     @property
     def bson(self):
@@ -618,7 +831,9 @@ class Datasets(DlstatsCollection):
                 'notes': self.notes,
                 "enable": self.enable,
                 "lock": self.lock,
-                "tags": self.tags}
+                "tags": self.tags,
+                "series_count": self.series_count,
+                "download_digests": self.download_digests}
 
     def load_previous_version(self, provider_name, dataset_code):
         dataset = self.fetcher.db[constants.COL_DATASETS].find_one(
@@ -639,6 +854,8 @@ class Datasets(DlstatsCollection):
             self.enable = dataset.get('enable')
             self.lock = dataset.get('lock')
             self.tags = dataset.get('tags')
+            self.series_count = dataset.get('series_count')
+            self.download_digests = dataset.get('download_digests') or []
             
             dimension_list = {}
             attribute_list = {}
@@ -683,7 +900,9 @@ class Datasets(DlstatsCollection):
         
         query = {"provider_name": self.provider_name,
                  "dataset_code": self.dataset_code}
-        if self.fetcher.db[constants.COL_SERIES].count(query) > 0:
+        # stored in dataset for fetchers report
+        self.series_count = self.fetcher.db[constants.COL_SERIES].count(query)
+        if self.series_count > 0:
             return True
 
         return False
@@ -692,14 +911,20 @@ class Datasets(DlstatsCollection):
 
         self.fetcher.hook_before_dataset(self)
         
+        slugs.reset_stats()
+        
+        is_success = False
         try:
             if not save_only:
                 if self.fetcher.async_mode and self.fetcher.async_framework == "gevent":
                     self.series.process_series_data_async()
+                elif self.fetcher.async_mode and self.fetcher.async_framework == "pipeline":
+                    self.series.process_series_data_pipeline()
                 else:
                     self.series.process_series_data()
+            is_success = True
         except Exception:
-            self.fetcher.errors += 1
+            self.fetcher.count_error()
             logger.critical(last_error())
             if self.fetcher.max_errors and self.fetcher.errors >= self.fetcher.max_errors:
                 msg = "The maximum number of errors is exceeded for provider[%s] - dataset[%s]. MAX[%s]"
@@ -707,12 +932,21 @@ class Datasets(DlstatsCollection):
                                               self.dataset_code,
                                               self.fetcher.max_errors))
         finally:
+            data_iterator = getattr(self.series, "data_iterator", None)
+            if isinstance(data_iterator, SeriesIterator):
+                data_iterator.close()
+            
             now = clean_datetime()
     
             if not self.download_first:
                 self.download_first = now
     
             self.download_last = now
+            
+            '''digests recorded only if parsing is complete'''
+            if is_success and self.pending_download_digests:
+                self.download_digests = self.pending_download_digests
+                self.pending_download_digests = []
     
             schemas.dataset_schema(self.bson)
             
@@ -725,13 +959,41 @@ class Datasets(DlstatsCollection):
                 self.enable = True
 
             if logger.isEnabledFor(logging.INFO):    
-                msg_stats = "STATS dataset-update: provider[%s] - dataset[%s] - accepts[%s] - rejects[%s] - inserts[%s] - updates[%s]"
+                msg_stats = "STATS dataset-update: provider[%s] - dataset[%s] - accepts[%s] - rejects[%s] - inserts[%s] - updates[%s] - skips[%s]"
                 logger.info(msg_stats % (self.provider_name,
                                          self.dataset_code,
                                          self.series.count_accepts,
                                          self.series.count_rejects,
                                          self.series.count_inserts,
-                                         self.series.count_updates))
+                                         self.series.count_updates,
+                                         self.series.count_skips))
+                
+                bulk_stats = self.series.bulk_stats
+                if self.series.bulk_adaptive and bulk_stats["batches"]:
+                    msg_stats = "STATS bulk-size: provider[%s] - dataset[%s] - batches[%s] - min[%s] - max[%s] - last[%s] - avg-doc-bytes[%.0f]"
+                    logger.info(msg_stats % (self.provider_name,
+                                             self.dataset_code,
+                                             bulk_stats["batches"],
+                                             bulk_stats["min"],
+                                             bulk_stats["max"],
+                                             self.series.bulk_size,
+                                             self.series.bulk_doc_bytes))
+
+                if self.fetcher.delta_updates:
+                    msg_stats = "STATS delta-updates: provider[%s] - dataset[%s] - updates[%s] - deltas[%s]"
+                    logger.info(msg_stats % (self.provider_name,
+                                             self.dataset_code,
+                                             self.series.count_updates,
+                                             self.series.count_deltas))
+
+                slug_stats = slugs.get_stats()
+                msg_stats = "STATS slug-cache: provider[%s] - dataset[%s] - hits[%s] - misses[%s] - size[%s/%s]"
+                logger.info(msg_stats % (self.provider_name,
+                                         self.dataset_code,
+                                         slug_stats["hits"],
+                                         slug_stats["misses"],
+                                         slug_stats["size"],
+                                         slug_stats["maxsize"]))
             
             if save_only:
                 self.series.reset_counters()
@@ -766,16 +1028,53 @@ class SeriesIterator:
         
         self.rows = None
         
+        # file objects read by rows - closed at end of rows
+        self.fileobjs = []
+        
     def get_store_path(self):
-        return make_store_path(base_path=self.fetcher.store_path,
-                               dataset_code=self.dataset_code)
+        return self.fetcher.get_dataset_store_path(self.dataset_code)
+
+    def check_download_changed(self, download):
+        """Reject dataset if the content of download is the same as in 
+        the last successful update of the dataset
+
+        The digest is recorded in dataset by update_database() only if 
+        parsing is complete: after a failed update, the same file is parsed 
+        again.
+
+        :param Downloader download: Downloader after get_filepath()
+        :raises RejectUpdatedDataset: If content is not changed
+        """
+        if not download.digest:
+            return
+        self.dataset.pending_download_digests.append(download.digest)
+        if self.dataset.from_db and download.digest in self.dataset.download_digests:
+            comments = "download not changed[%s]" % download.url
+            raise errors.RejectUpdatedDataset(provider_name=self.provider_name,
+                                              dataset_code=self.dataset_code,
+                                              comments=comments)
+
+    def close(self):
+        """Close file objects of rows"""
+        while self.fileobjs:
+            fileobj = self.fileobjs.pop()
+            try:
+                fileobj.close()
+            except Exception as err:
+                logger.warning("not closed file object - %s" % str(err))
 
     def __next__(self):
-        bson, err = next(self.rows)
+        try:
+            bson, err = next(self.rows)
+        except StopIteration:
+            self.close()
+            raise
+        
         if err:
             return err
         
         if not bson:
+            self.close()
             raise StopIteration()
 
         try:
@@ -785,31 +1084,17 @@ class SeriesIterator:
 
     def clean_field(self, bson):
 
-        if not "start_ts" in bson or not bson.get("start_ts"):
-            if bson["frequency"] == "A":
-                year = int(get_year(bson["values"][0]["period"]))
-                bson["start_ts"] = clean_datetime(datetime(year, 1, 1), rm_hour=True, rm_minute=True, rm_second=True, rm_microsecond=True, rm_tzinfo=True) 
-            else:
-                bson["start_ts"] = clean_datetime(pandas.Period(ordinal=bson["start_date"], freq=bson["frequency"]).start_time.to_datetime())
-
-        if not "end_ts" in bson or not bson.get("end_ts"):
-            if bson["frequency"] == "A":
-                year = int(get_year(bson["values"][-1]["period"]))
-                bson["end_ts"] = clean_datetime(datetime(year, 12, 31), rm_hour=True, rm_minute=True, rm_second=True, rm_microsecond=True, rm_tzinfo=True) 
-            else:
-                bson["end_ts"] = clean_datetime(pandas.Period(ordinal=bson["end_date"], freq=bson["frequency"]).end_time.to_datetime())
-        
         dimensions = bson.pop("dimensions")
         attributes = bson.pop("attributes", {})
         new_dimensions = {}
         new_attributes = {}
         
         for key, value in dimensions.items():
-            new_dimensions[slugify(key, save_order=True)] = slugify(value, save_order=True)
+            new_dimensions[slugs.slug(key)] = slugs.slug(value)
 
         if attributes:
             for key, value in attributes.items():
-                new_attributes[slugify(key, save_order=True)] = slugify(value, save_order=True)
+                new_attributes[slugs.slug(key)] = slugs.slug(value)
             
         bson["dimensions"] = new_dimensions
 
@@ -823,7 +1108,7 @@ class SeriesIterator:
                 continue
             attributes_obs = {}
             for k, v in value.get("attributes").items():
-                attributes_obs[slugify(k, save_order=True)] = slugify(v, save_order=True)
+                attributes_obs[slugs.slug(k)] = slugs.slug(v)
             value["attributes"] = attributes_obs
         
         return bson
@@ -846,44 +1131,56 @@ def series_set_release_date(bson, last_update):
         if not obs.get("release_date"):
             obs["release_date"] = last_update
 
-def series_revisions(new_bson, old_bson, last_update):
-    
-    if not new_bson or not isinstance(new_bson, dict):
-        raise ValueError("no new_bson or not dict instance")            
-
-    if not old_bson or not isinstance(old_bson, dict):
-        raise ValueError("no old_bson or not dict instance")            
-    
-    if not last_update or not isinstance(last_update, datetime):
-        raise ValueError("no last_update or not datetime instance")            
-
-    if not "values" in new_bson:
-        raise ValueError("not values field in new_bson")
-
-    if not "values" in old_bson:
-        raise ValueError("not values field in old_bson")
-    
-    old_values = old_bson["values"]
+def _gather(items, indexes):
+    """Return the list of items at positions indexes (numpy array)"""
+    if len(indexes) == 0:
+        return []
+    if len(indexes) == 1:
+        return [items[int(indexes[0])]]
+    return list(itemgetter(*indexes.tolist())(items))
+
+def _sorted_by_ordinal(values):
+    """Return values sorted by ordinal and the numpy array of ordinals"""
+    ordinals = numpy.fromiter(map(itemgetter("ordinal"), values),
+                              dtype=numpy.int64, count=len(values))
+    if len(ordinals) > 1 and not (numpy.diff(ordinals) >= 0).all():
+        order = numpy.argsort(ordinals, kind="mergesort")
+        values = _gather(values, order)
+        ordinals = ordinals[order]
+    return values, ordinals
+
+def _is_unique(ordinals):
+    """Return True if sorted ordinals not contains duplicate"""
+    return len(ordinals) < 2 or bool((numpy.diff(ordinals) > 0).all())
+
+def _columns_differ(old_column, new_column):
+    """Return boolean numpy array - True if old and new items differ"""
+    if old_column == new_column:
+        return numpy.zeros(len(old_column), dtype=bool)
+    return numpy.fromiter(map(ne, old_column, new_column), 
+                          dtype=bool, count=len(old_column))
+
+def _revisions_groupby(new_values, old_values, last_update):
+    """Merge observations one by one (reference implementation)
+
+    Return the merged values list and True if one observation is revised.
+    """
     changed = False
-    
-    old_values_by_periods = {}    
-    for old_value in old_values:
-        old_values_by_periods[old_value["period"]] = old_value
-    
+
     keyfunc = lambda x: x["ordinal"]
     groups = []
     uniquekeys = []
-    data = sorted(old_bson["values"] + new_bson["values"], key=keyfunc)
+    data = sorted(old_values + new_values, key=keyfunc)
 
     for k, g in groupby(data, keyfunc):
         groups.append(list(g))
         uniquekeys.append(k)
 
-    new_bson["values"] = []
+    values = []
 
     for group in groups:
         if len(group) == 1:
-            new_bson["values"].append(group[0])
+            values.append(group[0])
             continue
         
         old_obs = group[0]
@@ -905,7 +1202,7 @@ def series_revisions(new_bson, old_bson, last_update):
             is_new_revision = True
         
         if not is_new_revision:
-            new_bson["values"].append(group[0])
+            values.append(group[0])
             continue
         
         changed = True
@@ -922,7 +1219,106 @@ def series_revisions(new_bson, old_bson, last_update):
         '''new release date'''
         new_obs["release_date"] = last_update
 
-        new_bson["values"].append(new_obs)
+        values.append(new_obs)
+
+    return values, changed
+
+def _revisions_columnar(new_values, old_values, last_update):
+    """Merge observations with arrays aligned on ordinal
+
+    Same result as :func:`_revisions_groupby`. Observations are aligned 
+    on ordinal with numpy, values and attributes are compared in bulk and 
+    only revised observations are modified.
+    
+    Fallback to :func:`_revisions_groupby` if one side contains 
+    duplicate ordinals.
+    """
+    old_values, old_ordinals = _sorted_by_ordinal(old_values)
+    new_values, new_ordinals = _sorted_by_ordinal(new_values)
+    
+    if not _is_unique(old_ordinals) or not _is_unique(new_ordinals):
+        return _revisions_groupby(new_values, old_values, last_update)
+
+    count_old = len(old_ordinals)
+    count_new = len(new_ordinals)
+
+    '''position of each old ordinal in new ordinals'''
+    new_pos = numpy.searchsorted(new_ordinals, old_ordinals)
+    in_new = numpy.zeros(count_old, dtype=bool)
+    if count_new:
+        in_new = new_ordinals[numpy.minimum(new_pos, count_new - 1)] == old_ordinals
+    old_idx = numpy.flatnonzero(in_new)
+    new_idx = new_pos[in_new]
+
+    old_common = _gather(old_values, old_idx)
+    new_common = _gather(new_values, new_idx)
+
+    get_value = itemgetter("value")
+    revised = _columns_differ(list(map(get_value, old_common)),
+                              list(map(get_value, new_common)))
+    revised |= _columns_differ([obs.get("attributes") for obs in old_common],
+                               [obs.get("attributes") for obs in new_common])
+    revised_idx = numpy.flatnonzero(revised)
+
+    for i in revised_idx.tolist():
+        old_obs = old_common[i]
+        new_obs = new_common[i]
+
+        if "revisions" in old_obs:
+            new_obs["revisions"] = old_obs["revisions"] 
+
+        if not new_obs.get("revisions"):
+            new_obs["revisions"] = []
+        
+        new_obs["revisions"].append({ 
+            "revision_date": old_obs["release_date"],
+            "value": old_obs["value"],
+            "attributes": old_obs.get("attributes") 
+        })
+        
+        new_obs["release_date"] = last_update
+
+    '''merge: positions of old and new only observations in result'''
+    only_new = numpy.ones(count_new, dtype=bool)
+    only_new[new_idx] = False
+    only_new_idx = numpy.flatnonzero(only_new)
+    only_new_ordinals = new_ordinals[only_new_idx]
+
+    old_positions = numpy.arange(count_old) \
+        + numpy.searchsorted(only_new_ordinals, old_ordinals)
+    only_new_positions = numpy.arange(len(only_new_idx)) \
+        + numpy.searchsorted(old_ordinals, only_new_ordinals)
+
+    '''index in old_values + new_values'''
+    sources = numpy.empty(count_old + len(only_new_idx), dtype=numpy.int64)
+    sources[old_positions] = numpy.arange(count_old)
+    sources[only_new_positions] = only_new_idx + count_old
+    sources[old_positions[old_idx[revised_idx]]] = \
+        new_idx[revised_idx] + count_old
+
+    return _gather(old_values + new_values, sources), bool(len(revised_idx))
+
+def series_revisions(new_bson, old_bson, last_update):
+    
+    if not new_bson or not isinstance(new_bson, dict):
+        raise ValueError("no new_bson or not dict instance")            
+
+    if not old_bson or not isinstance(old_bson, dict):
+        raise ValueError("no old_bson or not dict instance")            
+    
+    if not last_update or not isinstance(last_update, datetime):
+        raise ValueError("no last_update or not datetime instance")            
+
+    if not "values" in new_bson:
+        raise ValueError("not values field in new_bson")
+
+    if not "values" in old_bson:
+        raise ValueError("not values field in old_bson")
+    
+    values, changed = _revisions_columnar(new_bson["values"], 
+                                          old_bson["values"], 
+                                          last_update)
+    new_bson["values"] = values
 
     return changed
 
@@ -982,6 +1378,71 @@ def series_is_changed(new_bson, old_bson):
 
     return False
 
+def series_digest(bson):
+    """Return a stable digest of the series content
+    
+    Computed from values, attributes, dimensions, notes and dates. 
+    release_date and revisions of observations are not used.
+    """
+    content = {
+        "start_date": bson["start_date"],
+        "end_date": bson["end_date"],
+        "dimensions": bson.get("dimensions"),
+        "attributes": bson.get("attributes"),
+        "notes": bson.get("notes"),
+        "values": [(obs["ordinal"], obs["period"], obs["value"], 
+                    obs.get("attributes")) for obs in bson["values"]]
+    }
+    content_str = json.dumps(content, sort_keys=True, default=json_dump_convert)
+    return hashlib.md5(content_str.encode('utf_8')).hexdigest()
+
+SERIES_DELTA_FIELDS = ["start_date", "end_date", "attributes", "dimensions", "notes"]
+
+def series_delta_update(new_bson, old_bson, max_ratio=0.5):
+    """Return an update with only the changed fields and observations
+
+    Observations already stored keep their positions: revised observations 
+    are updated with positional $set ("values.3") and new observations are 
+    appended ($push or positional $set after the last one).
+    
+    Return None if a full rewrite is required: observations removed or 
+    inserted before the last stored one, or more than max_ratio of the 
+    observations changed.
+    """
+    new_values = new_bson["values"]
+    old_values = old_bson["values"]
+    
+    if len(new_values) < len(old_values):
+        return None
+    
+    changed = []
+    for i, old_obs in enumerate(old_values):
+        new_obs = new_values[i]
+        if new_obs["ordinal"] != old_obs["ordinal"]:
+            return None
+        if new_obs != old_obs:
+            changed.append(i)
+    
+    appended = new_values[len(old_values):]
+    if len(changed) + len(appended) > max_ratio * len(new_values):
+        return None
+    
+    query_set = {"digest": new_bson["digest"]}
+    for field in SERIES_DELTA_FIELDS:
+        if new_bson.get(field) != old_bson.get(field):
+            query_set[field] = new_bson.get(field)
+    
+    update = {"$set": query_set}
+    if changed:
+        for i in changed:
+            query_set["values.%s" % i] = new_values[i]
+        for i, obs in enumerate(appended, len(old_values)):
+            query_set["values.%s" % i] = obs
+    elif appended:
+        update["$push"] = {"values": {"$each": appended}}
+    
+    return update
+
 def series_update(new_bson, old_bson=None, last_update=None):
 
     if not new_bson or not isinstance(new_bson, dict):
@@ -1031,7 +1492,7 @@ def series_update(new_bson, old_bson=None, last_update=None):
 
     if not old_bson:
         if not IS_SCHEMAS_VALIDATION_DISABLE:
-            schemas.series_schema(new_bson)
+            series_validator(new_bson)
         return new_bson
     else:
         changed = series_revisions(new_bson, old_bson, _last_update)
@@ -1043,7 +1504,7 @@ def series_update(new_bson, old_bson=None, last_update=None):
             return
 
         if not IS_SCHEMAS_VALIDATION_DISABLE:
-            schemas.series_schema(new_bson)
+            series_validator(new_bson)
         
     return new_bson
 
@@ -1057,12 +1518,26 @@ class Series:
                  dataset_code=None, 
                  last_update=None, 
                  bulk_size=500,
+                 bulk_adaptive=False,
+                 bulk_size_min=50,
+                 bulk_size_max=5000,
+                 bulk_bytes_max=8 * 1024 * 1024,
+                 bulk_latency_target=2.0,
                  fetcher=None):
         """        
+        With bulk_adaptive, bulk_size is recomputed after each bulk_write 
+        from the average BSON size of series and the observed latency. 
+        A batch is also flushed when its size reach bulk_bytes_max.
+        
         :param str provider_name: Provider name
         :param str dataset_code: Dataset code
         :param datetime.datetime last_update: Last updated date
-        :param int bulk_size: Batch size for mongo bulk
+        :param int bulk_size: Batch size for mongo bulk (initial size if bulk_adaptive)
+        :param bool bulk_adaptive: Adapt bulk_size
+        :param int bulk_size_min: Min bulk_size (bulk_adaptive)
+        :param int bulk_size_max: Max bulk_size (bulk_adaptive)
+        :param int bulk_bytes_max: Max BSON bytes by batch (bulk_adaptive)
+        :param float bulk_latency_target: Seconds by bulk_write (bulk_adaptive)
         :param Fetcher fetcher: Fetcher instance
         """
         self.dataset = None
@@ -1070,6 +1545,11 @@ class Series:
         self.dataset_code = dataset_code
         self.last_update = last_update
         self.bulk_size = bulk_size
+        self.bulk_adaptive = bulk_adaptive
+        self.bulk_size_min = bulk_size_min
+        self.bulk_size_max = bulk_size_max
+        self.bulk_bytes_max = bulk_bytes_max
+        self.bulk_latency_target = bulk_latency_target
         
         if not fetcher:
             raise ValueError("fetcher is required")
@@ -1088,24 +1568,135 @@ class Series:
 
         # temporary storage necessary to get old_bson in bulks
         self.series_list = []
+        self.series_list_bytes = 0
         self.fatal_error = False
         
+        # average BSON size of series (bulk_adaptive)
+        self.bulk_doc_bytes = 0
+        self.count_bytes_appends = 0
+        self.count_bytes_samples = 0
+        self.bulk_stats = {"batches": 0, "min": None, "max": None}
+        
+        # {key: digest} of series in db - loaded by first bulk_series()
+        self.series_keys = None
+        
+        # protect counters updated by writer threads (pipeline mode)
+        self.lock = threading.Lock()
+        self.pipeline_stats = {}
+        
         self.count_accepts = 0
         self.count_rejects = 0
         self.count_inserts = 0
         self.count_updates = 0
+        self.count_deltas = 0
+        self.count_skips = 0
 
     def reset_counters(self):
         self.count_accepts = 0
         self.count_rejects = 0
         self.count_inserts = 0
         self.count_updates = 0
+        self.count_deltas = 0
+        self.count_skips = 0
             
     def __repr__(self):
         return pprint.pformat([('provider_name', self.provider_name),
                                ('dataset_code', self.dataset_code),
                                ('last_update', self.last_update)])
 
+    def accept_series_data(self, data):
+        """Return True if data is a series to record, False if rejected
+        
+        :raises InterruptProcessSeriesData: if data is not captured exception
+        """
+        if isinstance(data, dict):
+            self.count_accepts += 1
+            return True
+
+        elif isinstance(data, errors.RejectFrequency):
+            self.count_rejects += 1
+            msg = "Reject frequency for provider[%s] - dataset[%s] - frequency[%s]"
+            logger.warning(msg % (self.provider_name, 
+                                  self.dataset_code, 
+                                  data.frequency))
+        
+        elif isinstance(data, errors.RejectUpdatedSeries):
+            self.count_rejects += 1
+            if logger.isEnabledFor(logging.DEBUG):
+                msg = "Reject series updated for provider[%s] - dataset[%s] - key[%s]"
+                logger.debug(msg % (self.provider_name, 
+                                    self.dataset_code, 
+                                    data.key))
+
+        elif isinstance(data, errors.RejectEmptySeries):
+            self.count_rejects += 1
+            msg = "Reject empty series for provider[%s] - dataset[%s]"
+            logger.warning(msg % (self.provider_name, 
+                                  self.dataset_code))
+            
+        elif isinstance(data, Exception):
+            self.fatal_error = True
+            raise errors.InterruptProcessSeriesData(str(data))
+        
+        return False
+
+    def append_series(self, data):
+        self.series_list.append(data)
+        if not self.bulk_adaptive:
+            return
+        
+        '''size of batch from average size: only 1 of BULK_BYTES_SAMPLE is encoded'''
+        if self.count_bytes_appends % BULK_BYTES_SAMPLE == 0:
+            try:
+                size = len(BSON.encode(data))
+            except (InvalidDocument, TypeError, ValueError, OverflowError) as err:
+                logger.warning("bulk size - not encodable series - %s" % str(err))
+            else:
+                self.count_bytes_samples += 1
+                self.bulk_doc_bytes += (size - self.bulk_doc_bytes) / self.count_bytes_samples
+        self.count_bytes_appends += 1
+        self.series_list_bytes += self.bulk_doc_bytes
+
+    def is_bulk_full(self):
+        if len(self.series_list) >= self.bulk_size:
+            return True
+        return self.bulk_adaptive and self.series_list_bytes >= self.bulk_bytes_max
+
+    def pop_series_list(self):
+        series_list = self.series_list
+        self.series_list = []
+        self.series_list_bytes = 0
+        return series_list
+
+    def adapt_bulk_size(self, count, duration):
+        """Compute next bulk_size after a bulk_write of count series"""
+        
+        sizes = [self.bulk_size_max]
+        if duration > 0:
+            sizes.append(int(count * self.bulk_latency_target / duration))
+        if self.bulk_doc_bytes:
+            sizes.append(int(self.bulk_bytes_max / self.bulk_doc_bytes))
+        target = max(self.bulk_size_min, min(sizes))
+        
+        with self.lock:
+            # smoothing: half way to target
+            bulk_size = (self.bulk_size + target) // 2
+            self.bulk_size = max(self.bulk_size_min, 
+                                 min(self.bulk_size_max, bulk_size))
+            
+            stats = self.bulk_stats
+            stats["batches"] += 1
+            if stats["min"] is None or count < stats["min"]:
+                stats["min"] = count
+            if stats["max"] is None or count > stats["max"]:
+                stats["max"] = count
+
+        if logger.isEnabledFor(logging.DEBUG):
+            msg = "bulk-size for provider[%s] - dataset[%s] - count[%s] - duration[%.3f] - next[%s]"
+            logger.debug(msg % (self.provider_name, 
+                                self.dataset_code,
+                                count, duration, self.bulk_size))
+
     def process_series_data(self):
         
         try:
@@ -1115,39 +1706,12 @@ class Series:
                 try:
                     data = next(self.data_iterator)
     
-                    if isinstance(data, dict):
-                        self.count_accepts += 1
-                        self.series_list.append(data)
-    
-                    elif isinstance(data, errors.RejectFrequency):
-                        self.count_rejects += 1
-                        msg = "Reject frequency for provider[%s] - dataset[%s] - frequency[%s]"
-                        logger.warning(msg % (self.provider_name, 
-                                              self.dataset_code, 
-                                              data.frequency))
+                    if not self.accept_series_data(data):
                         continue
                     
-                    elif isinstance(data, errors.RejectUpdatedSeries):
-                        self.count_rejects += 1
-                        if logger.isEnabledFor(logging.DEBUG):
-                            msg = "Reject series updated for provider[%s] - dataset[%s] - key[%s]"
-                            logger.debug(msg % (self.provider_name, 
-                                                self.dataset_code, 
-                                                data.key))
-                        continue
-    
-                    elif isinstance(data, errors.RejectEmptySeries):
-                        self.count_rejects += 1
-                        msg = "Reject empty series for provider[%s] - dataset[%s]"
-                        logger.warning(msg % (self.provider_name, 
-                                              self.dataset_code))
-                        continue
-                        
-                    elif isinstance(data, Exception):
-                        self.fatal_error = True
-                        raise errors.InterruptProcessSeriesData(str(data))
+                    self.append_series(data)
 
-                    if len(self.series_list) >= self.bulk_size:
+                    if self.is_bulk_full():
                         self.update_series_list()
                     
                 except StopIteration:
@@ -1159,10 +1723,168 @@ class Series:
                 self.update_series_list()
             self.update_dataset_lists_finalize()
 
+    def process_series_data_pipeline(self):
+        """Read and write series in parallel
+        
+        The current thread read series from data_iterator and put batches 
+        of bulk_size series in a bounded queue. Writer threads load old 
+        series, compute updates and run bulk_write. The producer is 
+        blocked when the queue is full.
+        
+        With fetcher.raw_bson, an encoding stage is added: encoder threads 
+        load old series, compute updates and encode documents 
+        (prepare_series_bulk) and writer threads only run bulk_write 
+        (write_series_bulk) of the encoded batches.
+        
+        Metrics are stored in pipeline_stats:
+        
+        - max_depth / avg_depth: batches waiting in queue at each put
+        - producer_stall: seconds blocked on a full queue
+        - writers_stall: seconds of writers waiting on an empty queue
+        - encoders_stall: seconds of encoders waiting on an empty queue (raw_bson)
+        """
+        
+        writers_count = max(1, self.fetcher.pipeline_writers)
+        batches = queue.Queue(maxsize=max(1, self.fetcher.pipeline_queue_size))
+        encoded = None
+        if self.fetcher.raw_bson:
+            encoded = queue.Queue(maxsize=max(1, self.fetcher.pipeline_queue_size))
+        writer_errors = []
+        
+        stats = self.pipeline_stats = {
+            "writers": writers_count,
+            "queue_size": batches.maxsize,
+            "batches": 0,
+            "max_depth": 0,
+            "sum_depth": 0,
+            "producer_stall": 0.0,
+            "writers_stall": 0.0,
+            "encoders_stall": 0.0,
+        }
+        
+        def worker(source, func, stall_key, target=None):
+            while True:
+                start = time.time()
+                item = source.get()
+                with self.lock:
+                    stats[stall_key] += time.time() - start
+                if item is None:
+                    return
+                if writer_errors:
+                    continue
+                try:
+                    result = func(item)
+                    if target:
+                        target.put(result)
+                except Exception as err:
+                    logger.critical(last_error())
+                    writer_errors.append(err)
+
+        def put(series_list):
+            if writer_errors:
+                raise writer_errors[0]
+            depth = batches.qsize()
+            stats["max_depth"] = max(stats["max_depth"], depth)
+            stats["sum_depth"] += depth
+            stats["batches"] += 1
+            start = time.time()
+            batches.put(series_list)
+            stats["producer_stall"] += time.time() - start
+
+        if encoded:
+            encoders = [threading.Thread(target=worker, daemon=True,
+                                         args=(batches, self.prepare_series_bulk, 
+                                               "encoders_stall", encoded)) 
+                        for i in range(writers_count)]
+            writers = [threading.Thread(target=worker, daemon=True,
+                                        args=(encoded, self.write_series_bulk, 
+                                              "writers_stall")) 
+                       for i in range(writers_count)]
+        else:
+            encoders = []
+            writers = [threading.Thread(target=worker, daemon=True,
+                                        args=(batches, self.bulk_series, 
+                                              "writers_stall")) 
+                       for i in range(writers_count)]
+        for thread in encoders + writers:
+            thread.start()
+        
+        try:
+            while True:
+                
+                self.fatal_error = False
+                try:
+                    data = next(self.data_iterator)
+    
+                    if not self.accept_series_data(data):
+                        continue
+                    
+                    self.append_series(data)
+
+                    if self.is_bulk_full():
+                        series_list = self.pop_series_list()
+                        put(series_list)
+                    
+                except StopIteration:
+                    break
+        finally:
+            if not self.fatal_error and not writer_errors \
+                    and len(self.series_list) > 0:
+                put(self.pop_series_list())
+            if encoders:
+                for thread in encoders:
+                    batches.put(None)
+                for thread in encoders:
+                    thread.join()
+                for thread in writers:
+                    encoded.put(None)
+            else:
+                for thread in writers:
+                    batches.put(None)
+            for thread in writers:
+                thread.join()
+            
+            if stats["batches"]:
+                stats["avg_depth"] = stats["sum_depth"] / stats["batches"]
+            else:
+                stats["avg_depth"] = 0
+            
+            if logger.isEnabledFor(logging.INFO):
+                msg = "STATS pipeline: provider[%s] - dataset[%s] - writers[%s] - batches[%s] - max-depth[%s] - avg-depth[%.1f] - producer-stall[%.3f seconds] - writers-stall[%.3f seconds]"
+                logger.info(msg % (self.provider_name,
+                                   self.dataset_code,
+                                   writers_count,
+                                   stats["batches"],
+                                   stats["max_depth"],
+                                   stats["avg_depth"],
+                                   stats["producer_stall"],
+                                   stats["writers_stall"]))
+            
+            self.update_dataset_lists_finalize()
+
+        if writer_errors:
+            raise writer_errors[0]
+
     def process_series_data_async(self):
+        """Write batches of bulk_size series in concurrent greenlets
+        
+        Same batching and counters as process_series_data() with at most
+        pipeline_writers batches in flight. Use with dlstats-gevent 
+        (monkey patched pymongo).
+        """
         
         from gevent.pool import Pool
-        pool = Pool(100)
+        pool = Pool(max(1, self.fetcher.pipeline_writers))
+        writer_errors = []
+        
+        def write(series_list):
+            if writer_errors:
+                return
+            try:
+                self.bulk_series(series_list)
+            except Exception as err:
+                logger.critical(last_error())
+                writer_errors.append(err)
         
         try:
             while True:
@@ -1171,50 +1893,34 @@ class Series:
                 try:
                     data = next(self.data_iterator)
     
-                    if isinstance(data, dict):
-                        self.count_accepts += 1
-                        pool.spawn(self.update_series_list_async, data)
-    
-                    elif isinstance(data, errors.RejectFrequency):
-                        self.count_rejects += 1
-                        msg = "Reject frequency for provider[%s] - dataset[%s] - frequency[%s]"
-                        logger.warning(msg % (self.provider_name, 
-                                              self.dataset_code, 
-                                              data.frequency))
+                    if not self.accept_series_data(data):
                         continue
                     
-                    elif isinstance(data, errors.RejectUpdatedSeries):
-                        self.count_rejects += 1
-                        if logger.isEnabledFor(logging.DEBUG):
-                            msg = "Reject series updated for provider[%s] - dataset[%s] - key[%s]"
-                            logger.debug(msg % (self.provider_name, 
-                                                self.dataset_code, 
-                                                data.key))
-                        continue
+                    self.append_series(data)
+
+                    if self.is_bulk_full():
+                        series_list = self.pop_series_list()
+                        # blocking if all writers are busy
+                        pool.spawn(write, series_list)
+                        if writer_errors:
+                            raise writer_errors[0]
     
-                    elif isinstance(data, errors.RejectEmptySeries):
-                        self.count_rejects += 1
-                        msg = "Reject empty series for provider[%s] - dataset[%s]"
-                        logger.warning(msg % (self.provider_name, 
-                                              self.dataset_code))
-                        continue
-                        
-                    elif isinstance(data, Exception):
-                        self.fatal_error = True
-                        raise errors.InterruptProcessSeriesData(str(data))
-
                 except StopIteration:
                     break
-                except Exception:
-                    raise
             
         finally:
+            if not self.fatal_error and not writer_errors \
+                    and len(self.series_list) > 0:
+                pool.spawn(write, self.pop_series_list())
             pool.join()
             self.update_dataset_lists_finalize()
 
+        if writer_errors:
+            raise writer_errors[0]
+
     def slug(self, key):
         txt = "-".join([self.provider_name, self.dataset_code, key])
-        return slugify(txt, word_boundary=False, save_order=True)
+        return slugs.slug(txt, cache=False)
 
     def update_dataset_lists_finalize(self):
         
@@ -1224,21 +1930,21 @@ class Series:
         attribute_keys = []
         
         for key, value in self.dataset.concepts.items():
-            key_slug = slugify(key, save_order=True)
+            key_slug = slugs.slug(key)
             concepts[key_slug] = value
             
         for key, value in self.dataset.codelists.items():
             new_value = {}
             for k, v in value.items():
-                new_value[slugify(k, save_order=True)] = v
-            codelists[slugify(key, save_order=True)] = new_value
+                new_value[slugs.slug(k)] = v
+            codelists[slugs.slug(key)] = new_value
             
         for key in self.dataset.dimension_keys:
-            dimension_keys.append(slugify(key, save_order=True))
+            dimension_keys.append(slugs.slug(key))
 
         if self.dataset.attribute_keys:
             for key in self.dataset.attribute_keys:
-                attribute_keys.append(slugify(key, save_order=True))
+                attribute_keys.append(slugs.slug(key))
             
         self.dataset.concepts = concepts
         self.dataset.codelists = codelists
@@ -1247,111 +1953,206 @@ class Series:
         if self.dataset.attribute_keys:
             self.dataset.attribute_keys = attribute_keys
         
+    def load_series_keys(self):
+        """Load key and digest of all series of the dataset
+        
+        One projection-only scan replace a $in query by batch: inserts 
+        are known without query and only full documents of candidate 
+        updates are read.
+        """
+        query = {
+            'provider_name': self.provider_name,
+            'dataset_code': self.dataset_code,
+        }
+        projection = {"_id": False, "key": True, "digest": True}
+        cursor = self.fetcher.db[constants.COL_SERIES].find(query, projection)
+        self.series_keys = {s['key']: s.get('digest') for s in cursor}
+
+        if logger.isEnabledFor(logging.DEBUG):
+            msg = "load series keys for provider[%s] - dataset[%s] - count[%s]"
+            logger.debug(msg % (self.provider_name, 
+                                self.dataset_code,
+                                len(self.series_keys)))
+
     def update_series_list(self):
+        return self.bulk_series(self.pop_series_list())
+
+    def bulk_series(self, series_list):
+        """Insert or update one batch of series
+        
+        Thread safe: used by writer threads in pipeline mode.
+        """
+        return self.write_series_bulk(self.prepare_series_bulk(series_list))
+
+    def bulk_document(self, doc):
+        """Return doc encoded to RawBSONDocument if fetcher.raw_bson
+        
+        bulk_write only copy the bytes of a RawBSONDocument.
+        """
+        if self.fetcher.raw_bson:
+            return RawBSONDocument(BSON.encode(doc))
+        return doc
 
-        keys = [s['key'] for s in self.series_list]
+    def prepare_series_bulk(self, series_list):
+        """Load old series and compute the requests of one batch of series
+        
+        Return a dict for write_series_bulk(). Documents of requests are 
+        encoded by bulk_document().
+        
+        Thread safe: used by encoder threads in pipeline mode.
+        """
 
+        with self.lock:
+            if self.series_keys is None:
+                self.load_series_keys()
+        old_digests = self.series_keys
+        
         query = {
             'provider_name': self.provider_name,
             'dataset_code': self.dataset_code,
-            'key': {'$in': keys}
         }
-        projection = {"tags": False}
-
-        cursor = self.fetcher.db[constants.COL_SERIES].find(query, projection)
-
-        old_series = {s['key']:s for s in cursor}
+        
+        '''start_ts/end_ts of the batch (not on the parse thread in pipeline mode)'''
+        set_timestamps(series_list)
+        
+        '''load full documents only for series with a new digest'''
+        update_keys = []
+        for data in series_list:
+            data['digest'] = series_digest(data)
+            key = data['key']
+            if key in old_digests and old_digests[key] != data['digest']:
+                update_keys.append(key)
+
+        old_series = {}
+        old_compact = set()
+        if update_keys:
+            query['key'] = {'$in': update_keys}
+            cursor = self.fetcher.db[constants.COL_SERIES].find(query, 
+                                                                {"tags": False})
+            for s in cursor:
+                if is_compact(s):
+                    old_compact.add(s['key'])
+                old_series[s['key']] = expand_series(s)
+
+        count_inserts = 0
+        count_updates = 0
+        count_deltas = 0
+        count_skips = 0
 
         bulk_requests = []
-        for data in self.series_list:
+        revisions_docs = []
+        for data in series_list:
 
             key = data['key']
 
             if not data.get("slug", None):
                 data['slug'] = self.slug(key)
 
-            if not key in old_series:
+            if not key in old_digests:
                 bson = series_update(data, last_update=self.last_update)
-                bulk_requests.append(InsertOne(bson))
-                self.count_inserts += 1
+                if self.fetcher.compact_values:
+                    compact_series(bson)
+                bulk_requests.append(InsertOne(self.bulk_document(bson)))
+                count_inserts += 1
+            elif old_digests[key] == data['digest']:
+                count_skips += 1
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("series[%s] not changed - same digest" % data["slug"])
             else:
                 old_bson = old_series[key]
                 
                 bson = series_update(data, old_bson=old_bson, 
                                      last_update=self.last_update)
 
-                if bson:
+                is_inline_revisions = False
+                if bson and self.fetcher.revisions_storage == revisions.REVISIONS_COLLECTION:
+                    '''unrevised observations are shared with old_bson: check before pop'''
+                    is_inline_revisions = revisions.has_revisions(old_bson)
+                    revisions_docs.extend(revisions.pop_revisions(bson))
+
+                delta = None
+                if bson and self.fetcher.delta_updates \
+                        and not self.fetcher.compact_values \
+                        and not key in old_compact \
+                        and not is_inline_revisions:
+                    '''inline revisions of a previous storage are removed by a full rewrite'''
+                    delta = series_delta_update(bson, old_bson)
+
+                if delta:
+                    bulk_requests.append(UpdateOne({'_id': old_bson['_id']}, 
+                                                   self.bulk_document(delta)))
+                    count_updates += 1
+                    count_deltas += 1
+                elif bson:
                     query_update = {
                         "start_date": bson["start_date"],     
                         "end_date": bson["end_date"],     
-                        "values": bson["values"],     
                         "attributes": bson["attributes"],     
                         "dimensions": bson["dimensions"],     
                         "notes": bson.get("notes"),     
+                        "digest": bson["digest"],
                     }
+                    if self.fetcher.compact_values:
+                        compact_series(bson)
+                        query_update["values_compact"] = bson["values_compact"]
+                        query_update["schema_version"] = bson["schema_version"]
+                        query_unset = {"values": ""}
+                    else:
+                        query_update["values"] = bson["values"]
+                        query_unset = {"values_compact": "", "schema_version": ""}
                     bulk_requests.append(UpdateOne({'_id': old_bson['_id']}, 
-                                              {'$set': query_update}))
-                    self.count_updates += 1
+                                              self.bulk_document({'$set': query_update,
+                                                                  '$unset': query_unset})))
+                    count_updates += 1
                 else:
                     if logger.isEnabledFor(logging.DEBUG):
                         logger.debug("series[%s] not changed" % old_bson["slug"])                    
-                    
+                    '''store digest for next run'''
+                    bulk_requests.append(UpdateOne({'_id': old_bson['_id']}, 
+                                              self.bulk_document({'$set': {"digest": data['digest']}})))
+
+        return {
+            "series_list": series_list,
+            "requests": bulk_requests,
+            "revisions": revisions_docs,
+            "inserts": count_inserts,
+            "updates": count_updates,
+            "deltas": count_deltas,
+            "skips": count_skips,
+        }
+
+    def write_series_bulk(self, bulk):
+        """Write the requests of prepare_series_bulk() and update counters
+        
+        Thread safe: used by writer threads in pipeline mode.
+        """
+        series_list = bulk["series_list"]
+        bulk_requests = bulk["requests"]
+
+        '''revisions before series: a failed run is replayed without loss'''
+        revisions.write_revisions(self.fetcher.db, bulk["revisions"])
 
         result = None        
         if len(bulk_requests) > 0:
             try:
+                start = time.time()
                 result = self.fetcher.db[constants.COL_SERIES].bulk_write(bulk_requests, ordered=False)
+                if self.bulk_adaptive:
+                    self.adapt_bulk_size(len(series_list), time.time() - start)
                 bulk_requests = []
             except pymongo.errors.BulkWriteError as err:
                 #logger.critical(last_error())
                 logger.critical(str(err.details))
                 raise
-                 
-        self.series_list = []
-        return result
 
-    def update_series_list_async(self, data):
-
-        result = None
-        query = {
-            'provider_name': self.provider_name,
-            'dataset_code': self.dataset_code,
-            'key': data["key"]
-        }
-        projection = {"tags": False}
-
-        old_series = self.fetcher.db[constants.COL_SERIES].find_one(query, projection)
-
-        key = data['key']
-
-        if not data.get("slug", None):
-            data['slug'] = self.slug(key)
-
-        if not old_series:
-            bson = series_update(data, last_update=self.last_update)
-            result = self.fetcher.db[constants.COL_SERIES].insert(bson)
-            #self.count_inserts += 1
-        else:
-            old_bson = old_series
-            
-            bson = series_update(data, old_bson=old_bson, 
-                                 last_update=self.last_update)
-
-            if bson:
-                query_update = {
-                    "start_date": bson["start_date"],     
-                    "end_date": bson["end_date"],     
-                    "values": bson["values"],     
-                    "attributes": bson["attributes"],     
-                    "dimensions": bson["dimensions"],     
-                    "notes": bson.get("notes"),     
-                }
-                result = self.fetcher.db[constants.COL_SERIES].update_one({'_id': old_bson['_id']}, {'$set': query_update})
-                #self.count_updates += 1
-            else:
-                if logger.isEnabledFor(logging.DEBUG):
-                    logger.debug("series[%s] not changed" % old_bson["slug"])                    
-        
+        with self.lock:
+            self.count_inserts += bulk["inserts"]
+            self.count_updates += bulk["updates"]
+            self.count_deltas += bulk["deltas"]
+            self.count_skips += bulk["skips"]
+            for data in series_list:
+                self.series_keys[data['key']] = data['digest']
+                 
         return result
 
 class CodeDict():
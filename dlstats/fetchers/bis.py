@@ -1,9 +1,7 @@
 # -*- coding: utf-8 -*-
 
 from collections import OrderedDict
-import os
 import io
-import zipfile
 import csv
 import datetime
 import logging
@@ -15,29 +13,13 @@ from lxml import etree
 from widukind_common import errors
 
 from dlstats import constants
-from dlstats.utils import Downloader, get_ordinal_from_period
+from dlstats.utils import Downloader, get_ordinals_from_periods, open_zip_member
 from dlstats.fetchers._commons import Fetcher, Datasets, Providers, SeriesIterator
 
 VERSION = 3
 
 logger = logging.getLogger(__name__)
 
-def extract_zip_file(filepath):
-    """Extract first file in zip file and return absolute path for the file extracted
-    
-    :param str filepath: Absolute file path of zip file
-    
-    Example: 
-        file1.zip contains one file: file1.csv
-    
-    >>> extract_zip_file('/tmp/file1.zip')
-    '/tmp/file1.csv'
-        
-    """
-    zfile = zipfile.ZipFile(filepath)
-    filename = zfile.namelist()[0]
-    return zfile.extract(filename, os.path.dirname(filepath))
-
 def csv_dict(headers, array_line):
     """Convert list1 (keys), list2 (values) to dict()
     """
@@ -426,27 +408,37 @@ class BIS_Data(SeriesIterator):
             download = Downloader(url=self.url,
                                   store_filepath=self.store_path, 
                                   filename=self.filename,
-                                  use_existing_file=self.fetcher.use_existing_file)
+                                  use_existing_file=self.fetcher.use_existing_file,
+                                  max_retries=3)
             
             zip_filepath = download.get_filepath()
             self.fetcher.for_delete.append(zip_filepath)
-            filepath = extract_zip_file(zip_filepath)
-            self.fetcher.for_delete.append(zip_filepath)
             
-            kwargs['filepath'] = filepath
+            '''skip parsing if zip file is the same as in last update'''
+            self.check_download_changed(download)
+
+            '''csv is read from zip file without extraction'''
+            kwargs['fileobj'] = open_zip_member(zip_filepath, encoding="utf-8")
         else:
             kwargs['fileobj'] = io.StringIO(datas, newline="\n")
         
+        self.fileobjs.append(kwargs['fileobj'])
+        
         kwargs['date_format'] = "%a %b %d %H:%M:%S %Z %Y"
         kwargs['headers_line'] = DATASETS[self.dataset.dataset_code]['lines']['headers']
-        self._file, self._rows, self.headers, self.release_date, self.dimension_keys, self.periods = local_read_csv(**kwargs)
+        try:
+            self._file, self._rows, self.headers, self.release_date, self.dimension_keys, self.periods = local_read_csv(**kwargs)
+        except Exception:
+            self.close()
+            raise
         
         self.dataset.dimension_keys = self.dimension_keys
         
         self.dataset.last_update = self.release_date
         
-        self.start_date = get_ordinal_from_period(self.periods[0], freq=self.frequency)
-        self.end_date = get_ordinal_from_period(self.periods[-1], freq=self.frequency)
+        self.ordinals = get_ordinals_from_periods(self.periods, freq=self.frequency)
+        self.start_date = self.ordinals[0]
+        self.end_date = self.ordinals[-1]
 
     def is_updated(self):
 
@@ -495,11 +487,11 @@ class BIS_Data(SeriesIterator):
 
         values = []
         
-        for period in self.periods:
+        for period, ordinal in zip(self.periods, self.ordinals):
             value = {
                 'attributes': None,
                 'release_date': self.release_date,
-                'ordinal': get_ordinal_from_period(period, freq=self.frequency),
+                'ordinal': ordinal,
                 #'period_o': period,
                 'period': period,
                 'value': row[period]
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+
+"""Compact layout of series values
+
+A series document (schema_version 1) store each observation as a dict::
+
+    "values": [{"period": "1960", "ordinal": -10, "value": "1.2",
+                "release_date": datetime, "attributes": None}, ...]
+
+The compact layout (schema_version 2) replace "values" by parallel arrays::
+
+    "schema_version": 2,
+    "values_compact": {
+        "start": -10,                  # first ordinal
+        "ordinals": None,              # offsets from start - None if contiguous
+        "periods": None,               # None if periods.format_period() of ordinals
+        "values": ["1.2", ...],
+        "release_dates": [datetime],   # distinct release dates
+        "release_index": None,         # index in release_dates - None if only one
+        "attributes": {"3": {...}},    # sparse - None if empty
+        "revisions": {"5": [...]},     # sparse - None if empty
+    }
+
+Use get_values() or expand_series() to read series of both layouts.
+"""
+
+import logging
+
+from bson import BSON
+from pymongo import UpdateOne
+
+from dlstats import constants
+from dlstats.periods import format_period
+from dlstats.fetchers.schemas import SERIES_COMPACT_SCHEMA_VERSION
+
+__all__ = [
+    "encode_values",
+    "decode_values",
+    "is_compact",
+    "get_values",
+    "compact_series",
+    "expand_series",
+    "migrate_series",
+]
+
+logger = logging.getLogger(__name__)
+
+def _sparse(values, field):
+    items = {}
+    for i, obs in enumerate(values):
+        if obs.get(field) is not None:
+            items[str(i)] = obs[field]
+    return items or None
+
+def encode_values(values, frequency):
+    """Return the compact form of a list of observations"""
+
+    ordinals = [obs["ordinal"] for obs in values]
+    start = ordinals[0] if ordinals else 0
+    offsets = [ordinal - start for ordinal in ordinals]
+    if offsets == list(range(len(offsets))):
+        offsets = None
+
+    periods = [obs["period"] for obs in values]
+    for ordinal, period in zip(ordinals, periods):
+        if format_period(ordinal, frequency) != period:
+            break
+    else:
+        periods = None
+
+    release_dates = []
+    release_index = []
+    indexes = {}
+    for obs in values:
+        release_date = obs["release_date"]
+        if not release_date in indexes:
+            indexes[release_date] = len(release_dates)
+            release_dates.append(release_date)
+        release_index.append(indexes[release_date])
+    if len(release_dates) <= 1:
+        release_index = None
+
+    return {
+        "start": start,
+        "ordinals": offsets,
+        "periods": periods,
+        "values": [obs["value"] for obs in values],
+        "release_dates": release_dates,
+        "release_index": release_index,
+        "attributes": _sparse(values, "attributes"),
+        "revisions": _sparse(values, "revisions"),
+    }
+
+def decode_values(compact, frequency):
+    """Return the list of observations of a compact form"""
+
+    start = compact["start"]
+    count = len(compact["values"])
+
+    offsets = compact.get("ordinals") or range(count)
+    ordinals = [start + offset for offset in offsets]
+
+    periods = compact.get("periods") or [format_period(ordinal, frequency)
+                                         for ordinal in ordinals]
+
+    release_dates = compact["release_dates"]
+    release_index = compact.get("release_index") or [0] * count
+
+    attributes = compact.get("attributes") or {}
+    revisions = compact.get("revisions") or {}
+
+    values = []
+    for i in range(count):
+        obs = {
+            "period": periods[i],
+            "ordinal": ordinals[i],
+            "value": compact["values"][i],
+            "release_date": release_dates[release_index[i]],
+            "attributes": attributes.get(str(i)),
+        }
+        if str(i) in revisions:
+            obs["revisions"] = revisions[str(i)]
+        values.append(obs)
+
+    return values
+
+def is_compact(bson):
+    return "values_compact" in bson
+
+def get_values(bson):
+    """Return the list of observations of a series of any layout"""
+    if is_compact(bson):
+        return decode_values(bson["values_compact"], bson["frequency"])
+    return bson["values"]
+
+def compact_series(bson):
+    """Convert series document to the compact layout (in place)"""
+    if not is_compact(bson):
+        bson["values_compact"] = encode_values(bson.pop("values"),
+                                               bson["frequency"])
+        bson["schema_version"] = SERIES_COMPACT_SCHEMA_VERSION
+    return bson
+
+def expand_series(bson):
+    """Convert series document to the default layout (in place)"""
+    if is_compact(bson):
+        bson["values"] = decode_values(bson.pop("values_compact"),
+                                       bson["frequency"])
+        bson.pop("schema_version", None)
+    return bson
+
+def migrate_series(db, query=None, compact=True, bulk_size=500):
+    """Convert series of db to the compact layout or back
+
+    :param dict query: Filter of series (provider_name, dataset_code...)
+    :param bool compact: True for compact layout - False for default layout
+    :return: dict with count, bytes_before and bytes_after
+    """
+
+    query = dict(query or {})
+    query["values_compact"] = {"$exists": not compact}
+
+    stats = {"count": 0, "bytes_before": 0, "bytes_after": 0}
+    col = db[constants.COL_SERIES]
+
+    def flush(bulk_requests):
+        if bulk_requests:
+            col.bulk_write(bulk_requests, ordered=False)
+
+    bulk_requests = []
+    for doc in col.find(query):
+        stats["bytes_before"] += len(BSON.encode(doc))
+        if compact:
+            compact_series(doc)
+            update = {"$set": {"values_compact": doc["values_compact"],
+                               "schema_version": doc["schema_version"]},
+                      "$unset": {"values": ""}}
+        else:
+            expand_series(doc)
+            update = {"$set": {"values": doc["values"]},
+                      "$unset": {"values_compact": "", "schema_version": ""}}
+        stats["bytes_after"] += len(BSON.encode(doc))
+        stats["count"] += 1
+
+        bulk_requests.append(UpdateOne({"_id": doc["_id"]}, update))
+        if len(bulk_requests) >= bulk_size:
+            flush(bulk_requests)
+            bulk_requests = []
+
+    flush(bulk_requests)
+
+    if logger.isEnabledFor(logging.INFO):
+        msg = "migrate series compact[%s] - count[%s] - bytes before[%s] - after[%s]"
+        logger.info(msg % (compact, stats["count"],
+                           stats["bytes_before"], stats["bytes_after"]))
+
+    return stats
@@ -10,7 +10,8 @@ import requests
 
 from dlstats.fetchers._commons import Fetcher, Datasets, Providers, SeriesIterator
 from dlstats import utils
-from dlstats.utils import Downloader
+from dlstats import structure_cache
+from dlstats.utils import Downloader, iter_downloads
 from dlstats.xml_utils import (XMLStructure_2_1 as XMLStructure, 
                                XMLSpecificData_2_1_ECB as XMLData,
                                dataset_converter,
@@ -94,7 +95,8 @@ class ECB(Fetcher):
         if self._dataflows and not force:
             return
         
-        self.xml_dsd = XMLStructure(provider_name=self.provider_name)       
+        self.xml_dsd = XMLStructure(provider_name=self.provider_name,
+                                    streaming=True)
         
         url = "http://sdw-wsrest.ecb.int/service/dataflow/%s" % self.provider_name
         download = utils.Downloader(store_filepath=self.store_path,
@@ -269,7 +271,8 @@ class ECB_Data(SeriesIterator):
         self.dsd_id = self.fetcher._dataflows[self.dataset_code]["dsd_id"]
         self.agency_id = self.fetcher._dataflows[self.dataset_code]["attrs"].get("agencyID")
 
-        self.xml_dsd = XMLStructure(provider_name=self.provider_name)        
+        self.xml_dsd = XMLStructure(provider_name=self.provider_name,
+                                    streaming=True)
         #self.xml_dsd.concepts = self.fetcher._concepts
         
         self._load()
@@ -278,15 +281,26 @@ class ECB_Data(SeriesIterator):
                 
     def _load(self):
 
-        url = "http://sdw-wsrest.ecb.int/service/datastructure/%s/%s?references=all" % (self.agency_id, self.dsd_id)
-        download = utils.Downloader(store_filepath=self.store_path,
-                                    url=url, 
-                                    filename="dsd-%s.xml" % self.dataset_code,
-                                    headers=SDMX_METADATA_HEADERS,
-                                    use_existing_file=self.fetcher.use_existing_file)
-        filepath = download.get_filepath()
-        self.fetcher.for_delete.append(filepath)
-        self.xml_dsd.process(filepath)
+        dsd_version = self.fetcher._dataflows[self.dataset_code].get("dsd_version")
+        cache_key = structure_cache.get_key(self.provider_name, self.agency_id, 
+                                            self.dsd_id, dsd_version)
+        
+        if not structure_cache.load_structure(self.xml_dsd, cache_key):
+
+            url = "http://sdw-wsrest.ecb.int/service/datastructure/%s/%s?references=all" % (self.agency_id, self.dsd_id)
+            download = utils.Downloader(store_filepath=self.store_path,
+                                        url=url, 
+                                        filename="dsd-%s.xml" % self.dataset_code,
+                                        headers=SDMX_METADATA_HEADERS,
+                                        use_existing_file=self.fetcher.use_existing_file)
+            filepath = download.get_filepath()
+            self.fetcher.for_delete.append(filepath)
+            
+            validator = structure_cache.get_validator(filepath, download.response_headers)
+            if not structure_cache.load_structure(self.xml_dsd, cache_key, validator):
+                self.xml_dsd.process(filepath)
+                structure_cache.store_structure(self.xml_dsd, cache_key, validator)
+            
         self._set_dataset()
         
     def _get_dimensions_from_dsd(self):
@@ -306,33 +320,39 @@ class ECB_Data(SeriesIterator):
         
         count_dimensions = len(dimension_keys)
         
-        for dimension_value in dimension_values:
-            sdmx_key = []
-            for i in range(count_dimensions):
-                if i == position:
-                    sdmx_key.append(dimension_value)
-                else:
-                    sdmx_key.append(".")
-            key = "".join(sdmx_key)
-
-            #http://sdw-wsrest.ecb.int/service/data/IEAQ/A............
-            url = "http://sdw-wsrest.ecb.int/service/data/%s/%s" % (self.dataset_code, key)
-            headers = SDMX_DATA_HEADERS
+        headers = dict(SDMX_DATA_HEADERS)
+        
+        last_modified = None
+        if self.dataset.metadata and "Last-Modified" in self.dataset.metadata:
+            headers["If-Modified-Since"] = self.dataset.metadata["Last-Modified"]
+            last_modified = self.dataset.metadata["Last-Modified"]
+        
+        def downloads():
+            for dimension_value in dimension_values:
+                sdmx_key = []
+                for i in range(count_dimensions):
+                    if i == position:
+                        sdmx_key.append(dimension_value)
+                    else:
+                        sdmx_key.append(".")
+                key = "".join(sdmx_key)
+    
+                #http://sdw-wsrest.ecb.int/service/data/IEAQ/A............
+                url = "http://sdw-wsrest.ecb.int/service/data/%s/%s" % (self.dataset_code, key)
             
-            last_modified = None
-            if self.dataset.metadata and "Last-Modified" in self.dataset.metadata:
-                headers["If-Modified-Since"] = self.dataset.metadata["Last-Modified"]
-                last_modified = self.dataset.metadata["Last-Modified"]
+                filename = "data-%s-%s.xml" % (self.dataset_code, key.replace(".", "_"))               
+                download = Downloader(url=url, 
+                                      filename=filename,
+                                      store_filepath=self.store_path,
+                                      headers=headers,
+                                      use_existing_file=self.fetcher.use_existing_file,
+                                      max_retries=3,
+                                      #client=self.fetcher.requests_client
+                                      )
+                yield key, download
         
-            filename = "data-%s-%s.xml" % (self.dataset_code, key.replace(".", "_"))               
-            download = Downloader(url=url, 
-                                  filename=filename,
-                                  store_filepath=self.store_path,
-                                  headers=headers,
-                                  use_existing_file=self.fetcher.use_existing_file,
-                                  #client=self.fetcher.requests_client
-                                  )
-            filepath, response = download.get_filepath_and_response()
+        for key, filepath, response in iter_downloads(downloads(), 
+                                                      workers=self.fetcher.download_workers):
 
             if filepath:
                 self.fetcher.for_delete.append(filepath)
@@ -15,7 +15,7 @@ import pandas
 from lxml import etree
 import requests
 
-from dlstats.utils import Downloader, get_ordinal_from_period, make_store_path
+from dlstats.utils import Downloader, get_ordinal_from_period
 from dlstats.fetchers._commons import Fetcher, Datasets, Providers, Categories
 
 VERSION = 2
@@ -558,8 +558,7 @@ class EsriData:
         self.dataset.add_frequency(self.frequency)
 
     def get_store_path(self):
-        return make_store_path(base_path=self.fetcher.store_path,
-                               dataset_code=self.dataset_code)
+        return self.fetcher.get_dataset_store_path(self.dataset_code)
 
     def _load_datas(self):
         # TODO: timeout, replace
@@ -657,12 +656,6 @@ class EsriData:
 
     def clean_field(self, bson):
 
-        if not "start_ts" in bson or not bson.get("start_ts"):
-            bson["start_ts"] = pandas.Period(ordinal=bson["start_date"], freq=bson["frequency"]).start_time.to_datetime()
-
-        if not "end_ts" in bson or not bson.get("end_ts"):
-            bson["end_ts"] = pandas.Period(ordinal=bson["end_date"], freq=bson["frequency"]).end_time.to_datetime()
-        
         return bson
 
     def _build_series(self, column, key, name):
@@ -10,15 +10,13 @@
 from collections import OrderedDict
 from datetime import datetime
 import logging
-import zipfile
-import os
 
 from lxml import etree
 
 from widukind_common import errors
 
 from dlstats import constants
-from dlstats.utils import Downloader
+from dlstats.utils import Downloader, open_zip_member
 from dlstats.fetchers._commons import Fetcher, Datasets, Providers, SeriesIterator
 from dlstats.xml_utils import (XMLStructure_2_0 as XMLStructure, 
                                XMLCompactData_2_0_EUROSTAT as XMLData,
@@ -52,25 +50,6 @@ def first_element_xpath(values, default=None):
     
     return default
     
-def extract_zip_file(zipfilepath):
-    """Extract first file in zip file and return absolute path for the file extracted
-    
-    :param str filepath: Absolute file path of zip file
-    
-    Example: 
-        file1.zip contains one file: file1.csv
-    
-    >>> extract_zip_file('/tmp/file1.zip')
-    '/tmp/file1.csv'
-        
-    """
-    zfile = zipfile.ZipFile(zipfilepath)
-    filepaths = {}
-    for filename in zfile.namelist():
-        filepaths.update({filename: zfile.extract(filename, 
-                                                  os.path.dirname(zipfilepath))})
-    return filepaths
-
 def make_url(dataset_code):
     return("http://ec.europa.eu/eurostat/" +
            "estat-navtree-portlet-prod/" +
@@ -295,19 +274,14 @@ class Eurostat(Fetcher):
 
         selected_datasets = {s['dataset_code'] : s for s in cursor}
 
+        update_codes = []
         for dataset in datasets_list:
             dataset_code = dataset["dataset_code"]
             
             if (dataset_code not in selected_datasets) or (selected_datasets[dataset_code]['last_update'] < dataset['last_update']):
-                try:
-                    self.wrap_upsert_dataset(dataset_code)
-                except Exception as err:
-                    if isinstance(err, errors.MaxErrors):
-                        raise
-                    msg = "error for provider[%s] - dataset[%s]: %s"
-                    logger.critical(msg % (self.provider_name, 
-                                           dataset_code, 
-                                           str(err)))
+                update_codes.append(dataset_code)
+
+        return self.run_datasets(update_codes)
 
 
 class EurostatData(SeriesIterator):
@@ -330,17 +304,22 @@ class EurostatData(SeriesIterator):
         download = Downloader(url=self.dataset_url, 
                               filename="data-%s.zip" % self.dataset_code,
                               store_filepath=self.store_path,
-                              use_existing_file=self.fetcher.use_existing_file)
+                              use_existing_file=self.fetcher.use_existing_file,
+                              max_retries=3)
         
-        filepaths = (extract_zip_file(download.get_filepath()))
-        dsd_fp = filepaths[self.dataset_code + ".dsd.xml"]        
-        data_fp = filepaths[self.dataset_code + ".sdmx.xml"]
+        zip_filepath = download.get_filepath()
+        self.fetcher.for_delete.append(zip_filepath)
         
-        self.fetcher.for_delete.append(dsd_fp)
-        self.fetcher.for_delete.append(data_fp)        
+        '''skip parsing if zip file is the same as in last update'''
+        self.check_download_changed(download)
         
-        self.xml_dsd.process(dsd_fp)
+        '''xml files are parsed from zip file without extraction'''
+        with open_zip_member(zip_filepath, self.dataset_code + ".dsd.xml") as dsd_fp:
+            self.xml_dsd.process(dsd_fp)
         self._set_dataset()
+        
+        data_fp = open_zip_member(zip_filepath, self.dataset_code + ".sdmx.xml")
+        self.fileobjs.append(data_fp)
 
         self.xml_data = XMLData(provider_name=self.provider_name,
                                 dataset_code=self.dataset_code,
@@ -1,11 +1,10 @@
 # -*- coding: utf-8 -*-
 
-import os
 import logging
-import zipfile
 
 from dlstats.fetchers._commons import Fetcher, Datasets, Providers, SeriesIterator
-from dlstats.utils import Downloader, clean_datetime, clean_dict, clean_key
+from dlstats.utils import (Downloader, clean_datetime, clean_dict, clean_key,
+                           zip_namelist, open_zip_member)
 from dlstats.xml_utils import (XMLStructure_1_0 as XMLStructure, 
                                XMLData_1_0_FED as XMLData,
                                dataset_converter)
@@ -1243,21 +1242,20 @@ CATEGORIES = [
         },             
 ]
 
-def extract_zip_file(zipfilepath):
-    zfile = zipfile.ZipFile(zipfilepath)
-    filepaths = {}
-    for filename in zfile.namelist():
+def get_zip_members(zipfilepath):
+    """Return dict of member names of zip file - struct.xml and data.xml 
+    keys for the *struct.xml and *data.xml members"""
+    members = {}
+    for filename in zip_namelist(zipfilepath):
         if filename.endswith("struct.xml"):
             key = "struct.xml"
         elif filename.endswith("data.xml"):
             key = "data.xml"
         else:
             key = filename
+        members[key] = filename
 
-        filepath = zfile.extract(filename, os.path.dirname(zipfilepath))
-        filepaths[key] = os.path.abspath(filepath)
-
-    return filepaths
+    return members
 
 class FED(Fetcher):
     
@@ -1309,19 +1307,23 @@ class FED_Data(SeriesIterator):
         download = Downloader(url=self.url, 
                               store_filepath=self.store_path,
                               filename="data-%s.zip" % self.dataset_code,
-                              use_existing_file=self.fetcher.use_existing_file)
+                              use_existing_file=self.fetcher.use_existing_file,
+                              max_retries=3)
         zip_filepath = download.get_filepath()
         self.fetcher.for_delete.append(zip_filepath)
         
-        filepaths = (extract_zip_file(zip_filepath))
-        dsd_fp = filepaths['struct.xml']
-        data_fp = filepaths['data.xml']
-        
-        for filepath in filepaths.values():
-            self.fetcher.for_delete.append(filepath)
+        '''skip parsing if zip file is the same as in last update'''
+        self.check_download_changed(download)
+
+        '''xml files are parsed from zip file without extraction'''
+        members = get_zip_members(zip_filepath)
         
-        self.xml_dsd.process(dsd_fp)
+        with open_zip_member(zip_filepath, members['struct.xml']) as dsd_fp:
+            self.xml_dsd.process(dsd_fp)
         self._set_dataset()
+        
+        data_fp = open_zip_member(zip_filepath, members['data.xml'])
+        self.fileobjs.append(data_fp)
 
         self.xml_data = XMLData(provider_name=self.provider_name,
                                 dataset_code=self.dataset_code,
@@ -11,7 +11,7 @@ from lxml import etree
 
 from widukind_common import errors
 
-from dlstats.utils import Downloader, get_ordinal_from_period, clean_datetime, clean_key, clean_dict
+from dlstats.utils import Downloader, get_ordinals_from_periods, clean_datetime, clean_key, clean_dict, iter_downloads
 from dlstats.fetchers._commons import Fetcher, Datasets, Providers, SeriesIterator
 from dlstats import constants
 from dlstats.xml_utils import (XMLStructure_2_0 as XMLStructure, 
@@ -751,26 +751,31 @@ class IMF_XML_Data(SeriesIterator):
         
         count_dimensions = len(dimension_keys)
         
-        for dimension_value in dimension_values:
-            '''Pour chaque valeur de la dimension, generer une key d'url'''
-            
-            local_count = 0
+        def downloads():
+            for dimension_value in dimension_values:
+                '''Pour chaque valeur de la dimension, generer une key d'url'''
                         
-            sdmx_key = []
-            for i in range(count_dimensions):
-                if i == position:
-                    sdmx_key.append(dimension_value)
-                else:
-                    sdmx_key.append(".")
-            key = "".join(sdmx_key)
+                sdmx_key = []
+                for i in range(count_dimensions):
+                    if i == position:
+                        sdmx_key.append(dimension_value)
+                    else:
+                        sdmx_key.append(".")
+                key = "".join(sdmx_key)
 
-            url = "%s/%s" % (self._get_url_data(), key)
-            filename = "data-%s-%s.xml" % (self.dataset_code, key.replace(".", "_"))
-            download = Downloader(url=url, 
-                                  filename=filename,
-                                  store_filepath=self.store_path,
-                                  client=self.fetcher.requests_client)            
-            filepath, response = download.get_filepath_and_response()
+                url = "%s/%s" % (self._get_url_data(), key)
+                filename = "data-%s-%s.xml" % (self.dataset_code, key.replace(".", "_"))
+                download = Downloader(url=url, 
+                                      filename=filename,
+                                      store_filepath=self.store_path,
+                                      client=self.fetcher.requests_client,
+                                      max_retries=3)
+                yield key, download
+        
+        for key, filepath, response in iter_downloads(downloads(), 
+                                                      workers=self.fetcher.download_workers):
+            
+            local_count = 0
 
             if filepath:
                 self.fetcher.for_delete.append(filepath)
@@ -889,10 +894,10 @@ class WeoData(SeriesIterator):
                 
                 self.sheet = csv.DictReader(fp, dialect=csv.excel_tab)
                 self.years = self.sheet.fieldnames[9:-1]
-                self.start_date = get_ordinal_from_period(self.years[0], 
+                self.ordinals = get_ordinals_from_periods(self.years, 
                                                           freq=self.frequency)
-                self.end_date = get_ordinal_from_period(self.years[-1], 
-                                                        freq=self.frequency)
+                self.start_date = self.ordinals[0]
+                self.end_date = self.ordinals[-1]
                 
                 for row in self.sheet:
                     if not row or not row.get('Country'):
@@ -990,11 +995,11 @@ class WeoData(SeriesIterator):
         if row['Estimates Start After']:
             estimation_start = int(row['Estimates Start After'])
             
-        for period in self.years:
+        for period, ordinal in zip(self.years, self.ordinals):
             value = {
                 'attributes': None,
                 'release_date': self.release_date,
-                'ordinal': get_ordinal_from_period(period, freq=self.frequency),
+                'ordinal': ordinal,
                 'period': period,
                 'value': row[period].replace(',' ,'')
             }
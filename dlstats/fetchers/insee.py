@@ -13,7 +13,8 @@ from widukind_common import errors
 
 from dlstats.fetchers._commons import Fetcher, Datasets, Providers, SeriesIterator
 from dlstats import constants
-from dlstats.utils import Downloader, clean_datetime
+from dlstats import structure_cache
+from dlstats.utils import Downloader, clean_datetime, iter_downloads
 from dlstats.xml_utils import (XMLSDMX_2_1 as XMLSDMX,
                                XMLStructure_2_1 as XMLStructure, 
                                XMLSpecificData_2_1_INSEE as XMLData,
@@ -103,7 +104,8 @@ class INSEE(Fetcher):
         self.xml_sdmx = XMLSDMX(agencyID=self.provider_name)
         
         self.xml_dsd = XMLStructure(provider_name=self.provider_name,
-                                    sdmx_client=self.xml_sdmx)       
+                                    sdmx_client=self.xml_sdmx,
+                                    streaming=True)       
         
         url = "http://www.bdm.insee.fr/series/sdmx/dataflow/%s" % self.provider_name
         download = Downloader(url=url, 
@@ -294,8 +296,7 @@ class INSEE_Data(SeriesIterator):
         else:
             self.last_update = self.dataset.download_last #self.dataset.last_update
 
-        self.xml_dsd = XMLStructure(provider_name=self.provider_name,
-                                    sdmx_client=self.fetcher.xml_sdmx)        
+        self.xml_dsd = self._new_xml_dsd()
         self.xml_dsd.concepts = self.fetcher._concepts
         self.xml_dsd.codelists = self.fetcher._codelists
 
@@ -309,6 +310,11 @@ class INSEE_Data(SeriesIterator):
         
         self.rows = self._get_data_by_dimension()
 
+    def _new_xml_dsd(self):
+        return XMLStructure(provider_name=self.provider_name,
+                            sdmx_client=self.fetcher.xml_sdmx,
+                            streaming=True)
+
     def _load_dsd_by_element(self):
         
         #FIXME: Manque codelist et concepts ?
@@ -331,6 +337,14 @@ class INSEE_Data(SeriesIterator):
         - download 1 dsd partage par plusieurs dataset
         - 668 datase
         """
+        
+        dsd_version = self.fetcher._dataflows[self.dataset_code].get("dsd_version")
+        cache_key = structure_cache.get_key(self.provider_name, self.provider_name, 
+                                            self.dsd_id, dsd_version)
+        
+        if structure_cache.load_structure(self.xml_dsd, cache_key):
+            self._set_dataset()
+            return
 
         url = "http://www.bdm.insee.fr/series/sdmx/datastructure/INSEE/%s?references=children" % self.dsd_id
         download = Downloader(url=url, 
@@ -353,7 +367,21 @@ class INSEE_Data(SeriesIterator):
             return
         
         self.fetcher.for_delete.append(filepath)
-        self.xml_dsd.process(filepath)
+        
+        validator = structure_cache.get_validator(filepath, download.response_headers)
+        if not structure_cache.load_structure(self.xml_dsd, cache_key, validator):
+            if structure_cache.structure_cache:
+                '''codelists and concepts of xml_dsd are shared by all dsd of 
+                the fetcher: the dsd is parsed in a new instance for a cache 
+                entry with only its structures'''
+                xml_dsd = self._new_xml_dsd()
+                xml_dsd.process(filepath)
+                state = xml_dsd.get_state()
+                structure_cache.structure_cache.set(cache_key, state, validator)
+                self.xml_dsd.set_state(state)
+            else:
+                self.xml_dsd.process(filepath)
+        
         self._set_dataset()
         
     def _set_dataset(self):
@@ -383,25 +411,30 @@ class INSEE_Data(SeriesIterator):
         
         logger.info("choice[%s] - filterkey[%s] - count[%s] - provider[%s] - dataset[%s]" % (choice, _key, len(dimension_values), self.provider_name, self.dataset_code))
         
-        for dimension_value in dimension_values:
-            '''Pour chaque valeur de la dimension, generer une key d'url'''
+        def downloads():
+            for dimension_value in dimension_values:
+                '''Pour chaque valeur de la dimension, generer une key d'url'''
             
-            sdmx_key = []
-            for i in range(count_dimensions):
-                if i == position:
-                    sdmx_key.append(dimension_value)
-                else:
-                    sdmx_key.append(".")
-            key = "".join(sdmx_key)
-
-            url = "http://www.bdm.insee.fr/series/sdmx/data/%s/%s" % (self.dataset_code, key)
-            filename = "data-%s-%s.xml" % (self.dataset_code, key.replace(".", "_"))
-            download = Downloader(url=url, 
-                                  filename=filename,
-                                  store_filepath=self.store_path,
-                                  #client=self.fetcher.requests_client
-                                  )
-            filepath, response = download.get_filepath_and_response()
+                sdmx_key = []
+                for i in range(count_dimensions):
+                    if i == position:
+                        sdmx_key.append(dimension_value)
+                    else:
+                        sdmx_key.append(".")
+                key = "".join(sdmx_key)
+
+                url = "http://www.bdm.insee.fr/series/sdmx/data/%s/%s" % (self.dataset_code, key)
+                filename = "data-%s-%s.xml" % (self.dataset_code, key.replace(".", "_"))
+                download = Downloader(url=url, 
+                                      filename=filename,
+                                      store_filepath=self.store_path,
+                                      max_retries=3,
+                                      #client=self.fetcher.requests_client
+                                      )
+                yield key, download
+        
+        for key, filepath, response in iter_downloads(downloads(), 
+                                                      workers=self.fetcher.download_workers):
 
             if filepath:
                 self.fetcher.for_delete.append(filepath)
@@ -5,7 +5,8 @@ import logging
 import requests
 
 from dlstats.fetchers._commons import Fetcher, Datasets, Providers, SeriesIterator
-from dlstats.utils import Downloader, clean_datetime
+from dlstats.utils import Downloader, clean_datetime, iter_downloads
+from dlstats import structure_cache
 from dlstats.xml_utils import (XMLStructure_2_0 as XMLStructure, 
                                XMLGenericData_2_0_OECD as XMLData,
                                dataset_converter,
@@ -133,16 +134,25 @@ class OECD_Data(SeriesIterator):
         return "http://stats.oecd.org/restsdmx/sdmx.ashx/GetData/%s" % self.dataset_code 
         
     def _load_dsd(self):
-        url = self._get_url_dsd()
-        download = Downloader(store_filepath=self.store_path,
-                              url=url, 
-                              filename="dsd-%s.xml" % self.dataset_code,
-                              use_existing_file=self.fetcher.use_existing_file,
-                              client=self.fetcher.requests_client)
-        filepath = download.get_filepath()
-        self.fetcher.for_delete.append(filepath)
-        
-        self.xml_dsd.process(filepath)
+        cache_key = structure_cache.get_key(self.provider_name, self.provider_name, 
+                                            self.dataset_code)
+        
+        if not structure_cache.load_structure(self.xml_dsd, cache_key):
+        
+            url = self._get_url_dsd()
+            download = Downloader(store_filepath=self.store_path,
+                                  url=url, 
+                                  filename="dsd-%s.xml" % self.dataset_code,
+                                  use_existing_file=self.fetcher.use_existing_file,
+                                  client=self.fetcher.requests_client)
+            filepath = download.get_filepath()
+            self.fetcher.for_delete.append(filepath)
+            
+            validator = structure_cache.get_validator(filepath, download.response_headers)
+            if not structure_cache.load_structure(self.xml_dsd, cache_key, validator):
+                self.xml_dsd.process(filepath)
+                structure_cache.store_structure(self.xml_dsd, cache_key, validator)
+        
         self._set_dataset()
 
     def _set_dataset(self):
@@ -170,24 +180,28 @@ class OECD_Data(SeriesIterator):
         
         count_dimensions = len(dimension_keys)
         
-        for dimension_value in dimension_values:
+        def downloads():
+            for dimension_value in dimension_values:
             
-            sdmx_key = []
-            for i in range(count_dimensions):
-                if i == position:
-                    sdmx_key.append(dimension_value)
-                else:
-                    sdmx_key.append(".")
-            key = "".join(sdmx_key)
-
-            url = "%s/%s" % (self._get_url_data(), key)
-            filename = "data-%s-%s.xml" % (self.dataset_code, key.replace(".", "_"))
-            download = Downloader(url=url, 
-                                  filename=filename,
-                                  store_filepath=self.store_path,
-                                  client=self.fetcher.requests_client
-                                  )
-            filepath, response = download.get_filepath_and_response()
+                sdmx_key = []
+                for i in range(count_dimensions):
+                    if i == position:
+                        sdmx_key.append(dimension_value)
+                    else:
+                        sdmx_key.append(".")
+                key = "".join(sdmx_key)
+
+                url = "%s/%s" % (self._get_url_data(), key)
+                filename = "data-%s-%s.xml" % (self.dataset_code, key.replace(".", "_"))
+                download = Downloader(url=url, 
+                                      filename=filename,
+                                      store_filepath=self.store_path,
+                                      client=self.fetcher.requests_client,
+                                      max_retries=3)
+                yield key, download
+        
+        for key, filepath, response in iter_downloads(downloads(), 
+                                                      workers=self.fetcher.download_workers):
 
             if filepath:
                 self.fetcher.for_delete.append(filepath)
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+"""Fetchers report: series count and downloads of the datasets
+
+The series are counted by one $group aggregation on the series collection
+instead of one count() by dataset. With stored_counts, the series_count
+field of the datasets (updated by Datasets.update_database) is used and
+only the datasets without series_count are aggregated.
+"""
+
+import csv
+import json
+from operator import itemgetter
+
+from dlstats import constants
+from dlstats.utils import json_dump_convert
+
+REPORT_FIELDS = ["provider_name", "enable", "version", "dataset_code",
+                 "series", "last_update", "download_first", "download_last"]
+
+REPORT_SORTS = {
+    "provider": ("provider_name", "dataset_code"),
+    "dataset": ("dataset_code", "provider_name"),
+    "series": ("series", "provider_name", "dataset_code"),
+}
+
+def series_counts(db, provider_names=None):
+    """Return dict of series count by (provider_name, dataset_code)
+
+    :param list provider_names: Count only series of this providers
+    """
+    pipeline = []
+    if provider_names is not None:
+        pipeline.append({"$match": {"provider_name": {"$in": list(provider_names)}}})
+    pipeline.append({"$group": {"_id": {"provider_name": "$provider_name",
+                                        "dataset_code": "$dataset_code"},
+                                "count": {"$sum": 1}}})
+    counts = {}
+    for doc in db[constants.COL_SERIES].aggregate(pipeline, allowDiskUse=True):
+        counts[(doc["_id"]["provider_name"], doc["_id"]["dataset_code"])] = doc["count"]
+    return counts
+
+def get_report(db, provider_name=None, sort="provider", reverse=False,
+               stored_counts=False):
+    """Return list of report rows (dict of REPORT_FIELDS) by dataset
+
+    :param str provider_name: Report only this provider
+    :param str sort: provider, dataset or series
+    :param bool reverse: Descending sort
+    :param bool stored_counts: Use series_count of the datasets if present
+    """
+    query = {}
+    if provider_name:
+        query["name"] = provider_name
+    providers = {doc["name"]: doc for doc in db[constants.COL_PROVIDERS].find(query)}
+
+    datasets = list(db[constants.COL_DATASETS].find({"provider_name": {"$in": list(providers.keys())}},
+                                                    {"codelists": False, "concepts": False}))
+
+    missing = [doc for doc in datasets if not stored_counts or doc.get("series_count") is None]
+    counts = {}
+    if missing:
+        counts = series_counts(db, set(doc["provider_name"] for doc in missing))
+
+    rows = []
+    for dataset in datasets:
+        provider = providers[dataset["provider_name"]]
+        key = (dataset["provider_name"], dataset["dataset_code"])
+        if stored_counts and dataset.get("series_count") is not None:
+            count = dataset["series_count"]
+        else:
+            count = counts.get(key, 0)
+        rows.append({
+            "provider_name": provider["name"],
+            "enable": provider["enable"],
+            "version": provider["version"],
+            "dataset_code": dataset["dataset_code"],
+            "series": count,
+            "last_update": dataset.get("last_update"),
+            "download_first": dataset.get("download_first"),
+            "download_last": dataset.get("download_last"),
+        })
+
+    if not sort in REPORT_SORTS:
+        raise ValueError("invalid report sort[%s]" % sort)
+    rows.sort(key=itemgetter(*REPORT_SORTS[sort]), reverse=reverse)
+    return rows
+
+def _strftime(value, fmt):
+    return value.strftime(fmt) if value else ""
+
+def write_table(rows, stream, mongo_url=None):
+    line = "-" * 123
+    fmt = "{0:10} | {1:4} | {2:30} | {3:10} | {4:15} | {5:20} | {6:20}"
+    print(line, file=stream)
+    print("MongoDB: %s :" % mongo_url, file=stream)
+    print(line, file=stream)
+    print(fmt.format("Provider", "Ver.", "Dataset", "Series", "Last Update", "First Download", "last Download"), file=stream)
+    print(line, file=stream)
+    for row in rows:
+        if not row["enable"]:
+            _provider = "%s *" % row["provider_name"]
+        else:
+            _provider = row["provider_name"]
+        print(fmt.format(_provider,
+                         row["version"],
+                         row["dataset_code"],
+                         row["series"],
+                         _strftime(row["last_update"], "%Y-%m-%d"),
+                         _strftime(row["download_first"], "%Y-%m-%d - %H:%M"),
+                         _strftime(row["download_last"], "%Y-%m-%d - %H:%M")), file=stream)
+    print(line, file=stream)
+
+def write_json(rows, stream, pretty=False):
+    json.dump(rows, stream, default=json_dump_convert,
+              indent=4 if pretty else None)
+    stream.write("\n")
+
+def write_csv(rows, stream):
+    writer = csv.DictWriter(stream, fieldnames=REPORT_FIELDS)
+    writer.writeheader()
+    for row in rows:
+        row = dict(row)
+        for field in ["last_update", "download_first", "download_last"]:
+            row[field] = _strftime(row[field], "%Y-%m-%dT%H:%M:%S")
+        writer.writerow(row)
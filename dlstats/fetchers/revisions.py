@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+"""Storage of observations revisions
+
+With the "inline" storage (default), revisions are kept in the
+"revisions" list of each observation of the series document.
+
+With the "collection" storage, revisions are moved to the append-only
+collection constants.COL_SERIES_REVISIONS, one document by
+(slug, ordinal, revision_date)::
+
+    {"slug": "insee-idbank-001694056", "provider_name": "INSEE",
+     "dataset_code": "IPI-2010-A21", "ordinal": 552, "period": "2016-01",
+     "revision_date": datetime, "value": "1.2", "attributes": None}
+
+The series document keeps only the latest values.
+"""
+
+import logging
+
+import pymongo
+from pymongo import UpdateOne
+
+from dlstats import constants
+from dlstats.fetchers.compact import get_values
+
+__all__ = [
+    "REVISIONS_INLINE",
+    "REVISIONS_COLLECTION",
+    "REVISIONS_STORAGES",
+    "create_revisions_indexes",
+    "has_revisions",
+    "pop_revisions",
+    "write_revisions",
+    "get_revisions",
+    "series_vintage",
+]
+
+logger = logging.getLogger(__name__)
+
+REVISIONS_INLINE = "inline"
+REVISIONS_COLLECTION = "collection"
+REVISIONS_STORAGES = [REVISIONS_INLINE, REVISIONS_COLLECTION]
+
+def create_revisions_indexes(db):
+    db[constants.COL_SERIES_REVISIONS].create_index(
+        [("slug", pymongo.ASCENDING),
+         ("ordinal", pymongo.ASCENDING),
+         ("revision_date", pymongo.ASCENDING)],
+        name="slug_ordinal_revision_date_idx", unique=True)
+
+def has_revisions(bson):
+    """Return True if observations of bson contains revisions"""
+    for obs in bson["values"]:
+        if obs.get("revisions"):
+            return True
+    return False
+
+def pop_revisions(bson):
+    """Remove revisions of observations and return revisions documents"""
+    docs = []
+    for obs in bson["values"]:
+        for revision in obs.pop("revisions", None) or []:
+            docs.append({
+                "slug": bson["slug"],
+                "provider_name": bson["provider_name"],
+                "dataset_code": bson["dataset_code"],
+                "ordinal": obs["ordinal"],
+                "period": obs["period"],
+                "revision_date": revision["revision_date"],
+                "value": revision["value"],
+                "attributes": revision.get("attributes"),
+            })
+    return docs
+
+def write_revisions(db, docs):
+    """Append revisions documents - already stored revisions are ignored"""
+    if not docs:
+        return None
+    bulk_requests = []
+    for doc in docs:
+        query = {"slug": doc["slug"],
+                 "ordinal": doc["ordinal"],
+                 "revision_date": doc["revision_date"]}
+        bulk_requests.append(UpdateOne(query, {"$setOnInsert": doc}, upsert=True))
+    return db[constants.COL_SERIES_REVISIONS].bulk_write(bulk_requests,
+                                                         ordered=False)
+
+def get_revisions(db, slug, ordinals=None):
+    """Return revisions of a series sorted by ordinal and revision_date"""
+    query = {"slug": slug}
+    if ordinals is not None:
+        query["ordinal"] = {"$in": list(ordinals)}
+    cursor = db[constants.COL_SERIES_REVISIONS].find(query, {"_id": False})
+    return sorted(cursor, key=lambda doc: (doc["ordinal"], doc["revision_date"]))
+
+def series_vintage(db, slug, date):
+    """Return the observations of a series as known at date
+
+    Revisions are read from the observations (inline storage) and from
+    the revisions collection. Observations released after date without
+    previous revision are not returned.
+
+    :return: list of dict (period, ordinal, value, attributes, release_date)
+             or None if series not found
+    """
+    bson = db[constants.COL_SERIES].find_one({"slug": slug})
+    if not bson:
+        return None
+
+    stored = {}
+    for doc in get_revisions(db, slug):
+        stored.setdefault(doc["ordinal"], []).append(doc)
+
+    values = []
+    for obs in get_values(bson):
+        if obs["release_date"] <= date:
+            versions = [(obs["release_date"], obs)]
+        else:
+            versions = [(revision["revision_date"], revision)
+                        for revision in (obs.get("revisions") or []) + stored.get(obs["ordinal"], [])
+                        if revision["revision_date"] <= date]
+        if not versions:
+            continue
+        release_date, version = max(versions, key=lambda item: item[0])
+        values.append({
+            "period": obs["period"],
+            "ordinal": obs["ordinal"],
+            "value": version["value"],
+            "attributes": version.get("attributes"),
+            "release_date": release_date,
+        })
+    return values
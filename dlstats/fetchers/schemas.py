@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 from datetime import datetime
+import itertools
 
 from voluptuous import All, Length, Schema, Invalid, Optional, Any, Extra, Range
 
@@ -81,6 +82,8 @@ dataset_schema = Schema({
     'slug': All(str, Length(min=1)),
     'download_first': typecheck(datetime),
     'download_last': typecheck(datetime),
+    Optional('series_count'): Any(None, int),
+    Optional('download_digests'): Any(None, [str]),
     },required=True)
 
 series_revision_schema = Schema({
@@ -114,6 +117,183 @@ series_schema = Schema({
     Optional('notes'): Any(None, str),
     Optional('tags'): Any(None, list),
     'slug': All(str, Length(min=1)),
+    Optional('digest'): Any(None, str),
 }, required=True)
 
 
+
+"""Compact layout of series values (schema_version 2)
+
+Observations are stored as parallel arrays from the start ordinal.
+See dlstats.fetchers.compact for reader and writer.
+"""
+
+SERIES_SCHEMA_VERSION = 1
+SERIES_COMPACT_SCHEMA_VERSION = 2
+
+series_compact_values_schema = Schema({
+    'start': int,
+    'ordinals': Any(None, [int]),
+    'periods': Any(None, [str]),
+    'values': [str],
+    'release_dates': [date_validator],
+    'release_index': Any(None, [int]),
+    'attributes': Any(None, {str: dict}),
+    'revisions': Any(None, {str: [series_revision_schema]}),
+}, required=True)
+
+_series_compact_fields = dict(series_schema.schema)
+_series_compact_fields.pop('values')
+_series_compact_fields.update({
+    'schema_version': SERIES_COMPACT_SCHEMA_VERSION,
+    'values_compact': series_compact_values_schema,
+})
+series_compact_schema = Schema(_series_compact_fields, required=True)
+
+SERIES_SCHEMAS = {
+    SERIES_SCHEMA_VERSION: series_schema,
+    SERIES_COMPACT_SCHEMA_VERSION: series_compact_schema,
+}
+
+def series_schema_versioned(bson):
+    """Validate a series document with the schema of its schema_version"""
+    version = bson.get('schema_version', SERIES_SCHEMA_VERSION)
+    if not version in SERIES_SCHEMAS:
+        raise Invalid('unknown series schema_version[%s]' % version)
+    return SERIES_SCHEMAS[version](bson)
+
+"""Compiled validation of series documents
+
+Hand written checks of series_schema, series_value_schema and 
+series_revision_schema. The checks only return True or False: the 
+voluptuous schema is called for the invalid documents and raise the 
+errors, the errors are identical to the voluptuous backend.
+"""
+
+SCHEMAS_VALIDATION_BACKENDS = ["voluptuous", "compiled"]
+
+_SERIES_KEYS = frozenset(['name', 'provider_name', 'key', 'dataset_code', 
+                          'start_date', 'end_date', 'start_ts', 'end_ts', 
+                          'values', 'attributes', 'dimensions', 'frequency', 
+                          'slug'])
+_SERIES_OPTIONAL_KEYS = frozenset(['notes', 'tags', 'digest'])
+
+_VALUE_KEYS = frozenset(['value', 'release_date', 'ordinal', 'period', 'attributes'])
+_VALUE_REVISIONS_KEYS = _VALUE_KEYS | frozenset(['revisions'])
+
+_REVISION_KEYS = frozenset(['value', 'attributes', 'revision_date'])
+
+def _is_text(value):
+    return isinstance(value, str) and len(value) > 0
+
+def check_series_revision(bson):
+    return (isinstance(bson, dict)
+            and bson.keys() == _REVISION_KEYS
+            and isinstance(bson['value'], str)
+            and (bson['attributes'] is None or isinstance(bson['attributes'], dict))
+            and isinstance(bson['revision_date'], datetime))
+
+def check_series_value(bson):
+    if not isinstance(bson, dict):
+        return False
+    keys = bson.keys()
+    if keys != _VALUE_KEYS:
+        if keys != _VALUE_REVISIONS_KEYS:
+            return False
+        revisions = bson['revisions']
+        if not isinstance(revisions, list):
+            return False
+        for revision in revisions:
+            if not check_series_revision(revision):
+                return False
+    attributes = bson['attributes']
+    period = bson['period']
+    return (isinstance(bson['value'], str)
+            and isinstance(bson['release_date'], datetime)
+            and isinstance(bson['ordinal'], int)
+            and isinstance(period, str) and len(period) > 0
+            and (attributes is None or isinstance(attributes, dict)))
+
+def check_series(bson):
+    """Return True if bson is valid for series_schema"""
+    if not isinstance(bson, dict):
+        return False
+    keys = bson.keys()
+    if not keys >= _SERIES_KEYS:
+        return False
+    if len(keys) > len(_SERIES_KEYS) and not keys - _SERIES_KEYS <= _SERIES_OPTIONAL_KEYS:
+        return False
+
+    if not (_is_text(bson['name'])
+            and _is_text(bson['provider_name'])
+            and _is_text(bson['key'])
+            and _is_text(bson['dataset_code'])
+            and _is_text(bson['frequency'])
+            and _is_text(bson['slug'])
+            and isinstance(bson['start_date'], int)
+            and isinstance(bson['end_date'], int)
+            and isinstance(bson['start_ts'], datetime)
+            and isinstance(bson['end_ts'], datetime)
+            and (bson['attributes'] is None or isinstance(bson['attributes'], dict))):
+        return False
+
+    for key in ('notes', 'digest'):
+        if key in bson and not (bson[key] is None or isinstance(bson[key], str)):
+            return False
+    if 'tags' in bson and not (bson['tags'] is None or isinstance(bson['tags'], list)):
+        return False
+
+    dimensions = bson['dimensions']
+    if not isinstance(dimensions, dict) or not dimensions:
+        return False
+    for key, value in dimensions.items():
+        if not isinstance(key, str) or not isinstance(value, str):
+            return False
+
+    values = bson['values']
+    if not isinstance(values, list):
+        return False
+    for value in values:
+        if not check_series_value(value):
+            return False
+
+    return True
+
+def series_schema_compiled(bson):
+    """Same validation and errors as series_schema(bson)"""
+    if not check_series(bson):
+        return series_schema(bson)
+    return bson
+
+class SampledValidator(object):
+    """Validate 1 of sample documents
+
+    >>> validate = SampledValidator(series_schema_compiled, sample=100)
+    """
+
+    def __init__(self, validator, sample=1):
+        self.validator = validator
+        self.sample = max(1, sample or 1)
+        self.counter = itertools.count()
+
+    def __call__(self, bson):
+        if self.sample > 1 and next(self.counter) % self.sample:
+            return bson
+        return self.validator(bson)
+
+def get_series_validator(backend="compiled", sample=1):
+    """Return the series validator of backend
+
+    :param str backend: voluptuous or compiled
+    :param int sample: Validate 1 of sample series (1 for all series)
+    :raises ValueError: if backend is invalid
+    """
+    if backend == "voluptuous":
+        validator = series_schema
+    elif backend == "compiled":
+        validator = series_schema_compiled
+    else:
+        raise ValueError("invalid schemas validation backend[%s]" % backend)
+    if sample and sample > 1:
+        return SampledValidator(validator, sample=sample)
+    return validator
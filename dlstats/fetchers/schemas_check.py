@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+
+"""Validation of the documents in MongoDB with the current schemas
+
+The documents of each collection are split in shards (_id ranges) and
+the shards are validated in a pool of processes. A report is returned
+for each shard as soon as it is checked, the reports are merged by
+collection with merge_reports().
+"""
+
+import time
+import logging
+import multiprocessing
+
+import pymongo
+from pymongo import ReadPreference
+
+from widukind_common.utils import get_mongo_url
+
+from dlstats import constants
+from dlstats.fetchers import schemas
+
+logger = logging.getLogger(__name__)
+
+CURRENT_SCHEMAS = {
+    constants.COL_PROVIDERS: schemas.provider_schema,
+    constants.COL_DATASETS: schemas.dataset_schema,
+    constants.COL_SERIES: schemas.series_schema_versioned,
+    constants.COL_CATEGORIES: schemas.category_schema,
+}
+
+"""Fields of the provider and dataset filters by collection"""
+FILTER_FIELDS = {
+    constants.COL_PROVIDERS: {"provider": "name"},
+    constants.COL_DATASETS: {"provider": "provider_name", "dataset": "dataset_code"},
+    constants.COL_SERIES: {"provider": "provider_name", "dataset": "dataset_code"},
+    constants.COL_CATEGORIES: {"provider": "provider_name"},
+}
+
+# min documents by shard
+SHARD_MIN_SIZE = 1000
+
+# _id sampled by shard for the bounds of the shards
+SHARD_SAMPLE_SIZE = 100
+
+# error messages kept by shard
+MAX_ERROR_MESSAGES = 20
+
+def get_query(col, provider=None, dataset=None):
+    """Return query of the filters for col - None if col has not the fields"""
+    query = {}
+    fields = FILTER_FIELDS.get(col, {})
+    for name, value in [("provider", provider), ("dataset", dataset)]:
+        if not value:
+            continue
+        if not name in fields:
+            return None
+        query[fields[name]] = value
+    return query
+
+def get_shards(db, col, query=None, shards=1):
+    """Split documents of col in _id ranges
+
+    The bounds of the ranges are the quantiles of a $sample of 
+    SHARD_SAMPLE_SIZE _id by shard: the size of the shards is approximate.
+
+    Return tuple (count of documents, list of queries)
+    """
+    query = dict(query or {})
+    count = db[col].count(query)
+    shards = max(1, min(shards, count // SHARD_MIN_SIZE))
+    if shards == 1:
+        return count, [query]
+
+    pipeline = [
+        {"$match": query},
+        {"$sample": {"size": shards * SHARD_SAMPLE_SIZE}},
+        {"$project": {"_id": True}},
+    ]
+    ids = sorted(set(doc["_id"] for doc in db[col].aggregate(pipeline, allowDiskUse=True)))
+    bounds = [None]
+    for i in range(1, shards):
+        _id = ids[i * len(ids) // shards]
+        if _id != bounds[-1]:
+            bounds.append(_id)
+    bounds.append(None)
+
+    queries = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        shard_query = dict(query)
+        shard_query["_id"] = {}
+        if start is not None:
+            shard_query["_id"]["$gte"] = start
+        if end is not None:
+            shard_query["_id"]["$lt"] = end
+        queries.append(shard_query)
+    return count, queries
+
+def check_shard(db, col, query=None, max_errors=0, batch_size=1000):
+    """Validate documents of col with its current schema
+
+    :param int max_errors: Stop after max_errors invalid documents (0 for no limit)
+    :return: dict report of the shard
+    """
+    report = {
+        "collection": col,
+        "verified": 0,
+        "error": 0,
+        "errors": [],
+        "max_errors": False,
+    }
+    _schema = CURRENT_SCHEMAS[col]
+
+    start = time.time()
+    cursor = db[col].with_options(read_preference=ReadPreference.SECONDARY_PREFERRED).find(query or {},
+                                                                                          batch_size=batch_size)
+    for doc in cursor:
+        if max_errors and report["error"] >= max_errors:
+            report["max_errors"] = True
+            break
+        report["verified"] += 1
+        _id = str(doc.pop('_id'))
+        try:
+            _schema(doc)
+        except Exception as err:
+            report["error"] += 1
+            if len(report["errors"]) < MAX_ERROR_MESSAGES:
+                report["errors"].append([_id, str(err)])
+    cursor.close()
+
+    report["time"] = round(time.time() - start, 3)
+    return report
+
+def merge_reports(reports):
+    """Return reports merged by collection
+
+    time is the sum of the time of the shards.
+    """
+    merged = {}
+    for report in reports:
+        col = report["collection"]
+        if not col in merged:
+            merged[col] = {"count": report.get("count", 0), "shards": 0,
+                           "verified": 0, "error": 0, "time": 0,
+                           "max_errors": False}
+        item = merged[col]
+        item["shards"] += 1
+        item["verified"] += report["verified"]
+        item["error"] += report["error"]
+        item["time"] = round(item["time"] + report["time"], 3)
+        item["max_errors"] = item["max_errors"] or report["max_errors"]
+    return merged
+
+_worker_db = None
+
+def _worker_init(mongo_url):
+    global _worker_db
+    _worker_db = pymongo.MongoClient(mongo_url or get_mongo_url()).get_default_database()
+
+def _worker_check_shard(task):
+    shard, kwargs = task
+    report = check_shard(_worker_db, **kwargs)
+    report.update(shard)
+    return report
+
+def check_schemas(db, collections=None, provider=None, dataset=None,
+                  workers=1, shards=None, max_errors=0, batch_size=1000, 
+                  mongo_url=None):
+    """Validate collections - generator of the report of each shard
+
+    Each collection is split in shards (_id ranges of about 
+    SHARD_MIN_SIZE documents at least). With workers > 1, the shards are validated in a 
+    pool of processes and the reports are yielded in completion order.
+
+    :param list collections: Collections to check (default: all of CURRENT_SCHEMAS)
+    :param str provider: Check only documents of this provider
+    :param str dataset: Check only documents of this dataset
+    :param int shards: Max shards by collection (default: workers * 4)
+    :param int max_errors: Max invalid documents by shard (0 for no limit)
+    :param str mongo_url: MongoDB URL used by workers processes
+    """
+    shards = shards or workers * 4
+    tasks = []
+    for col in collections or sorted(CURRENT_SCHEMAS.keys()):
+        query = get_query(col, provider=provider, dataset=dataset)
+        if query is None:
+            continue
+        count, queries = get_shards(db, col, query=query, shards=shards)
+        for i, shard_query in enumerate(queries):
+            shard = {"shard": i, "shards": len(queries), "count": count}
+            tasks.append((shard, dict(col=col, query=shard_query,
+                                      max_errors=max_errors,
+                                      batch_size=batch_size)))
+
+    if workers <= 1:
+        for shard, kwargs in tasks:
+            report = check_shard(db, **kwargs)
+            report.update(shard)
+            yield report
+        return
+
+    msg = "check schemas START: shards[%s] - workers[%s]"
+    logger.info(msg % (len(tasks), workers))
+
+    pool = multiprocessing.Pool(processes=min(workers, len(tasks) or 1),
+                                initializer=_worker_init,
+                                initargs=(mongo_url,))
+    try:
+        for report in pool.imap_unordered(_worker_check_shard, tasks):
+            yield report
+    finally:
+        pool.terminate()
+        pool.join()
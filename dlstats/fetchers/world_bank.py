@@ -18,8 +18,8 @@ import xlrd
 from widukind_common import errors
 
 from dlstats.fetchers._commons import Fetcher, Datasets, Providers, SeriesIterator
-from dlstats.utils import clean_datetime, get_ordinal_from_period, get_year
-from dlstats.utils import Downloader, make_store_path
+from dlstats.utils import clean_datetime, get_ordinal_from_period
+from dlstats.utils import Downloader, iter_concurrent, RateLimiter
 
 logger = logging.getLogger(__name__)
 
@@ -74,7 +74,11 @@ http://api.worldbank.org/countries?incomeLevel=LMC
 
 class WorldBankAPI(Fetcher):
     
-    def __init__(self, **kwargs):
+    def __init__(self, rate_limit=10, countries_by_request=50, **kwargs):
+        """
+        :param int rate_limit: Max API requests by second (all threads)
+        :param int countries_by_request: Countries by API request (FRA;DEU;...)
+        """
         super().__init__(provider_name='WORLDBANK', version=VERSION, **kwargs)
         
         self.provider = Providers(name=self.provider_name,
@@ -87,6 +91,12 @@ class WorldBankAPI(Fetcher):
         self.api_url = 'http://api.worldbank.org/v2/'
         
         self.requests_client = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(10, self.download_workers))
+        self.requests_client.mount("http://", adapter)
+        self.requests_client.mount("https://", adapter)
+        
+        self.rate_limiter = RateLimiter(rate=rate_limit)
+        self.countries_by_request = countries_by_request
         
         self.blacklist = [
             '13', # Enterprise Surveys
@@ -119,11 +129,13 @@ class WorldBankAPI(Fetcher):
         if not os.path.exists(self.store_path):
             os.makedirs(self.store_path, exist_ok=True)
         
-        filename = hashlib.sha224(url.encode("utf-8")).hexdigest()
+        key = url + json.dumps(params, sort_keys=True)
+        filename = hashlib.sha224(key.encode("utf-8")).hexdigest()
         filepath = os.path.abspath(os.path.join(self.store_path, filename))
         if os.path.exists(filepath):
             os.remove(filepath)
                 
+        self.rate_limiter.wait()
         response = self.requests_client.get(url, params=params, stream=True)
         #response = requests.get(url, params=params)
         
@@ -132,7 +144,7 @@ class WorldBankAPI(Fetcher):
         response.raise_for_status()
 
         with open(filepath, mode='wb') as f:
-            for chunk in response.iter_content():
+            for chunk in response.iter_content(chunk_size=Downloader.DEFAULT_CHUNK_SIZE):
                 f.write(chunk)
                 
         with open(filepath) as f: #, mode='rb'
@@ -438,7 +450,9 @@ class WorldBankAPIData(SeriesIterator):
             self.dataset.metadata["indicators"] = {}
 
         self.countries_to_process = list(self.available_countries.keys())
-        #self.countries_str = ";".join(list(self.available_countries.keys()))
+        self.countries_by_iso2 = dict([(c["iso2Code"], k) for k, c in self.available_countries.items() 
+                                       if c and c.get("iso2Code")])
+        self.rejected_indicators = set()
         
         self.blacklist_indicator = [
             "IC.DCP.COST",
@@ -594,34 +608,108 @@ class WorldBankAPIData(SeriesIterator):
         
         return release_date, datas
 
-    def _process(self):
+    def _download_batch(self, task):
+        """Download values of indicator for a batch of countries
+        
+        One request for all countries (http://api.worldbank.org/v2/countries/FRA;DEU/indicators/...)
+        with fallback by country if the request fails.
         
-        for current_indicator in self.indicators:
-            self.current_indicator = current_indicator
+        :return: (release_date, {country: [values]})
+        """
+        indicator, countries = task
+        indicator_code = indicator["id"]
+        
+        datas_by_country = OrderedDict([(country, []) for country in countries])
+        release_date = None
+
+        logger.info("Fetching dataset[%s] - indicator[%s] - countries[%s]" % (self.dataset_code,
+                                                                              indicator_code,
+                                                                              ";".join(countries)))
+
+        try:
+            for page in self.fetcher.download_json('/'.join(['countries',
+                                                     ";".join(countries),
+                                                     'indicators',
+                                                     indicator_code])):
+                
+                if not release_date:
+                    release_date = page[0]['lastupdated']
+                
+                for data in page[1] or []:
+                    country = data.get("countryiso3code") or \
+                        self.countries_by_iso2.get(data["country"]["id"])
+                    if country in datas_by_country:
+                        datas_by_country[country].append(data)
+                
+        except Exception as err:
+            if len(countries) == 1:
+                logger.critical("dataset[%s] - country[%s] - indicator[%s] - error[%s]" % (self.dataset_code,
+                                                                                           countries[0],
+                                                                                           indicator_code,
+                                                                                           str(err)))
+                return None, datas_by_country
             
-            #if not self.current_indicator["id"] == "CC.EST":
-            #    continue
+            logger.warning("dataset[%s] - countries[%s] - indicator[%s] - error[%s] - retry by country" % (self.dataset_code,
+                                                                                                          len(countries),
+                                                                                                          indicator_code,
+                                                                                                          str(err)))
+            for country in countries:
+                _release_date, datas = self._download_values(country, indicator_code)
+                release_date = release_date or _release_date
+                datas_by_country[country] = datas
+        
+        return release_date, datas_by_country
+
+    def _tasks(self):
+        """(indicator, countries) to download - rejected indicators are skipped"""
+        
+        size = self.fetcher.countries_by_request
+        
+        for indicator in self.indicators:
+            if indicator["id"] in self.blacklist_indicator:
+                continue
             
-            count = 0
+            for i in range(0, len(self.countries_to_process), size):
+                if indicator["id"] in self.rejected_indicators:
+                    break
+                yield indicator, self.countries_to_process[i:i + size]
+
+    def _end_indicator(self, indicator, count):
+        if indicator["id"] in self.rejected_indicators:
+            return
+        logger.info("TOTAL - dataset[%s] - indicator[%s] - count[%s]" % (self.dataset_code,
+                                                                         indicator["id"],
+                                                                         count))
+        if count == 0:
+            logger.warning("EMPTY dataset[%s] - indicator[%s]"  % (self.dataset_code,
+                                                               indicator["id"]))
+
+    def _process(self):
+        
+        self.rejected_indicators = set()
+        
+        count = 0
+        is_release_controled = False
+        
+        for (current_indicator, countries), (release_date, datas_by_country) in iter_concurrent(self._download_batch,
+                                                                                                 self._tasks(),
+                                                                                                 workers=self.fetcher.download_workers):
             
-            if self.current_indicator["id"] in self.blacklist_indicator:
+            if current_indicator["id"] in self.rejected_indicators:
                 continue
             
-            is_release_controled = False
-            is_rejected = False
+            if not self.current_indicator or current_indicator["id"] != self.current_indicator["id"]:
+                if self.current_indicator:
+                    self._end_indicator(self.current_indicator, count)
+                self.current_indicator = current_indicator
+                count = 0
+                is_release_controled = False
             
             slug_indicator = slugify(self.current_indicator["id"], save_order=True)
             
-            for current_country in self.countries_to_process:
+            for current_country, datas in datas_by_country.items():
                 self.current_country = current_country
-            
-                logger.info("Fetching dataset[%s] - indicator[%s] - country[%s]" % (self.dataset_code, 
-                                                                                    self.current_indicator["id"], 
-                                                                                    self.current_country))
-    
-                release_date, datas = self._download_values(self.current_country,
-                                                            self.current_indicator["id"])
-            
+                
                 if not datas:
                     continue
                 
@@ -639,7 +727,7 @@ class WorldBankAPIData(SeriesIterator):
                                                self.dataset_code, 
                                                self.current_indicator["id"]))
                             
-                            is_rejected = True
+                            self.rejected_indicators.add(self.current_indicator["id"])
                             break
 
                     self.dataset.metadata["indicators"][slug_indicator] = self.release_date
@@ -647,14 +735,9 @@ class WorldBankAPIData(SeriesIterator):
                 count += 1
     
                 yield {"datas": datas}, None
-            
-            if not is_rejected:
-                logger.info("TOTAL - dataset[%s] - indicator[%s] - count[%s]" % (self.dataset_code,
-                                                                                 self.current_indicator["id"],
-                                                                                 count))
-                if count == 0:
-                    logger.warning("EMPTY dataset[%s] - indicator[%s]"  % (self.dataset_code,
-                                                                       self.current_indicator["id"]))
+        
+        if self.current_indicator:
+            self._end_indicator(self.current_indicator, count)
 
         yield None, None
 
@@ -805,8 +888,7 @@ class ExcelData:
             self.load_datas()
 
     def get_store_path(self):
-        return make_store_path(base_path=self.fetcher.store_path,
-                               dataset_code=self.dataset_code)
+        return self.fetcher.get_dataset_store_path(self.dataset_code)
 
     def load_datas(self):
 
@@ -850,20 +932,6 @@ class ExcelData:
 
     def clean_field(self, bson):
 
-        if not "start_ts" in bson or not bson.get("start_ts"):
-            if bson["frequency"] == "A":
-                year = int(get_year(bson["values"][0]["period"]))
-                bson["start_ts"] = clean_datetime(datetime(year, 1, 1), rm_hour=True, rm_minute=True, rm_second=True, rm_microsecond=True, rm_tzinfo=True) 
-            else:
-                bson["start_ts"] = clean_datetime(pandas.Period(ordinal=bson["start_date"], freq=bson["frequency"]).start_time.to_datetime())
-
-        if not "end_ts" in bson or not bson.get("end_ts"):
-            if bson["frequency"] == "A":
-                year = int(get_year(bson["values"][-1]["period"]))
-                bson["end_ts"] = clean_datetime(datetime(year, 12, 31), rm_hour=True, rm_minute=True, rm_second=True, rm_microsecond=True, rm_tzinfo=True) 
-            else:
-                bson["end_ts"] = clean_datetime(pandas.Period(ordinal=bson["end_date"], freq=bson["frequency"]).end_time.to_datetime())
-        
         dimensions = bson.pop("dimensions")
         attributes = bson.pop("attributes", {})
         new_dimensions = {}
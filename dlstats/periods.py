@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+
+"""Period string to ordinal conversion
+
+Ordinals are the same as pandas.Period(date_str, freq=freq).ordinal but
+computed arithmetically for the common frequencies:
+
+- A (A-DEC, Y, Y-DEC): years since 1970
+- S: semesters since 1970 (1970-S1 = 0)
+- Q (Q-DEC): quarters since 1970
+- M: months since 1970-01
+- W, W-MON ... W-SUN: weeks (W = W-SUN)
+- D: days since 1970-01-01
+
+Accepted period formats: YYYY, YYYY-MM, YYYYMM, YYYY-MM-DD, YYYYMMDD,
+YYYY-Qn, YYYYQn, YYYY-Sn, YYYYSn and YYYYMmm (world bank).
+A period is converted to the period of freq which contains its first day.
+
+Other frequencies and formats fall back to pandas.Period.
+
+get_timestamps() is the reverse conversion: (ordinal, freq) to the first
+and last datetime of the period, used for start_ts/end_ts of series.
+"""
+
+import re
+import calendar
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+__all__ = [
+    "get_ordinal",
+    "get_ordinals",
+    "get_timestamps",
+    "format_period",
+    "set_series_timestamps",
+    "set_timestamps",
+    "clear_cache",
+]
+
+LRU_MAXSIZE = 100000
+
+EPOCH = date(1970, 1, 1).toordinal()
+
+WEEKDAYS = ["MON", "TUE", "WED", "THU", "FRI", "SAT", "SUN"]
+
+FREQ_ALIASES = {
+    "A": "A",
+    "A-DEC": "A",
+    "Y": "A",
+    "Y-DEC": "A",
+    "S": "S",
+    "Q": "Q",
+    "Q-DEC": "Q",
+    "M": "M",
+    "D": "D",
+    "W": "W-SUN",
+}
+for _weekday in WEEKDAYS:
+    FREQ_ALIASES["W-%s" % _weekday] = "W-%s" % _weekday
+
+RE_PERIOD = re.compile(r"""^(?P<year>\d{4})
+    (?:
+        -?(?P<quarter_or_semester>[QS])(?P<number>[1-4])
+      | -?M?(?P<month>\d{2})(?:-?(?P<day>\d{2}))?
+    )?$""", re.VERBOSE)
+
+def parse_period(date_str):
+    """Return (year, month, day) of the first day of date_str or None"""
+
+    match = RE_PERIOD.match(date_str)
+    if not match:
+        return None
+
+    year = int(match.group("year"))
+    kind = match.group("quarter_or_semester")
+    if kind:
+        number = int(match.group("number"))
+        if kind == "Q":
+            return year, (number - 1) * 3 + 1, 1
+        if number > 2:
+            return None
+        return year, (number - 1) * 6 + 1, 1
+
+    month = int(match.group("month") or 1)
+    day = int(match.group("day") or 1)
+    if not 1 <= month <= 12:
+        return None
+    return year, month, day
+
+def _days(year, month, day):
+    return date(year, month, day).toordinal() - EPOCH
+
+def _ordinal(year, month, day, freq):
+    if freq == "A":
+        return year - 1970
+    if freq == "Q":
+        return (year - 1970) * 4 + (month - 1) // 3
+    if freq == "M":
+        return (year - 1970) * 12 + month - 1
+    if freq == "S":
+        return (year - 1970) * 2 + (month - 1) // 6
+    if freq == "D":
+        return _days(year, month, day)
+    # weekly: pandas W-SUN week 1 is 1969-12-29 -> 1970-01-04
+    shift = (WEEKDAYS.index(freq[2:]) + 1) % 7
+    return (_days(year, month, day) + 3 - shift) // 7 + 1
+
+def _pandas_ordinal(date_str, freq):
+    from pandas import Period
+    return Period(date_str, freq=freq).ordinal
+
+@lru_cache(maxsize=LRU_MAXSIZE)
+def get_ordinal(date_str, freq):
+    """Return ordinal of date_str period for frequency freq
+
+    >>> get_ordinal("1970-Q2", "Q")
+    1
+    >>> get_ordinal("2016-01-27", "W-WED")
+    2404
+    """
+    _freq = FREQ_ALIASES.get(freq)
+    if _freq:
+        parsed = parse_period(date_str)
+        if parsed:
+            try:
+                return _ordinal(parsed[0], parsed[1], parsed[2], _freq)
+            except ValueError:
+                pass
+
+    return _pandas_ordinal(date_str, freq)
+
+def get_ordinals(periods, freq):
+    """Return list of ordinals for a list of period strings
+
+    All periods must have the same frequency.
+    """
+    ordinals = {}
+    result = []
+    for date_str in periods:
+        ordinal = ordinals.get(date_str)
+        if ordinal is None:
+            ordinal = ordinals[date_str] = get_ordinal(date_str, freq)
+        result.append(ordinal)
+    return result
+
+def _first_and_last_day(ordinal, freq):
+    if freq == "D":
+        first = last = date.fromordinal(EPOCH + ordinal)
+        return first, last
+    if freq.startswith("W-"):
+        shift = (WEEKDAYS.index(freq[2:]) + 1) % 7
+        first = date.fromordinal(EPOCH + 7 * ordinal - 10 + shift)
+        return first, first + timedelta(days=6)
+
+    months = {"A": 12, "S": 6, "Q": 3, "M": 1}[freq]
+    year, index = divmod(ordinal * months, 12)
+    year += 1970
+    first_month = index + 1
+    last_month = first_month + months - 1
+    last_day = calendar.monthrange(year, last_month)[1]
+    return date(year, first_month, 1), date(year, last_month, last_day)
+
+def _pandas_timestamps(ordinal, freq):
+    from pandas import Period
+    period = Period(ordinal=ordinal, freq=freq)
+    return (period.start_time.to_pydatetime().replace(microsecond=0),
+            period.end_time.to_pydatetime().replace(microsecond=0))
+
+@lru_cache(maxsize=LRU_MAXSIZE)
+def get_timestamps(ordinal, freq):
+    """Return (start_ts, end_ts) datetimes of the period ordinal
+
+    start_ts is the first day at midnight. end_ts is the last day at
+    23:59:59 except for annual periods where it is the 31 december at
+    midnight (stored values of start_ts/end_ts).
+
+    >>> get_timestamps(0, "Q")
+    (datetime.datetime(1970, 1, 1, 0, 0), datetime.datetime(1970, 3, 31, 23, 59, 59))
+    """
+    _freq = FREQ_ALIASES.get(freq)
+    if not _freq:
+        return _pandas_timestamps(ordinal, freq)
+
+    first, last = _first_and_last_day(ordinal, _freq)
+    start_ts = datetime(first.year, first.month, first.day)
+    if _freq == "A":
+        end_ts = datetime(last.year, last.month, last.day)
+    else:
+        end_ts = datetime(last.year, last.month, last.day, 23, 59, 59)
+    return start_ts, end_ts
+
+def format_period(ordinal, freq):
+    """Return the usual period string of an ordinal or None
+
+    A: 2016, S: 2016-S1, Q: 2016-Q1, M: 2016-01, D: 2016-01-31
+    (None for weekly and other frequencies).
+    """
+    _freq = FREQ_ALIASES.get(freq)
+    if not _freq or _freq.startswith("W-"):
+        return None
+    first = _first_and_last_day(ordinal, _freq)[0]
+    if _freq == "A":
+        return "%04d" % first.year
+    if _freq == "S":
+        return "%04d-S%d" % (first.year, (first.month - 1) // 6 + 1)
+    if _freq == "Q":
+        return "%04d-Q%d" % (first.year, (first.month - 1) // 3 + 1)
+    if _freq == "M":
+        return "%04d-%02d" % (first.year, first.month)
+    return "%04d-%02d-%02d" % (first.year, first.month, first.day)
+
+def set_series_timestamps(bson):
+    """Set start_ts and end_ts of a series document if missing"""
+    if not bson.get("start_ts"):
+        bson["start_ts"] = get_timestamps(bson["start_date"], bson["frequency"])[0]
+    if not bson.get("end_ts"):
+        bson["end_ts"] = get_timestamps(bson["end_date"], bson["frequency"])[1]
+    return bson
+
+def set_timestamps(series_list):
+    """Set start_ts and end_ts of a batch of series documents if missing
+
+    Conversions are done once by (ordinal, frequency) of the batch.
+    """
+    timestamps = {}
+    for bson in series_list:
+        if bson.get("start_ts") and bson.get("end_ts"):
+            continue
+        for field, ordinal_field, index in [("start_ts", "start_date", 0), 
+                                            ("end_ts", "end_date", 1)]:
+            if bson.get(field):
+                continue
+            key = (bson[ordinal_field], bson["frequency"])
+            value = timestamps.get(key)
+            if value is None:
+                value = timestamps[key] = get_timestamps(*key)
+            bson[field] = value[index]
+    return series_list
+
+def clear_cache():
+    get_ordinal.cache_clear()
+    get_timestamps.cache_clear()
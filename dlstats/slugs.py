@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+"""Memoized slugify for dimension/attribute keys and codes
+
+Keys and codes (FREQ, OBS_STATUS, country codes...) are a small and very
+repetitive vocabulary: slugify() results are kept in a bounded LRU.
+
+Statistics (hits, misses) are relative to the last reset_stats() call,
+made at the start of each dataset update.
+"""
+
+from functools import lru_cache
+
+from slugify import slugify
+
+__all__ = [
+    "slug",
+    "configure_slug_cache",
+    "reset_stats",
+    "get_stats",
+]
+
+SLUG_CACHE_SIZE = 50000
+
+def _slug(value):
+    return slugify(value, save_order=True)
+
+_cached_slug = lru_cache(maxsize=SLUG_CACHE_SIZE)(_slug)
+
+_stats_start = (0, 0)
+
+def slug(value, cache=True):
+    """Same as slugify(value, save_order=True)
+
+    :param bool cache: False for values used only once (series slug)
+    """
+    if cache and isinstance(value, str):
+        return _cached_slug(value)
+    return _slug(value)
+
+def configure_slug_cache(maxsize=SLUG_CACHE_SIZE):
+    global _cached_slug, _stats_start
+    _cached_slug = lru_cache(maxsize=maxsize)(_slug)
+    _stats_start = (0, 0)
+
+def reset_stats():
+    global _stats_start
+    info = _cached_slug.cache_info()
+    _stats_start = (info.hits, info.misses)
+
+def get_stats():
+    info = _cached_slug.cache_info()
+    return {
+        "hits": info.hits - _stats_start[0],
+        "misses": info.misses - _stats_start[1],
+        "size": info.currsize,
+        "maxsize": info.maxsize,
+    }
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+import os
+import pickle
+import hashlib
+import tempfile
+import threading
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+structure_cache = None
+
+class StructureCache(object):
+    """Cache of parsed SDMX structures shared by datasets and runs
+
+    An entry is the state of a XMLStructure instance (codelists, concepts,
+    dimensions by dsd... see XMLStructureBase.get_state) keyed by provider,
+    agency, dsd id and version.
+
+    Entries are kept in a LRU of maxsize entries and in pickle files in
+    <cache_path>. An entry is stored with a validator of the source file
+    (ETag, Last-Modified or sha256 of the file): a file entry is used
+    only if the validator of the new download is the same.
+
+    A memory entry is used without validator: a structure is downloaded
+    and parsed only once by run.
+    """
+
+    def __init__(self, cache_path=None, maxsize=100):
+
+        self.cache_path = cache_path or os.path.join(tempfile.gettempdir(),
+                                                     "dlstats-structures")
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.stats = {"memory_hits": 0, "file_hits": 0, "misses": 0}
+
+        os.makedirs(self.cache_path, exist_ok=True)
+
+        msg = "enable structure cache path[%s] maxsize[%s]"
+        logger.info(msg % (self.cache_path, self.maxsize))
+
+    def entry_path(self, key):
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_path, "%s.pickle" % digest)
+
+    def _set_memory(self, key, entry):
+        with self.lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _load_file(self, key):
+        path = self.entry_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as fp:
+                entry = pickle.load(fp)
+        except Exception as err:
+            logger.warning("invalid structure cache file[%s] - %s" % (path, str(err)))
+            return None
+        if entry.get("key") != key:
+            return None
+        return entry
+
+    def get(self, key, validator=None):
+        """Return cached state or None
+
+        :param str validator: None for memory entries only
+        """
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry:
+                self._entries.move_to_end(key)
+
+        if entry and (validator is None or entry["validator"] == validator):
+            self.stats["memory_hits"] += 1
+            return entry["state"]
+
+        if validator is None:
+            return None
+
+        entry = self._load_file(key)
+        if entry and entry["validator"] == validator:
+            self._set_memory(key, entry)
+            self.stats["file_hits"] += 1
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("structure cache - load[%s]" % key)
+            return entry["state"]
+
+        self.stats["misses"] += 1
+        return None
+
+    def set(self, key, state, validator=None):
+        entry = {"key": key, "validator": validator, "state": state}
+        self._set_memory(key, entry)
+
+        if not validator:
+            return
+
+        path = self.entry_path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_path)
+        with os.fdopen(fd, "wb") as fp:
+            pickle.dump(entry, fp, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def clear(self):
+        with self.lock:
+            self._entries.clear()
+            for filename in os.listdir(self.cache_path):
+                if filename.endswith(".pickle"):
+                    os.remove(os.path.join(self.cache_path, filename))
+
+def get_key(provider_name, agency_id, dsd_id, version=None):
+    return "%s:%s:%s:%s" % (provider_name, agency_id, dsd_id, version or "latest")
+
+def get_validator(filepath, headers=None):
+    """Return ETag, Last-Modified or sha256 of filepath
+
+    Return None if the cache is not configured.
+    """
+    if not structure_cache:
+        return None
+    headers = headers or {}
+    if headers.get("ETag"):
+        return "etag:%s" % headers["ETag"]
+    if headers.get("Last-Modified"):
+        return "last-modified:%s" % headers["Last-Modified"]
+    sha = hashlib.sha256()
+    with open(filepath, "rb") as fp:
+        for chunk in iter(lambda: fp.read(1024 * 1024), b""):
+            sha.update(chunk)
+    return "sha256:%s" % sha.hexdigest()
+
+def load_structure(xml_dsd, key, validator=None):
+    """Load state of xml_dsd from cache
+
+    :return: True if found in cache
+    """
+    if not structure_cache:
+        return False
+    state = structure_cache.get(key, validator)
+    if state is None:
+        return False
+    xml_dsd.set_state(state)
+    return True
+
+def store_structure(xml_dsd, key, validator=None):
+    if structure_cache:
+        structure_cache.set(key, xml_dsd.get_state(), validator)
+
+def configure_structure_cache(**kwargs):
+    global structure_cache
+    structure_cache = StructureCache(**kwargs)
+    return structure_cache
+
+def remove_structure_cache():
+    global structure_cache
+    structure_cache = None
@@ -2,8 +2,14 @@
 
 from copy import deepcopy
 from datetime import datetime
-
-from bson import ObjectId
+import io
+import os
+import shutil
+import tempfile
+import multiprocessing
+
+from bson import BSON, ObjectId
+from bson.raw_bson import RawBSONDocument
 from voluptuous import MultipleInvalid
 from pymongo.errors import DuplicateKeyError
 
@@ -11,6 +17,7 @@ from widukind_common import errors
 
 from dlstats import constants
 from dlstats.fetchers import schemas
+from dlstats.fetchers import _commons
 from dlstats.fetchers._commons import (Fetcher, 
                                        CodeDict, 
                                        DlstatsCollection, 
@@ -20,14 +27,25 @@ from dlstats.fetchers._commons import (Fetcher,
                                        Series,
                                        SeriesIterator,
                                        series_is_changed,
+                                       series_digest,
+                                       series_delta_update,
                                        series_revisions,
                                        series_set_release_date,
-                                       series_update)
+                                       series_update,
+                                       _worker_init,
+                                       _revisions_columnar,
+                                       _revisions_groupby)
 from dlstats.fetchers.dummy import DUMMY, DUMMY_SAMPLE_SERIES
 
 import unittest
 from unittest import mock
 
+try:
+    import gevent
+    HAVE_GEVENT = True
+except ImportError:
+    HAVE_GEVENT = False
+
 from dlstats.tests.base import BaseTestCase, BaseDBTestCase
 
 def update_mongo_collection(self, collection, keys, bson):
@@ -102,6 +120,18 @@ SERIES1_dataset_codelists = {
 
 
 
+class ParallelFetcher(Fetcher):
+    
+    def __init__(self, **kwargs):
+        super().__init__(provider_name="p1", **kwargs)
+        
+    def wrap_upsert_dataset(self, dataset_code):
+        if dataset_code.startswith("error"):
+            self.count_error()
+            if self.max_errors and self.errors >= self.max_errors:
+                raise errors.MaxErrors("max errors")
+            raise Exception("error for %s" % dataset_code)
+
 class FetcherTestCase(BaseTestCase):
 
     def test_constructor(self):
@@ -125,6 +155,62 @@ class FetcherTestCase(BaseTestCase):
         with self.assertRaises(NotImplementedError):
             f.upsert_dataset(None)
 
+    def test_run_datasets_parallel(self):
+
+        # nosetests -s -v dlstats.tests.fetchers.test__commons:FetcherTestCase.test_run_datasets_parallel
+
+        f = ParallelFetcher(db=mock.Mock(), 
+                            workers=2,
+                            max_errors=0,
+                            mongo_url="mongodb://localhost/widukind_test")
+        
+        f.run_datasets(["ds1", "error1", "ds2", "error2", "ds3"])
+        self.assertEqual(f.errors, 2)
+
+        f = ParallelFetcher(db=mock.Mock(), 
+                            workers=2,
+                            max_errors=2,
+                            mongo_url="mongodb://localhost/widukind_test")
+
+        with self.assertRaises(errors.MaxErrors):
+            f.run_datasets(["error1", "error2", "error3", "error4"])
+        self.assertTrue(f.errors >= 2)
+
+    def test_worker_init(self):
+
+        # nosetests -s -v dlstats.tests.fetchers.test__commons:FetcherTestCase.test_worker_init
+
+        '''own store path for the fetcher files, datasets directories of 
+        the parent: datasets files are found with use_existing_file'''
+        f = ParallelFetcher(db=mock.Mock(), workers=2, use_existing_file=True,
+                            mongo_url="mongodb://localhost/widukind_test")
+        f.store_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, f.store_path, True)
+        self.addCleanup(setattr, _commons, "_worker_fetcher", None)
+        _worker_init(ParallelFetcher, f.get_worker_kwargs(), f.store_path, 
+                     multiprocessing.Value('i', 0))
+        worker_fetcher = _commons._worker_fetcher
+        self.assertEqual(worker_fetcher.store_path, 
+                         os.path.join(f.store_path, "worker-%s" % os.getpid()))
+        self.assertEqual(worker_fetcher.get_dataset_store_path("d1"), 
+                         f.get_dataset_store_path("d1"))
+        self.assertEqual(f.get_dataset_store_path("d1"), 
+                         os.path.join(f.store_path, "d1"))
+        self.assertTrue(worker_fetcher.use_existing_file)
+
+    def test_count_error(self):
+
+        # nosetests -s -v dlstats.tests.fetchers.test__commons:FetcherTestCase.test_count_error
+
+        f = ParallelFetcher(db=mock.Mock())
+        f.count_error()
+        self.assertEqual(f.errors, 1)
+
+        f.shared_errors = multiprocessing.Value('i', 3)
+        f.count_error()
+        self.assertEqual(f.errors, 4)
+        self.assertEqual(f.shared_errors.value, 4)
+
 class CodeDictTestCase(BaseTestCase):
 
     # nosetests -s -v dlstats.tests.fetchers.test__commons:CodeDictTestCase
@@ -298,11 +384,17 @@ class SeriesIteratorTestCase(BaseTestCase):
                 return bson
         
         dclass = DataClass(dataset)
+        fileobj = io.BytesIO(b"data")
+        dclass.fileobjs.append(fileobj)
         bson = next(dclass)
         self.assertEqual(bson, {"key": "k1"})
+        self.assertFalse(fileobj.closed)
         
+        '''file objects closed at end of rows'''
         with self.assertRaises(StopIteration):
             next(dclass)
+        self.assertTrue(fileobj.closed)
+        self.assertEqual(dclass.fileobjs, [])
         
 class SeriesTestCase(BaseTestCase):
 
@@ -920,6 +1012,156 @@ class SeriesTestCase(BaseTestCase):
         revision_0 = new_bson["values"][0]["revisions"][0]
         self.assertEqual(revision_0["attributes"], {"OBS_STATUS": "e"})
 
+    def test_series_digest(self):
+
+        # nosetests -s -v dlstats.tests.fetchers.test__commons:SeriesTestCase.test_series_digest
+
+        series1 = deepcopy(SERIES1)
+        series2 = deepcopy(SERIES1)
+        digest = series_digest(series1)
+        self.assertEqual(digest, series_digest(series2))
+
+        '''release_date and revisions not used'''
+        series2["values"][0]["release_date"] = datetime(2016, 1, 1)
+        series2["values"][0]["revisions"] = [{"revision_date": datetime(2014, 1, 1),
+                                              "value": "0",
+                                              "attributes": None}]
+        series2["last_update"] = datetime(2016, 1, 1)
+        self.assertEqual(digest, series_digest(series2))
+
+        series2["values"][0]["value"] = "2.0"
+        self.assertNotEqual(digest, series_digest(series2))
+
+        series2 = deepcopy(SERIES1)
+        series2["values"][1]["attributes"] = {"OBS_STATUS": "e"}
+        self.assertNotEqual(digest, series_digest(series2))
+
+        series2 = deepcopy(SERIES1)
+        series2["dimensions"]["Country"] = "FRA"
+        self.assertNotEqual(digest, series_digest(series2))
+
+        series2 = deepcopy(SERIES1)
+        series2["notes"] = "new note"
+        self.assertNotEqual(digest, series_digest(series2))
+
+    def test_series_delta_update(self):
+
+        # nosetests -s -v dlstats.tests.fetchers.test__commons:SeriesTestCase.test_series_delta_update
+
+        release_date = datetime(2015, 1, 1)
+        last_update = datetime(2016, 1, 1)
+
+        old_bson = deepcopy(SERIES1)
+        old_bson["values"] = []
+        for i in range(10):
+            old_bson["values"].append({
+                "period": str(2000 + i), "value": "1", "ordinal": 30 + i,
+                "release_date": release_date, "attributes": None
+            })
+        old_bson["start_date"] = 30
+        old_bson["end_date"] = 39
+
+        def update(new_values, **fields):
+            new_bson = deepcopy(old_bson)
+            new_bson["values"] = new_values
+            new_bson.update(fields)
+            new_bson["digest"] = series_digest(new_bson)
+            series_revisions(new_bson, deepcopy(old_bson), last_update)
+            return new_bson, series_delta_update(new_bson, deepcopy(old_bson))
+
+        '''revised observation'''
+        new_values = deepcopy(old_bson["values"])
+        new_values[8]["value"] = "2"
+        new_bson, delta = update(new_values)
+        self.assertEqual(sorted(delta.keys()), ["$set"])
+        self.assertEqual(sorted(delta["$set"].keys()), ["digest", "values.8"])
+        self.assertEqual(delta["$set"]["values.8"]["value"], "2")
+        self.assertEqual(delta["$set"]["values.8"]["revisions"][0]["value"], "1")
+        self.assertEqual(delta["$set"]["values.8"], new_bson["values"][8])
+
+        '''appended observations only'''
+        new_values = deepcopy(old_bson["values"])
+        new_values.append({"period": "2010", "value": "3", "ordinal": 40,
+                           "attributes": None, "release_date": last_update})
+        new_bson, delta = update(new_values, end_date=40)
+        self.assertEqual(delta["$set"], {"digest": new_bson["digest"], "end_date": 40})
+        self.assertEqual(delta["$push"], {"values": {"$each": [new_values[-1]]}})
+
+        '''revised and appended: positional $set'''
+        new_values[9]["value"] = "2"
+        new_bson, delta = update(new_values, end_date=40)
+        self.assertFalse("$push" in delta)
+        self.assertEqual(sorted(delta["$set"].keys()), 
+                         ["digest", "end_date", "values.10", "values.9"])
+
+        '''shape changed or too many changes: full rewrite'''
+        new_values = deepcopy(old_bson["values"])
+        new_values.insert(0, {"period": "1999", "value": "1", "ordinal": 29,
+                              "attributes": None, "release_date": last_update})
+        new_bson, delta = update(new_values, start_date=29)
+        self.assertIsNone(delta)
+
+        new_values = deepcopy(old_bson["values"])
+        for value in new_values[:6]:
+            value["value"] = "2"
+        new_bson, delta = update(new_values)
+        self.assertIsNone(delta)
+
+    def test_series_revisions_columnar(self):
+
+        # nosetests -s -v dlstats.tests.fetchers.test__commons:SeriesTestCase.test_series_revisions_columnar
+
+        release_date = datetime(2015, 1, 1, 0, 0, 0, 0, tzinfo=None)
+        last_update = datetime(2017, 1, 1, 0, 0, 0, 0, tzinfo=None)
+
+        old_values = []
+        for i in range(2000, 2010):
+            old_values.append({
+                "period": str(i), "value": "1", "ordinal": i - 1970,
+                "release_date": release_date, "attributes": None
+            })
+        old_values[2]["revisions"] = [{"revision_date": release_date,
+                                       "value": "0",
+                                       "attributes": None}]
+
+        new_values = deepcopy(old_values[5:])
+        for value in new_values:
+            value.pop("revisions", None)
+        new_values[0]["value"] = "2"
+        new_values[1]["attributes"] = {"OBS_STATUS": "e"}
+        new_values.append({
+            "period": "2010", "value": "3", "ordinal": 40,
+            "release_date": release_date, "attributes": None
+        })
+        
+        values1, changed1 = _revisions_groupby(deepcopy(new_values), 
+                                               deepcopy(old_values), 
+                                               last_update)
+        values2, changed2 = _revisions_columnar(deepcopy(new_values), 
+                                                deepcopy(old_values), 
+                                                last_update)
+        self.assertTrue(changed2)
+        self.assertEqual(changed1, changed2)
+        self.assertEqual(values1, values2)
+        self.assertEqual(len(values2), 11)
+        self.assertEqual([v["ordinal"] for v in values2], list(range(30, 41)))
+        self.assertEqual(values2[5]["release_date"], last_update)
+        self.assertEqual(values2[5]["revisions"][0]["value"], "1")
+        self.assertEqual(values2[6]["revisions"][0]["attributes"], None)
+        self.assertEqual(values2[7]["release_date"], release_date)
+        self.assertFalse("revisions" in values2[7])
+
+        '''duplicate ordinals - fallback to groupby'''
+        new_values.append(deepcopy(new_values[-1]))
+        values1, changed1 = _revisions_groupby(deepcopy(new_values), 
+                                               deepcopy(old_values), 
+                                               last_update)
+        values2, changed2 = _revisions_columnar(deepcopy(new_values), 
+                                                deepcopy(old_values), 
+                                                last_update)
+        self.assertEqual(changed1, changed2)
+        self.assertEqual(values1, values2)
+
     @mock.patch("dlstats.fetchers._commons.DlstatsCollection.update_mongo_collection", update_mongo_collection)
     def test_process_series_data(self):
 
@@ -976,8 +1218,216 @@ class SeriesTestCase(BaseTestCase):
         
         self.assertEqual(s.count_accepts, 1)
         self.assertEqual(s.count_rejects, 3)
+
+    def test_adapt_bulk_size(self):
+
+        # nosetests -s -v dlstats.tests.fetchers.test__commons:SeriesTestCase.test_adapt_bulk_size
+
+        f = Fetcher(provider_name="p1", is_indexes=False)
+
+        dataset = Datasets(provider_name="p1",
+                    dataset_code="d1",
+                    name="d1 Name",
+                    last_update=datetime.now(),
+                    fetcher=f,
+                    is_load_previous_version=False)
+
+        s = Series(dataset=dataset,
+                   provider_name="p1",
+                   dataset_code="d1",
+                   last_update=None,
+                   fetcher=f,
+                   bulk_size=100,
+                   bulk_adaptive=True,
+                   bulk_size_min=10,
+                   bulk_size_max=1000,
+                   bulk_bytes_max=20000,
+                   bulk_latency_target=1.0)
+
+        '''flush by bytes before bulk_size'''
+        while not s.is_bulk_full():
+            s.count_accepts += 1
+            s.append_series(deepcopy(SERIES1))
+        self.assertTrue(len(s.series_list) < 100)
+        self.assertTrue(s.series_list_bytes >= 20000)
+        self.assertTrue(s.bulk_doc_bytes > 0)
+
+        count = len(s.series_list)
+        self.assertEqual(len(s.pop_series_list()), count)
+        self.assertEqual(s.series_list_bytes, 0)
+
+        '''only 1 of BULK_BYTES_SAMPLE series is encoded, invalid documents are ignored'''
+        with mock.patch("dlstats.fetchers._commons.BSON.encode", 
+                        side_effect=BSON.encode) as encode:
+            invalid = deepcopy(SERIES1)
+            invalid["name"] = object()
+            s.count_bytes_appends = 0
+            s.append_series(invalid)
+            for i in range(_commons.BULK_BYTES_SAMPLE * 2):
+                s.append_series(deepcopy(SERIES1))
+            self.assertEqual(encode.call_count, 3)
+        s.pop_series_list()
+
+        '''slow bulk_write: 100 series in 10 seconds - target 10'''
+        s.bulk_bytes_max = 1024 * 1024 * 1024
+        s.adapt_bulk_size(100, 10.0)
+        self.assertEqual(s.bulk_size, 55)
+        for i in range(10):
+            s.adapt_bulk_size(100, 10.0)
+        self.assertEqual(s.bulk_size, 10)
+
+        '''fast bulk_write: limited by bulk_size_max'''
+        for i in range(20):
+            s.adapt_bulk_size(s.bulk_size, 0.001)
+        self.assertEqual(s.bulk_size, 999)
+
+        self.assertEqual(s.bulk_stats["batches"], 31)
+        self.assertEqual(s.bulk_stats["min"], 10)
+
+        '''default from fetcher'''
+        self.assertFalse(dataset.series.bulk_adaptive)
+        f.bulk_adaptive = True
+        dataset = Datasets(provider_name="p1",
+                    dataset_code="d1",
+                    fetcher=f,
+                    is_load_previous_version=False)
+        self.assertTrue(dataset.series.bulk_adaptive)
+
+    def test_process_series_data_pipeline(self):
+
+        # nosetests -s -v dlstats.tests.fetchers.test__commons:SeriesTestCase.test_process_series_data_pipeline
+
+        f = Fetcher(provider_name="p1",
+                    max_errors=1, 
+                    is_indexes=False,
+                    async_mode=True,
+                    async_framework="pipeline",
+                    pipeline_writers=3,
+                    pipeline_queue_size=2)
+
+        dataset = Datasets(provider_name="p1", 
+                    dataset_code="d1",
+                    name="d1 Name",
+                    last_update=datetime.now(),
+                    fetcher=f, 
+                    is_load_previous_version=False)
+        
+        class MockSeries(Series):
+            def bulk_series(self, series_list):
+                with self.lock:
+                    self.batches.append([s["key"] for s in series_list])
+                    self.count_inserts += len(series_list)
+            
+        s = MockSeries(dataset=dataset,
+                       provider_name="p1", 
+                       dataset_code="d1", 
+                       last_update=None, 
+                       fetcher=f,
+                       bulk_size=2)
+        s.batches = []
+        
+        class MyFetcher_Data(SeriesIterator):
+            
+            def rows_generator(self):
+                yield None, errors.RejectEmptySeries()
+                for i in range(7):
+                    bson = SERIES1.copy()
+                    bson["key"] = "key%s" % i
+                    yield bson, None
+            
+            def __init__(self, dataset):
+                super().__init__(dataset)
+                self.rows = self.rows_generator()
+                
+            def build_series(self, bson):
+                return bson
         
+        s.data_iterator = MyFetcher_Data(dataset)
+        s.process_series_data_pipeline()
+        
+        self.assertEqual(s.count_accepts, 7)
+        self.assertEqual(s.count_rejects, 1)
+        self.assertEqual(s.count_inserts, 7)
+        self.assertEqual(len(s.series_list), 0)
+        self.assertEqual(sorted([len(b) for b in s.batches]), [1, 2, 2, 2])
+        self.assertEqual(sorted([k for b in s.batches for k in b]),
+                         ["key%s" % i for i in range(7)])
+        self.assertEqual(s.pipeline_stats["batches"], 4)
+        self.assertEqual(s.pipeline_stats["writers"], 3)
+        self.assertTrue(s.pipeline_stats["max_depth"] <= 2)
+
+        """writer error is raised in producer"""
+        class ErrorSeries(MockSeries):
+            def bulk_series(self, series_list):
+                raise ValueError("WRITER ERROR")
+
+        s = ErrorSeries(dataset=dataset,
+                       provider_name="p1", 
+                       dataset_code="d1", 
+                       last_update=None, 
+                       fetcher=f,
+                       bulk_size=2)
+        s.data_iterator = MyFetcher_Data(dataset)
         
+        with self.assertRaises(ValueError) as err:
+            s.process_series_data_pipeline()
+        self.assertEqual(str(err.exception), "WRITER ERROR")
+
+    def test_process_series_data_pipeline_raw_bson(self):
+
+        # nosetests -s -v dlstats.tests.fetchers.test__commons:SeriesTestCase.test_process_series_data_pipeline_raw_bson
+
+        f = Fetcher(provider_name="p1",
+                    is_indexes=False,
+                    async_mode=True,
+                    async_framework="pipeline",
+                    pipeline_writers=2,
+                    pipeline_queue_size=2,
+                    raw_bson=True)
+
+        dataset = Datasets(provider_name="p1",
+                    dataset_code="d1",
+                    name="d1 Name",
+                    last_update=datetime.now(),
+                    fetcher=f,
+                    is_load_previous_version=False)
+
+        class MockSeries(Series):
+            def write_series_bulk(self, bulk):
+                with self.lock:
+                    self.batches.append(bulk)
+                    self.count_inserts += bulk["inserts"]
+
+        s = MockSeries(dataset=dataset,
+                       provider_name="p1",
+                       dataset_code="d1",
+                       last_update=None,
+                       fetcher=f,
+                       bulk_size=2)
+        s.batches = []
+        s.series_keys = {}
+
+        series_list = []
+        for i in range(5):
+            bson = deepcopy(SERIES1)
+            bson["key"] = "key%s" % i
+            series_list.append(bson)
+        s.data_iterator = FakeSeriesIterator(dataset, series_list)
+        s.process_series_data_pipeline()
+
+        self.assertEqual(s.count_inserts, 5)
+        self.assertEqual(sorted([len(b["requests"]) for b in s.batches]), [1, 2, 2])
+
+        '''writers receive encoded documents'''
+        docs = [r._doc for b in s.batches for r in b["requests"]]
+        self.assertTrue(all(isinstance(doc, RawBSONDocument) for doc in docs))
+        docs = sorted([BSON(doc.raw).decode() for doc in docs], key=lambda d: d["key"])
+        self.assertEqual([doc["key"] for doc in docs], ["key%s" % i for i in range(5)])
+        self.assertEqual(docs[0]["values"][0]["release_date"], datetime(2015, 1, 1))
+        self.assertEqual(docs[0]["digest"], series_digest(series_list[0]))
+        self.assertEqual(s.pipeline_stats["batches"], 3)
+
+
 class DB_IndexesTestCase(BaseDBTestCase):
 
     # nosetests -s -v dlstats.tests.fetchers.test__commons:DB_IndexesTestCase
@@ -1562,10 +2012,114 @@ class DB_SeriesTestCase(BaseDBTestCase):
         
         self.assertEqual(series.count(), len(series_list))
 
-    @unittest.skipIf(True, "TODO")    
-    def test_update_series_list_async(self):
+    def test_update_series_list_series_keys(self):
         
-        # nosetests -s -v dlstats.tests.fetchers.test__commons:DB_SeriesTestCase.test_update_series_list_async
+        # nosetests -s -v dlstats.tests.fetchers.test__commons:DB_SeriesTestCase.test_update_series_list_series_keys
+
+        f = Fetcher(provider_name="p1", 
+                    db=self.db)
+
+        d = Datasets(provider_name="p1", 
+                    dataset_code="d1",
+                    name="d1 name",
+                    last_update=datetime.now(),
+                    doc_href="http://www.example.com",
+                    fetcher=f, 
+                    is_load_previous_version=False)
+        
+        series_list = []
+        for i in range(3):
+            series = deepcopy(SERIES1)
+            series["key"] = "key%s" % i
+            series["slug"] = "p1-d1-key%s" % i
+            series_list.append(series)
+
+        s = Series(dataset=d,
+                   provider_name=f.provider_name, 
+                   dataset_code="d1", 
+                   last_update=datetime(2013,10,28), 
+                   bulk_size=1, 
+                   fetcher=f)
+
+        '''keys loaded once for all batches'''
+        with mock.patch.object(Series, "load_series_keys", autospec=True,
+                               side_effect=Series.load_series_keys) as load_keys:
+            for series in series_list:
+                s.series_list = [deepcopy(series)]
+                s.update_series_list()
+            self.assertEqual(load_keys.call_count, 1)
+
+        self.assertEqual(s.count_inserts, 3)
+        self.assertEqual(sorted(s.series_keys.keys()), ["key0", "key1", "key2"])
+        self.assertEqual(self.db[constants.COL_SERIES].count(), 3)
+
+        '''new run: keys and digests loaded from db'''
+        s = Series(dataset=d,
+                   provider_name=f.provider_name, 
+                   dataset_code="d1", 
+                   last_update=datetime(2013,10,29), 
+                   bulk_size=3, 
+                   fetcher=f)
+        
+        series_list[0]["values"][1]["value"] = "2.5"
+        s.series_list = deepcopy(series_list)
+        s.update_series_list()
+        self.assertEqual(s.count_inserts, 0)
+        self.assertEqual(s.count_updates, 1)
+        self.assertEqual(s.count_skips, 2)
+        self.assertEqual(s.series_keys["key0"], series_digest(series_list[0]))
+
+    def test_update_series_list_skip_same_digest(self):
+        
+        # nosetests -s -v dlstats.tests.fetchers.test__commons:DB_SeriesTestCase.test_update_series_list_skip_same_digest
+
+        f = Fetcher(provider_name="p1", 
+                    db=self.db)
+
+        d = Datasets(provider_name="p1", 
+                    dataset_code="d1",
+                    name="d1 name",
+                    last_update=datetime.now(),
+                    doc_href="http://www.example.com",
+                    fetcher=f, 
+                    is_load_previous_version=False)
+        
+        s = Series(dataset=d,
+                   provider_name=f.provider_name, 
+                   dataset_code="d1", 
+                   last_update=datetime(2013,10,28), 
+                   bulk_size=1, 
+                   fetcher=f)
+
+        s.series_list = [deepcopy(SERIES1)]
+        s.update_series_list()
+        self.assertEqual(s.count_inserts, 1)
+        
+        bson = self.db[constants.COL_SERIES].find_one({"key": SERIES1["key"]})
+        self.assertEqual(bson["digest"], series_digest(SERIES1))
+
+        '''same content - no diff, no write'''
+        s.series_list = [deepcopy(SERIES1)]
+        s.update_series_list()
+        self.assertEqual(s.count_skips, 1)
+        self.assertEqual(s.count_updates, 0)
+
+        '''changed content'''
+        series = deepcopy(SERIES1)
+        series["values"][1]["value"] = "2.5"
+        s.series_list = [series]
+        s.update_series_list()
+        self.assertEqual(s.count_skips, 1)
+        self.assertEqual(s.count_updates, 1)
+
+        bson = self.db[constants.COL_SERIES].find_one({"key": SERIES1["key"]})
+        self.assertEqual(bson["values"][1]["value"], "2.5")
+        self.assertEqual(bson["digest"], series_digest(series))
+
+    @unittest.skipIf(not HAVE_GEVENT, "gevent not installed")    
+    def test_process_series_data_async(self):
+        
+        # nosetests -s -v dlstats.tests.fetchers.test__commons:DB_SeriesTestCase.test_process_series_data_async
 
         provider_name = "p1"
         dataset_code = "d1"
@@ -1595,10 +2149,15 @@ class DB_SeriesTestCase(BaseDBTestCase):
                    provider_name=f.provider_name, 
                    dataset_code=dataset_code, 
                    last_update=datetime(2013,10,28), 
-                   bulk_size=1, 
+                   bulk_size=2, 
                    fetcher=f)
 
-        series_list = [SERIES1.copy()]
+        series_list = []
+        for i in range(5):
+            series = deepcopy(SERIES1)
+            series["key"] = "key%s" % i
+            series["slug"] = "p1-d1-key%s" % i
+            series_list.append(series)
         datas = FakeSeriesIterator(d, series_list)
         s.data_iterator = datas
         
@@ -1620,6 +2179,9 @@ class DB_SeriesTestCase(BaseDBTestCase):
                                                      "key": {"$in": keys}})
         
         self.assertEqual(series.count(), len(series_list))
+        
+        self.assertEqual(s.count_accepts, 5)
+        self.assertEqual(s.count_inserts, 5)
 
     def test_series_update_dataset_lists(self):
 
@@ -1852,6 +2414,60 @@ class DB_SeriesTestCase(BaseDBTestCase):
         self.assertEqual(bson["values"][0]["revisions"][0]["value"], old_value)
         self.assertEqual(bson["values"][0]["revisions"][0]["revision_date"], old_release_date)
         
+    def test_update_series_list_delta_updates(self):
+        
+        # nosetests -s -v dlstats.tests.fetchers.test__commons:DB_SeriesTestCase.test_update_series_list_delta_updates
+
+        def load(fetcher, key, values, last_update):
+            d = Datasets(provider_name="p1", 
+                        dataset_code="d1",
+                        name="d1 name",
+                        last_update=last_update,
+                        fetcher=fetcher, 
+                        is_load_previous_version=False)
+            s = Series(dataset=d,
+                       provider_name="p1", 
+                       dataset_code="d1", 
+                       last_update=last_update, 
+                       fetcher=fetcher)
+            series = deepcopy(SERIES1)
+            series["key"] = key
+            series["slug"] = "p1-d1-%s" % key
+            series["values"] = deepcopy(values)
+            series["start_date"] = values[0]["ordinal"]
+            series["end_date"] = values[-1]["ordinal"]
+            s.series_list = [series]
+            s.update_series_list()
+            return s
+        
+        values1 = [{"period": str(1970 + i), "ordinal": i, "value": "1.5",
+                    "attributes": None} for i in range(10)]
+        values2 = deepcopy(values1)
+        values2[8]["value"] = "2.5"
+        values2.append({"period": "1980", "ordinal": 10, "value": "3.0",
+                        "attributes": None})
+
+        '''same series with full and delta updates'''
+        f_full = Fetcher(provider_name="p1", db=self.db)
+        f_delta = Fetcher(provider_name="p1", db=self.db, delta_updates=True)
+        
+        load(f_full, "full", values1, datetime(2014, 1, 1))
+        load(f_delta, "delta", values1, datetime(2014, 1, 1))
+        load(f_full, "full", values2, datetime(2015, 1, 1))
+        s = load(f_delta, "delta", values2, datetime(2015, 1, 1))
+        self.assertEqual(s.count_updates, 1)
+        self.assertEqual(s.count_deltas, 1)
+        
+        projection = {"_id": False, "key": False, "slug": False}
+        col = self.db[constants.COL_SERIES]
+        full = col.find_one({"key": "full"}, projection)
+        delta = col.find_one({"key": "delta"}, projection)
+        '''notes is not set if not changed'''
+        self.assertIsNone(full.pop("notes"))
+        self.assertEqual(delta, full)
+        self.assertEqual(len(delta["values"]), 11)
+        self.assertEqual(delta["values"][8]["revisions"][0]["value"], "1.5")
+
 class DB_DummyTestCase(BaseDBTestCase):
 
     # nosetests -s -v dlstats.tests.fetchers.test__commons:DB_DummyTestCase
@@ -1885,6 +2501,7 @@ class DB_DummyTestCase(BaseDBTestCase):
         self.maxDiff = None
         
         series.pop('_id')
+        self.assertIsNotNone(series.pop('digest'))
         for v in series["values"]:
             v.pop("release_date")
         
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+
+from copy import deepcopy
+from datetime import datetime
+
+from bson import BSON
+
+from dlstats import constants
+from dlstats.fetchers import schemas
+from dlstats.fetchers import compact
+from dlstats.fetchers._commons import Fetcher, Datasets, Series
+
+from dlstats.tests.base import BaseTestCase, BaseDBTestCase
+
+RELEASE1 = datetime(2015, 1, 1)
+RELEASE2 = datetime(2016, 1, 1)
+
+def annual_values(start_year=1960, count=55):
+    values = []
+    for i in range(count):
+        year = start_year + i
+        values.append({"period": str(year),
+                       "ordinal": year - 1970,
+                       "value": "%s.5" % i,
+                       "release_date": RELEASE1,
+                       "attributes": None})
+    return values
+
+def annual_series(key="key1", count=55):
+    values = annual_values(count=count)
+    return {
+        'provider_name': 'p1',
+        'dataset_code': 'd1',
+        'name': 'series %s' % key,
+        'key': key,
+        'slug': 'p1-d1-%s' % key,
+        'values': values,
+        'attributes': None,
+        'dimensions': {'country': 'fra'},
+        'start_date': values[0]["ordinal"],
+        'end_date': values[-1]["ordinal"],
+        'start_ts': datetime(1960, 1, 1),
+        'end_ts': datetime(2014, 12, 31),
+        'frequency': 'A',
+    }
+
+class CompactTestCase(BaseTestCase):
+
+    # nosetests -s -v dlstats.tests.fetchers.test_compact:CompactTestCase
+
+    def test_encode_values(self):
+
+        # nosetests -s -v dlstats.tests.fetchers.test_compact:CompactTestCase.test_encode_values
+
+        values = annual_values(count=3)
+        result = compact.encode_values(values, "A")
+
+        self.assertEqual(result, {
+            "start": -10,
+            "ordinals": None,
+            "periods": None,
+            "values": ["0.5", "1.5", "2.5"],
+            "release_dates": [RELEASE1],
+            "release_index": None,
+            "attributes": None,
+            "revisions": None,
+        })
+        self.assertEqual(compact.decode_values(result, "A"), values)
+
+    def test_round_trip(self):
+
+        # nosetests -s -v dlstats.tests.fetchers.test_compact:CompactTestCase.test_round_trip
+
+        '''gaps, release dates, attributes and revisions'''
+        values = annual_values(count=5)
+        del values[2]
+        values[1]["release_date"] = RELEASE2
+        values[0]["attributes"] = {"obs-status": "e"}
+        values[3]["attributes"] = {}
+        values[1]["revisions"] = [{"value": "1.0",
+                                   "attributes": None,
+                                   "revision_date": RELEASE1}]
+
+        result = compact.encode_values(values, "A")
+        self.assertEqual(result["ordinals"], [0, 1, 3, 4])
+        self.assertEqual(result["release_dates"], [RELEASE1, RELEASE2])
+        self.assertEqual(result["release_index"], [0, 1, 0, 0])
+        self.assertEqual(sorted(result["attributes"].keys()), ["0", "3"])
+        self.assertEqual(list(result["revisions"].keys()), ["1"])
+        self.assertEqual(compact.decode_values(result, "A"), values)
+
+        '''periods not in default format'''
+        values = [{"period": "2016-01-27", "ordinal": 2404, "value": "1",
+                   "release_date": RELEASE1, "attributes": None},
+                  {"period": "2016-02-03", "ordinal": 2405, "value": "2",
+                   "release_date": RELEASE1, "attributes": None}]
+        result = compact.encode_values(values, "W-WED")
+        self.assertEqual(result["periods"], ["2016-01-27", "2016-02-03"])
+        self.assertEqual(compact.decode_values(result, "W-WED"), values)
+
+        values = [{"period": "2016Q1", "ordinal": 184, "value": "1",
+                   "release_date": RELEASE1, "attributes": None}]
+        result = compact.encode_values(values, "Q")
+        self.assertEqual(result["periods"], ["2016Q1"])
+
+        values = [{"period": "2016-Q1", "ordinal": 184, "value": "1",
+                   "release_date": RELEASE1, "attributes": None}]
+        result = compact.encode_values(values, "Q")
+        self.assertIsNone(result["periods"])
+
+    def test_compact_series(self):
+
+        # nosetests -s -v dlstats.tests.fetchers.test_compact:CompactTestCase.test_compact_series
+
+        bson = annual_series()
+        expected = deepcopy(bson)
+        size = len(BSON.encode(bson))
+
+        compact.compact_series(bson)
+        self.assertFalse("values" in bson)
+        self.assertEqual(bson["schema_version"], schemas.SERIES_COMPACT_SCHEMA_VERSION)
+        schemas.series_schema_versioned(bson)
+        self.assertTrue(size / len(BSON.encode(bson)) > 3)
+
+        self.assertEqual(compact.get_values(bson), expected["values"])
+        self.assertEqual(compact.expand_series(bson), expected)
+        schemas.series_schema_versioned(bson)
+
+class DB_CompactTestCase(BaseDBTestCase):
+
+    # nosetests -s -v dlstats.tests.fetchers.test_compact:DB_CompactTestCase
+
+    def test_bulk_series_compact(self):
+
+        # nosetests -s -v dlstats.tests.fetchers.test_compact:DB_CompactTestCase.test_bulk_series_compact
+
+        f = Fetcher(provider_name="p1", db=self.db, compact_values=True)
+        d = Datasets(provider_name="p1",
+                     dataset_code="d1",
+                     name="d1 name",
+                     last_update=datetime.now(),
+                     fetcher=f,
+                     is_load_previous_version=False)
+
+        s = Series(dataset=d, provider_name="p1", dataset_code="d1",
+                   last_update=RELEASE1, fetcher=f)
+        s.series_list = [annual_series()]
+        s.update_series_list()
+
+        doc = self.db[constants.COL_SERIES].find_one({"key": "key1"})
+        self.assertFalse("values" in doc)
+        self.assertEqual(len(doc["values_compact"]["values"]), 55)
+
+        '''update: revision read from compact document'''
+        s = Series(dataset=d, provider_name="p1", dataset_code="d1",
+                   last_update=RELEASE2, fetcher=f)
+        series = annual_series()
+        series["values"][-1]["value"] = "100"
+        s.series_list = [series]
+        s.update_series_list()
+        self.assertEqual(s.count_updates, 1)
+
+        doc = self.db[constants.COL_SERIES].find_one({"key": "key1"})
+        values = compact.get_values(doc)
+        self.assertEqual(values[-1]["value"], "100")
+        self.assertEqual(values[-1]["release_date"], RELEASE2)
+        self.assertEqual(values[-1]["revisions"][0]["value"], "54.5")
+        self.assertEqual(values[0]["release_date"], RELEASE1)
+
+        '''update without compact_values: default layout'''
+        f.compact_values = False
+        s = Series(dataset=d, provider_name="p1", dataset_code="d1",
+                   last_update=RELEASE2, fetcher=f)
+        series = annual_series()
+        series["values"][0]["value"] = "100"
+        s.series_list = [series]
+        s.update_series_list()
+
+        doc = self.db[constants.COL_SERIES].find_one({"key": "key1"})
+        self.assertFalse("values_compact" in doc)
+        self.assertFalse("schema_version" in doc)
+        self.assertEqual(doc["values"][0]["value"], "100")
+
+    def test_migrate_series(self):
+
+        # nosetests -s -v dlstats.tests.fetchers.test_compact:DB_CompactTestCase.test_migrate_series
+
+        col = self.db[constants.COL_SERIES]
+        for i in range(3):
+            bson = annual_series(key="key%s" % i)
+            bson["values"][2]["attributes"] = {"obs-status": "e"}
+            col.insert_one(bson)
+        bson = annual_series(key="other")
+        bson["dataset_code"] = "d2"
+        col.insert_one(bson)
+
+        query = {"provider_name": "p1", "dataset_code": "d1"}
+        stats = compact.migrate_series(self.db, query=query, bulk_size=2)
+        self.assertEqual(stats["count"], 3)
+        self.assertTrue(stats["bytes_before"] / stats["bytes_after"] > 3)
+        self.assertEqual(col.count({"values_compact": {"$exists": True}}), 3)
+
+        '''already compact'''
+        stats = compact.migrate_series(self.db, query=query)
+        self.assertEqual(stats["count"], 0)
+
+        stats = compact.migrate_series(self.db, compact=False)
+        self.assertEqual(stats["count"], 3)
+        self.assertEqual(col.count({"values_compact": {"$exists": True}}), 0)
+
+        doc = col.find_one({"key": "key0"}, {"_id": False})
+        expected = annual_series(key="key0")
+        expected["values"][2]["attributes"] = {"obs-status": "e"}
+        self.assertEqual(doc, expected)
@@ -3,9 +3,14 @@
 import tempfile
 import datetime
 import os
+import shutil
 from copy import deepcopy
 
-from dlstats.fetchers.eurostat import Eurostat as Fetcher, make_url
+from widukind_common import errors
+
+from dlstats import constants, download_cache
+from dlstats.fetchers._commons import Datasets
+from dlstats.fetchers.eurostat import Eurostat as Fetcher, EurostatData, make_url
 
 import httpretty
 import unittest
@@ -124,6 +129,58 @@ class FetcherTestCase(BaseFetcherTestCase):
         self.assertDataset(dataset_code)        
         self.assertSeries(dataset_code)
         
+    @httpretty.activate
+    def test_upsert_dataset_not_changed(self):
+        
+        # nosetests -s -v dlstats.tests.fetchers.test_eurostat:FetcherTestCase.test_upsert_dataset_not_changed
+
+        dataset_code = "nama_10_fcs"
+        self._load_files(dataset_code)
+
+        cache_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_path, True)
+        download_cache.configure_download_cache(cache_path=cache_path)
+        self.addCleanup(download_cache.remove_download_cache)
+        
+        self.assertIsNotNone(self.fetcher.wrap_upsert_dataset(dataset_code))
+        
+        '''same zip file: dataset rejected before parsing'''
+        self._load_files_dataset(dataset_code)
+        dataset = Datasets(provider_name=self.fetcher.provider_name, 
+                           dataset_code=dataset_code, 
+                           name=dataset_code,
+                           last_update=datetime.datetime.now(),
+                           fetcher=self.fetcher)
+        self.assertTrue(dataset.from_db)
+        self.assertEqual(len(dataset.download_digests), 1)
+        with self.assertRaises(errors.RejectUpdatedDataset):
+            EurostatData(dataset)
+        
+        '''failed update: digest not recorded, the same file is parsed again'''
+        self._load_files_dataset(dataset_code)
+        self.db[constants.COL_DATASETS].update_one({"dataset_code": dataset_code},
+                                                   {"$set": {"download_digests": []}})
+        dataset = Datasets(provider_name=self.fetcher.provider_name, 
+                           dataset_code=dataset_code, 
+                           name=dataset_code,
+                           last_update=datetime.datetime.now(),
+                           fetcher=self.fetcher)
+        dataset.series.data_iterator = EurostatData(dataset)
+        def process_series_data():
+            raise Exception("parse error")
+        dataset.series.process_series_data = process_series_data
+        dataset.update_database()
+        doc = self.db[constants.COL_DATASETS].find_one({"dataset_code": dataset_code})
+        self.assertEqual(doc["download_digests"], [])
+
+        self._load_files_dataset(dataset_code)
+        dataset = Datasets(provider_name=self.fetcher.provider_name, 
+                           dataset_code=dataset_code, 
+                           name=dataset_code,
+                           last_update=datetime.datetime.now(),
+                           fetcher=self.fetcher)
+        EurostatData(dataset)
+        
     @httpretty.activate
     def test_datasets_list(self):
 
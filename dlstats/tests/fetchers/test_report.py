@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import io
+import json
+from datetime import datetime
+
+from dlstats import constants
+from dlstats.fetchers import report
+
+from dlstats.tests.base import BaseDBTestCase
+
+class DB_ReportTestCase(BaseDBTestCase):
+
+    # nosetests -s -v dlstats.tests.fetchers.test_report:DB_ReportTestCase
+
+    def setUp(self):
+        super().setUp()
+        for name, enable in [("p1", True), ("p2", False)]:
+            self.db[constants.COL_PROVIDERS].insert_one({"name": name,
+                                                         "enable": enable,
+                                                         "version": 1})
+        now = datetime(2016, 1, 28, 12, 53)
+        datasets = [("p1", "d1", 3, None), ("p1", "d2", 1, 10),
+                    ("p2", "d3", 2, None), ("p2", "d4", 0, None)]
+        for provider_name, dataset_code, count, series_count in datasets:
+            self.db[constants.COL_DATASETS].insert_one({"provider_name": provider_name,
+                                                        "dataset_code": dataset_code,
+                                                        "last_update": now,
+                                                        "download_first": now,
+                                                        "download_last": now,
+                                                        "series_count": series_count})
+            for i in range(count):
+                self.db[constants.COL_SERIES].insert_one({"provider_name": provider_name,
+                                                          "dataset_code": dataset_code,
+                                                          "key": "key%s" % i})
+
+    def test_series_counts(self):
+
+        # nosetests -s -v dlstats.tests.fetchers.test_report:DB_ReportTestCase.test_series_counts
+
+        self.assertEqual(report.series_counts(self.db),
+                         {("p1", "d1"): 3, ("p1", "d2"): 1, ("p2", "d3"): 2})
+        self.assertEqual(report.series_counts(self.db, ["p2"]),
+                         {("p2", "d3"): 2})
+
+    def test_get_report(self):
+
+        # nosetests -s -v dlstats.tests.fetchers.test_report:DB_ReportTestCase.test_get_report
+
+        rows = report.get_report(self.db)
+        self.assertEqual([(r["provider_name"], r["dataset_code"], r["series"]) for r in rows],
+                         [("p1", "d1", 3), ("p1", "d2", 1), ("p2", "d3", 2), ("p2", "d4", 0)])
+        self.assertFalse(rows[2]["enable"])
+
+        rows = report.get_report(self.db, sort="series", reverse=True)
+        self.assertEqual([r["dataset_code"] for r in rows], ["d1", "d3", "d2", "d4"])
+
+        rows = report.get_report(self.db, provider_name="p2", sort="dataset", reverse=True)
+        self.assertEqual([r["dataset_code"] for r in rows], ["d4", "d3"])
+
+        '''series_count of the datasets if present'''
+        rows = report.get_report(self.db, provider_name="p1", stored_counts=True)
+        self.assertEqual([r["series"] for r in rows], [3, 10])
+
+        with self.assertRaises(ValueError):
+            report.get_report(self.db, sort="other")
+
+    def test_write_report(self):
+
+        # nosetests -s -v dlstats.tests.fetchers.test_report:DB_ReportTestCase.test_write_report
+
+        rows = report.get_report(self.db)
+
+        stream = io.StringIO()
+        report.write_json(rows, stream, pretty=True)
+        data = json.loads(stream.getvalue())
+        self.assertEqual(len(data), 4)
+        self.assertEqual(data[0]["series"], 3)
+
+        stream = io.StringIO()
+        report.write_csv(rows, stream)
+        data = list(csv.DictReader(io.StringIO(stream.getvalue())))
+        self.assertEqual(len(data), 4)
+        self.assertEqual(data[1]["dataset_code"], "d2")
+        self.assertEqual(data[1]["download_last"], "2016-01-28T12:53:00")
+
+        stream = io.StringIO()
+        report.write_table(rows, stream, mongo_url="mongodb://localhost/widukind")
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(len(lines), 10)
+        self.assertTrue(lines[7].startswith("p2 *"))
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+from copy import deepcopy
+from datetime import datetime
+
+from dlstats import constants
+from dlstats.fetchers import revisions
+from dlstats.fetchers._commons import Fetcher, Datasets, Series
+
+from dlstats.tests.base import BaseDBTestCase
+
+RELEASE1 = datetime(2015, 1, 1)
+RELEASE2 = datetime(2015, 4, 1)
+RELEASE3 = datetime(2015, 7, 1)
+
+def quarterly_series(values):
+    return {
+        'provider_name': 'p1',
+        'dataset_code': 'd1',
+        'name': 'series1',
+        'key': 'key1',
+        'slug': 'p1-d1-key1',
+        'values': [{"period": "2014-Q%s" % (i + 1),
+                    "ordinal": 176 + i,
+                    "value": value,
+                    "attributes": None} for i, value in enumerate(values)],
+        'attributes': None,
+        'dimensions': {'country': 'fra'},
+        'start_date': 176,
+        'end_date': 176 + len(values) - 1,
+        'start_ts': datetime(2014, 1, 1),
+        'end_ts': datetime(2014, 12, 31, 23, 59, 59),
+        'frequency': 'Q',
+    }
+
+class DB_RevisionsTestCase(BaseDBTestCase):
+
+    # nosetests -s -v dlstats.tests.fetchers.test_revisions:DB_RevisionsTestCase
+
+    def load(self, fetcher, values, last_update):
+        dataset = Datasets(provider_name="p1",
+                           dataset_code="d1",
+                           name="d1 name",
+                           last_update=last_update,
+                           fetcher=fetcher,
+                           is_load_previous_version=False)
+        s = Series(dataset=dataset, provider_name="p1", dataset_code="d1",
+                   last_update=last_update, fetcher=fetcher)
+        s.series_list = [quarterly_series(values)]
+        s.update_series_list()
+        return s
+
+    def test_revisions_collection(self):
+
+        # nosetests -s -v dlstats.tests.fetchers.test_revisions:DB_RevisionsTestCase.test_revisions_collection
+
+        with self.assertRaises(ValueError):
+            Fetcher(provider_name="p1", db=self.db, revisions_storage="other")
+
+        f = Fetcher(provider_name="p1", db=self.db,
+                    revisions_storage=revisions.REVISIONS_COLLECTION)
+
+        self.load(f, ["1.0", "2.0", "3.0"], RELEASE1)
+        self.load(f, ["1.0", "2.5", "3.0", "4.0"], RELEASE2)
+        s = self.load(f, ["1.0", "2.7", "3.5", "4.0"], RELEASE3)
+        self.assertEqual(s.count_updates, 1)
+
+        '''latest values only in series'''
+        doc = self.db[constants.COL_SERIES].find_one({"slug": "p1-d1-key1"})
+        self.assertEqual([obs["value"] for obs in doc["values"]],
+                         ["1.0", "2.7", "3.5", "4.0"])
+        for obs in doc["values"]:
+            self.assertFalse("revisions" in obs)
+
+        history = revisions.get_revisions(self.db, "p1-d1-key1")
+        self.assertEqual([(r["period"], r["value"], r["revision_date"]) for r in history],
+                         [("2014-Q2", "2.0", RELEASE1),
+                          ("2014-Q2", "2.5", RELEASE2),
+                          ("2014-Q3", "3.0", RELEASE1)])
+
+        '''replay of a revision is ignored'''
+        revisions.write_revisions(self.db, deepcopy(history))
+        self.assertEqual(self.db[constants.COL_SERIES_REVISIONS].count(), 3)
+
+        '''vintages'''
+        def vintage(date):
+            return [(obs["period"], obs["value"]) 
+                    for obs in revisions.series_vintage(self.db, "p1-d1-key1", date)]
+
+        self.assertEqual(vintage(datetime(2014, 1, 1)), [])
+        self.assertEqual(vintage(RELEASE1), [("2014-Q1", "1.0"), ("2014-Q2", "2.0"), 
+                                             ("2014-Q3", "3.0")])
+        self.assertEqual(vintage(datetime(2015, 5, 1)), [("2014-Q1", "1.0"), ("2014-Q2", "2.5"), 
+                                                         ("2014-Q3", "3.0"), ("2014-Q4", "4.0")])
+        self.assertEqual(vintage(RELEASE3), [("2014-Q1", "1.0"), ("2014-Q2", "2.7"), 
+                                             ("2014-Q3", "3.5"), ("2014-Q4", "4.0")])
+        self.assertIsNone(revisions.series_vintage(self.db, "unknown", RELEASE3))
+
+    def test_revisions_collection_delta_updates(self):
+
+        # nosetests -s -v dlstats.tests.fetchers.test_revisions:DB_RevisionsTestCase.test_revisions_collection_delta_updates
+
+        f_inline = Fetcher(provider_name="p1", db=self.db)
+        f = Fetcher(provider_name="p1", db=self.db,
+                    revisions_storage=revisions.REVISIONS_COLLECTION,
+                    delta_updates=True)
+
+        self.load(f_inline, ["1.0", "2.0", "3.0", "4.0"], RELEASE1)
+        self.load(f_inline, ["1.5", "2.0", "3.0", "4.0"], RELEASE2)
+
+        '''inline revisions of unrevised observations: full rewrite'''
+        s = self.load(f, ["1.5", "2.0", "3.0", "4.5"], RELEASE3)
+        self.assertEqual(s.count_updates, 1)
+        self.assertEqual(s.count_deltas, 0)
+
+        doc = self.db[constants.COL_SERIES].find_one({"slug": "p1-d1-key1"})
+        self.assertEqual([obs["value"] for obs in doc["values"]],
+                         ["1.5", "2.0", "3.0", "4.5"])
+        for obs in doc["values"]:
+            self.assertFalse("revisions" in obs)
+
+        history = revisions.get_revisions(self.db, "p1-d1-key1")
+        self.assertEqual([(r["period"], r["value"], r["revision_date"]) for r in history],
+                         [("2014-Q1", "1.0", RELEASE1),
+                          ("2014-Q4", "4.0", RELEASE1)])
+
+        '''without inline revisions: delta update'''
+        s = self.load(f, ["1.5", "2.0", "3.5", "4.5"], datetime(2015, 10, 1))
+        self.assertEqual(s.count_deltas, 1)
+        doc = self.db[constants.COL_SERIES].find_one({"slug": "p1-d1-key1"})
+        self.assertEqual(doc["values"][2]["value"], "3.5")
+        self.assertFalse("revisions" in doc["values"][2])
+        self.assertEqual(self.db[constants.COL_SERIES_REVISIONS].count(), 3)
+
+    def test_revisions_inline_vintage(self):
+
+        # nosetests -s -v dlstats.tests.fetchers.test_revisions:DB_RevisionsTestCase.test_revisions_inline_vintage
+
+        f = Fetcher(provider_name="p1", db=self.db)
+
+        self.load(f, ["1.0", "2.0"], RELEASE1)
+        self.load(f, ["1.5", "2.0"], RELEASE2)
+
+        doc = self.db[constants.COL_SERIES].find_one({"slug": "p1-d1-key1"})
+        self.assertEqual(len(doc["values"][0]["revisions"]), 1)
+        self.assertEqual(self.db[constants.COL_SERIES_REVISIONS].count(), 0)
+
+        values = revisions.series_vintage(self.db, "p1-d1-key1", RELEASE1)
+        self.assertEqual([obs["value"] for obs in values], ["1.0", "2.0"])
+        self.assertEqual(values[0]["release_date"], RELEASE1)
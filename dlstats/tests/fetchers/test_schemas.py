@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+
+from copy import deepcopy
+from datetime import datetime
+
+from voluptuous import MultipleInvalid
+
+from dlstats import constants
+from dlstats.fetchers import schemas
+from dlstats.fetchers import schemas_check
+
+from dlstats.tests.base import BaseTestCase, BaseDBTestCase
+
+SERIES = {
+    'provider_name': 'p1',
+    'dataset_code': 'd1',
+    'name': 'series1',
+    'key': 'key1',
+    'slug': 'p1-d1-key1',
+    'values': [
+        {
+            'release_date': datetime(2015, 1, 1),
+            'ordinal': 25,
+            'period': '1995',
+            'value': '1.0',
+            'attributes': {'OBS_STATUS': 'a'},
+            'revisions': [
+                {
+                    'revision_date': datetime(2014, 1, 1),
+                    'value': '0.5',
+                    'attributes': None,
+                }
+            ],
+        },
+        {
+            'release_date': datetime(2015, 1, 1),
+            'ordinal': 26,
+            'period': '1996',
+            'value': '1.5',
+            'attributes': None,
+        }
+    ],
+    'attributes': None,
+    'dimensions': {'Country': 'AFG'},
+    'start_date': 25,
+    'end_date': 26,
+    'start_ts': datetime(1995, 1, 1),
+    'end_ts': datetime(1996, 12, 31),
+    'frequency': 'A',
+    'digest': None,
+}
+
+class SchemasTestCase(BaseTestCase):
+
+    # nosetests -s -v dlstats.tests.fetchers.test_schemas:SchemasTestCase
+
+    def assertSameErrors(self, bson):
+        with self.assertRaises(MultipleInvalid) as err1:
+            schemas.series_schema(bson)
+        with self.assertRaises(MultipleInvalid) as err2:
+            schemas.series_schema_compiled(bson)
+        self.assertEqual(str(err2.exception), str(err1.exception))
+        self.assertEqual([e.path for e in err2.exception.errors],
+                         [e.path for e in err1.exception.errors])
+
+    def test_series_schema_compiled(self):
+
+        # nosetests -s -v dlstats.tests.fetchers.test_schemas:SchemasTestCase.test_series_schema_compiled
+
+        self.assertTrue(schemas.check_series(SERIES))
+        self.assertEqual(schemas.series_schema_compiled(SERIES), SERIES)
+
+        invalids = [
+            (("name",), ""),
+            (("start_date",), "25"),
+            (("end_ts",), None),
+            (("dimensions",), {}),
+            (("dimensions", "Country"), 1),
+            (("values",), ()),
+            (("values", 1, "period"), ""),
+            (("values", 1, "release_date"), "2015-01-01"),
+            (("values", 1, "extra"), 1),
+            (("values", 0, "revisions", 0, "value"), 0.5),
+            (("tags",), "a"),
+        ]
+        for path, value in invalids:
+            bson = deepcopy(SERIES)
+            parent = bson
+            for key in path[:-1]:
+                parent = parent[key]
+            parent[path[-1]] = value
+            self.assertFalse(schemas.check_series(bson), path)
+            self.assertSameErrors(bson)
+
+        for key in ["key", "values", "frequency"]:
+            bson = deepcopy(SERIES)
+            bson.pop(key)
+            self.assertFalse(schemas.check_series(bson), key)
+            self.assertSameErrors(bson)
+
+        bson = deepcopy(SERIES)
+        del bson["values"][1]["ordinal"]
+        self.assertSameErrors(bson)
+
+    def test_get_series_validator(self):
+
+        # nosetests -s -v dlstats.tests.fetchers.test_schemas:SchemasTestCase.test_get_series_validator
+
+        self.assertIs(schemas.get_series_validator(), schemas.series_schema_compiled)
+        self.assertIs(schemas.get_series_validator("voluptuous"), schemas.series_schema)
+
+        with self.assertRaises(ValueError):
+            schemas.get_series_validator("other")
+
+        '''sample: validate 1 of 3 series'''
+        validator = schemas.get_series_validator(sample=3)
+        self.assertIsInstance(validator, schemas.SampledValidator)
+
+        bson = deepcopy(SERIES)
+        bson.pop("key")
+        with self.assertRaises(MultipleInvalid):
+            validator(bson)
+        validator(bson)
+        validator(bson)
+        with self.assertRaises(MultipleInvalid):
+            validator(bson)
+
+class DB_SchemasCheckTestCase(BaseDBTestCase):
+
+    # nosetests -s -v dlstats.tests.fetchers.test_schemas:DB_SchemasCheckTestCase
+
+    def test_check_schemas(self):
+
+        # nosetests -s -v dlstats.tests.fetchers.test_schemas:DB_SchemasCheckTestCase.test_check_schemas
+
+        docs = []
+        for i in range(2500):
+            bson = deepcopy(SERIES)
+            bson["key"] = "key%s" % i
+            bson["provider_name"] = "p1" if i < 2000 else "p2"
+            if i % 500 == 0:
+                bson.pop("frequency")
+            docs.append(bson)
+        self.db[constants.COL_SERIES].insert_many(docs)
+
+        self.assertEqual(schemas_check.get_query(constants.COL_SERIES, provider="p1", dataset="d1"),
+                         {"provider_name": "p1", "dataset_code": "d1"})
+        self.assertEqual(schemas_check.get_query(constants.COL_PROVIDERS, provider="p1"),
+                         {"name": "p1"})
+        self.assertIsNone(schemas_check.get_query(constants.COL_PROVIDERS, dataset="d1"))
+
+        '''_id ranges: SHARD_MIN_SIZE documents by shard at least'''
+        count, queries = schemas_check.get_shards(self.db, constants.COL_SERIES, shards=8)
+        self.assertEqual(count, 2500)
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn("$gte", queries[0]["_id"])
+        self.assertEqual(queries[0]["_id"]["$lt"], queries[1]["_id"]["$gte"])
+        self.assertEqual(sum(self.db[constants.COL_SERIES].count(q) for q in queries), 2500)
+
+        reports = list(schemas_check.check_schemas(self.db, shards=8))
+        self.assertEqual([(r["collection"], r["shard"], r["shards"]) for r in reports],
+                         [(constants.COL_CATEGORIES, 0, 1),
+                          (constants.COL_DATASETS, 0, 1),
+                          (constants.COL_PROVIDERS, 0, 1),
+                          (constants.COL_SERIES, 0, 2),
+                          (constants.COL_SERIES, 1, 2)])
+        merged = schemas_check.merge_reports(reports)
+        self.assertEqual(merged[constants.COL_SERIES]["count"], 2500)
+        self.assertEqual(merged[constants.COL_SERIES]["verified"], 2500)
+        self.assertEqual(merged[constants.COL_SERIES]["error"], 5)
+        self.assertEqual(merged[constants.COL_SERIES]["shards"], 2)
+        self.assertEqual(merged[constants.COL_PROVIDERS]["verified"], 0)
+
+        '''filters and max errors'''
+        reports = list(schemas_check.check_schemas(self.db, provider="p1", 
+                                                   dataset="d1", shards=1,
+                                                   max_errors=2))
+        self.assertEqual([r["collection"] for r in reports], 
+                         [constants.COL_DATASETS, constants.COL_SERIES])
+        report = reports[1]
+        self.assertEqual(report["count"], 2000)
+        self.assertEqual(report["error"], 2)
+        self.assertTrue(report["max_errors"])
+        self.assertEqual(len(report["errors"]), 2)
+        self.assertIn("frequency", report["errors"][0][1])
@@ -1,10 +1,14 @@
 # -*- coding: utf-8 -*-
 
 import os
+import json
+from datetime import datetime
+from collections import OrderedDict
 
 import httpretty
 
-from dlstats.fetchers.world_bank import WorldBankAPI as Fetcher
+from dlstats.fetchers._commons import Datasets
+from dlstats.fetchers.world_bank import WorldBankAPI as Fetcher, WorldBankAPIData
 
 from dlstats.tests.base import RESOURCES_DIR as BASE_RESOURCES_DIR
 from dlstats.tests.fetchers.base import BaseFetcherTestCase
@@ -158,3 +162,61 @@ class FetcherTestCase(BaseFetcherTestCase):
         self.assertDataset(dataset_code)        
         self.assertSeries(dataset_code)
 
+
+    @httpretty.activate
+    def test_process_countries_by_request(self):
+
+        # nosetests -s -v dlstats.tests.fetchers.test_world_bank:FetcherTestCase.test_process_countries_by_request
+
+        countries = OrderedDict()
+        for iso3, iso2 in [("FRA", "FR"), ("DEU", "DE"), ("ITA", "IT")]:
+            countries[iso3] = {"id": iso3, "iso2Code": iso2, "name": iso3}
+        
+        def values(*codes):
+            datas = []
+            for iso3, iso2 in codes:
+                for year in ["2014", "2015"]:
+                    datas.append({"country": {"id": iso2, "value": iso3},
+                                  "countryiso3code": iso3,
+                                  "date": year, "value": 1.0, "obs_status": ""})
+            meta = {"page": 1, "pages": 1, "per_page": 1000, 
+                    "lastupdated": "2016-01-06", "total": len(datas)}
+            return json.dumps([meta, datas])
+        
+        base_url = "http://api.worldbank.org/v2/countries"
+        '''multi-countries response in any order'''
+        httpretty.register_uri(httpretty.GET, base_url + "/FRA;DEU/indicators/I1",
+                               body=values(("DEU", "DE"), ("FRA", "FR")))
+        httpretty.register_uri(httpretty.GET, base_url + "/ITA/indicators/I1",
+                               body=values(("ITA", "IT")))
+        httpretty.register_uri(httpretty.GET, base_url + "/FRA;DEU/indicators/I2",
+                               body=values(("FRA", "FR")))
+        httpretty.register_uri(httpretty.GET, base_url + "/ITA/indicators/I2",
+                               body=values(("ITA", "IT")))
+        
+        f = Fetcher(db=self.db, countries_by_request=2, download_workers=2, 
+                    rate_limit=0)
+        dataset = Datasets(provider_name=f.provider_name, 
+                           dataset_code="GEP", 
+                           fetcher=f, 
+                           is_load_previous_version=False)
+        '''I2 already loaded with this release'''
+        dataset.metadata = {"indicators": {"i2": datetime(2016, 1, 6)}}
+        
+        indicators = [{"id": "I1", "name": "I1"}, {"id": "I2", "name": "I2"}]
+        with mock.patch.object(Fetcher, "available_countries", return_value=countries), \
+                mock.patch.object(WorldBankAPIData, "_download_indicators", return_value=indicators):
+            data = WorldBankAPIData(dataset, {"metadata": {"id": "27"}})
+        
+        rows = []
+        for row, err in data.rows:
+            if row:
+                rows.append((data.current_indicator["id"], 
+                             data.current_country, 
+                             [d["countryiso3code"] for d in row["datas"]]))
+        
+        self.assertEqual(rows, [("I1", "FRA", ["FRA", "FRA"]),
+                                ("I1", "DEU", ["DEU", "DEU"]),
+                                ("I1", "ITA", ["ITA", "ITA"])])
+        self.assertEqual(data.rejected_indicators, set(["I2"]))
+        self.assertEqual(dataset.metadata["indicators"]["i1"], datetime(2016, 1, 6))
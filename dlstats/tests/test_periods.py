@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+import random
+from datetime import date, datetime, timedelta
+
+import pandas
+
+from dlstats.tests.base import BaseTestCase
+
+from dlstats import periods
+
+def pandas_freq(freq):
+    """Annual alias changed from A to Y in recent pandas"""
+    if freq == "A":
+        try:
+            pandas.Period("2000", freq="A")
+        except ValueError:
+            return "Y"
+    return freq
+
+class PeriodsTestCase(BaseTestCase):
+
+    # nosetests -s -v dlstats.tests.test_periods:PeriodsTestCase
+
+    def setUp(self):
+        BaseTestCase.setUp(self)
+        periods.clear_cache()
+        self.random = random.Random(1234)
+
+    def random_dates(self, count=500):
+        start = date(1800, 1, 1)
+        for i in range(count):
+            yield start + timedelta(days=self.random.randint(0, 365 * 300))
+
+    def assertPandasOrdinal(self, date_str, freq):
+        expected = pandas.Period(date_str, freq=pandas_freq(freq)).ordinal
+        self.assertEqual(periods.get_ordinal(date_str, freq), expected,
+                         "%s - %s" % (date_str, freq))
+
+    def test_get_ordinal(self):
+
+        # nosetests -s -v dlstats.tests.test_periods:PeriodsTestCase.test_get_ordinal
+
+        TEST_VALUES = [
+             ("1970", "A", 0),
+             ("1969", "A", -1),
+             ("1971", "A", 1),
+             ("1970-01-01", "A", 0),
+             ("19700101", "A", 0),
+             ("1970-Q1", "Q", 0),
+             ("1970Q1", "Q", 0),
+             ("1968-Q1", "Q", -8),
+             ("1969-Q4", "Q", -1),
+             ("1970-S1", "S", 0),
+             ("1970S2", "S", 1),
+             ("1969-S2", "S", -1),
+             ("1970-02", "M", 1),
+             ("1970M02", "M", 1),
+             ("2016-01-27", "W-WED", 2404),
+             ("2016-01-27", "W-MON", 2405),
+             ("1970-01-02", "D", 1),
+        ]
+
+        for date_str, freq, result in TEST_VALUES:
+            self.assertEqual(periods.get_ordinal(date_str, freq), result,
+                             "%s - %s" % (date_str, freq))
+
+    def test_get_ordinal_pandas(self):
+
+        # nosetests -s -v dlstats.tests.test_periods:PeriodsTestCase.test_get_ordinal_pandas
+
+        frequencies = ["A", "Q", "M", "D", "W"]
+        frequencies += ["W-%s" % d for d in periods.WEEKDAYS]
+
+        for dt in self.random_dates():
+            formats = [
+                str(dt.year),
+                dt.strftime("%Y-%m"),
+                dt.strftime("%Y-%m-%d"),
+                dt.strftime("%Y%m%d"),
+            ]
+            for date_str in formats:
+                for freq in frequencies:
+                    self.assertPandasOrdinal(date_str, freq)
+
+            quarter = (dt.month - 1) // 3 + 1
+            for date_str in ["%s-Q%s" % (dt.year, quarter), "%sQ%s" % (dt.year, quarter)]:
+                for freq in ["A", "Q", "M"]:
+                    self.assertPandasOrdinal(date_str, freq)
+
+    def test_get_ordinal_fallback(self):
+
+        # nosetests -s -v dlstats.tests.test_periods:PeriodsTestCase.test_get_ordinal_fallback
+
+        '''not arithmetic frequency or format'''
+        self.assertPandasOrdinal("2014-03", "Q-NOV")
+        self.assertPandasOrdinal("2014-3-5", "M")
+
+        with self.assertRaises(ValueError):
+            periods.get_ordinal("2014-13", "M")
+
+    def test_get_ordinals(self):
+
+        # nosetests -s -v dlstats.tests.test_periods:PeriodsTestCase.test_get_ordinals
+
+        date_list = ["1970-Q1", "1970-Q2", "1970-Q1", "1971-Q1"]
+        self.assertEqual(periods.get_ordinals(date_list, "Q"), [0, 1, 0, 4])
+        self.assertEqual(periods.get_ordinals([], "Q"), [])
+
+        info = periods.get_ordinal.cache_info()
+        self.assertEqual(info.misses, 3)
+
+    def test_get_timestamps_pandas(self):
+
+        # nosetests -s -v dlstats.tests.test_periods:PeriodsTestCase.test_get_timestamps_pandas
+
+        frequencies = ["Q", "M", "D", "W"]
+        frequencies += ["W-%s" % d for d in periods.WEEKDAYS]
+
+        for ordinal in [self.random.randint(-3000, 3000) for i in range(300)]:
+            for freq in frequencies:
+                period = pandas.Period(ordinal=ordinal, freq=freq)
+                start_ts, end_ts = periods.get_timestamps(ordinal, freq)
+                self.assertEqual(start_ts, period.start_time.to_pydatetime())
+                self.assertEqual(end_ts, period.end_time.to_pydatetime().replace(microsecond=0))
+
+        self.assertEqual(periods.get_timestamps(46, "A"),
+                         (datetime(2016, 1, 1), datetime(2016, 12, 31)))
+        self.assertEqual(periods.get_timestamps(-1, "S"),
+                         (datetime(1969, 7, 1), datetime(1969, 12, 31, 23, 59, 59)))
+
+    def test_set_timestamps(self):
+
+        # nosetests -s -v dlstats.tests.test_periods:PeriodsTestCase.test_set_timestamps
+
+        series_list = [
+            {"frequency": "Q", "start_date": 0, "end_date": 3},
+            {"frequency": "Q", "start_date": 0, "end_date": 3, 
+             "start_ts": datetime(2000, 1, 1)},
+            {"frequency": "A", "start_date": 0, "end_date": 46},
+        ]
+        self.assertIs(periods.set_timestamps(series_list), series_list)
+
+        self.assertEqual(series_list[0]["start_ts"], datetime(1970, 1, 1))
+        self.assertEqual(series_list[0]["end_ts"], datetime(1970, 12, 31, 23, 59, 59))
+        self.assertEqual(series_list[1]["start_ts"], datetime(2000, 1, 1))
+        self.assertEqual(series_list[1]["end_ts"], datetime(1970, 12, 31, 23, 59, 59))
+        self.assertEqual(series_list[2]["end_ts"], datetime(2016, 12, 31))
+
+        '''import of __all__'''
+        namespace = {}
+        exec("from dlstats.periods import *", namespace)
+        self.assertIn("set_timestamps", namespace)
+
+        bson = periods.set_series_timestamps({"frequency": "M", "start_date": 1, "end_date": 1})
+        self.assertEqual(bson["start_ts"], datetime(1970, 2, 1))
+        self.assertEqual(bson["end_ts"], datetime(1970, 2, 28, 23, 59, 59))
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+
+from slugify import slugify
+
+from dlstats.tests.base import BaseTestCase
+
+from dlstats import slugs
+
+class SlugsTestCase(BaseTestCase):
+
+    # nosetests -s -v dlstats.tests.test_slugs:SlugsTestCase
+
+    def tearDown(self):
+        BaseTestCase.tearDown(self)
+        slugs.configure_slug_cache()
+
+    def test_slug(self):
+
+        # nosetests -s -v dlstats.tests.test_slugs:SlugsTestCase.test_slug
+
+        slugs.configure_slug_cache(maxsize=2)
+
+        for value in ["FREQ", "OBS_STATUS", "Côte d'Ivoire", "A.B"]:
+            self.assertEqual(slugs.slug(value), slugify(value, save_order=True))
+
+        slugs.reset_stats()
+        for value in ["A.B", "A.B", "FREQ", "FREQ"]:
+            slugs.slug(value)
+        self.assertEqual(slugs.slug("x-y-z", cache=False), "x-y-z")
+
+        self.assertEqual(slugs.get_stats(), {"hits": 3, "misses": 1, 
+                                             "size": 2, "maxsize": 2})
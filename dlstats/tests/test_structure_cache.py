@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+
+from dlstats.tests.base import BaseTestCase
+from dlstats.tests.resources import xml_samples
+
+from dlstats import structure_cache
+from dlstats import xml_utils
+
+class StructureCacheTestCase(BaseTestCase):
+
+    # nosetests -s -v dlstats.tests.test_structure_cache:StructureCacheTestCase
+
+    def setUp(self):
+        BaseTestCase.setUp(self)
+        self.cache_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        BaseTestCase.tearDown(self)
+        structure_cache.remove_structure_cache()
+
+    def test_get_set(self):
+
+        # nosetests -s -v dlstats.tests.test_structure_cache:StructureCacheTestCase.test_get_set
+
+        cache = structure_cache.StructureCache(cache_path=self.cache_path, maxsize=2)
+
+        key1 = structure_cache.get_key("ECB", "ECB", "ECB_EXR1", "1.0")
+        self.assertEqual(key1, "ECB:ECB:ECB_EXR1:1.0")
+        key2 = structure_cache.get_key("ECB", "ECB", "ECB_BSI1")
+        self.assertEqual(key2, "ECB:ECB:ECB_BSI1:latest")
+        key3 = structure_cache.get_key("ECB", "ECB", "ECB_ICP1")
+
+        self.assertIsNone(cache.get(key1))
+
+        cache.set(key1, {"codelists": {"CL_FREQ": 1}}, validator="etag:1")
+        cache.set(key2, {"codelists": {"CL_FREQ": 2}})
+        self.assertEqual(cache.get(key1), {"codelists": {"CL_FREQ": 1}})
+        self.assertEqual(cache.get(key1, "etag:1"), {"codelists": {"CL_FREQ": 1}})
+
+        '''LRU: key2 removed from memory - not stored in file without validator'''
+        cache.set(key3, {"codelists": {"CL_FREQ": 3}}, validator="etag:3")
+        self.assertIsNone(cache.get(key2))
+        self.assertEqual(len(os.listdir(self.cache_path)), 2)
+
+        '''new run: file entries with same validator only'''
+        cache = structure_cache.StructureCache(cache_path=self.cache_path)
+        self.assertIsNone(cache.get(key1))
+        self.assertIsNone(cache.get(key1, "etag:2"))
+        self.assertEqual(cache.get(key1, "etag:1"), {"codelists": {"CL_FREQ": 1}})
+        self.assertEqual(cache.get(key1), {"codelists": {"CL_FREQ": 1}})
+        self.assertEqual(cache.stats, {"memory_hits": 1, "file_hits": 1, "misses": 1})
+
+        cache.clear()
+        self.assertIsNone(cache.get(key3, "etag:3"))
+
+    def test_get_validator(self):
+
+        # nosetests -s -v dlstats.tests.test_structure_cache:StructureCacheTestCase.test_get_validator
+
+        filepath = xml_samples.DSD_ECB["filepaths"]["datastructure"]
+
+        self.assertIsNone(structure_cache.get_validator(filepath))
+
+        structure_cache.configure_structure_cache(cache_path=self.cache_path)
+
+        self.assertEqual(structure_cache.get_validator(filepath, {"ETag": '"abc"',
+                                                                  "Last-Modified": "x"}),
+                         'etag:"abc"')
+        self.assertEqual(structure_cache.get_validator(filepath, {"Last-Modified": "x"}),
+                         "last-modified:x")
+        self.assertTrue(structure_cache.get_validator(filepath).startswith("sha256:"))
+
+    def test_load_structure(self):
+
+        # nosetests -s -v dlstats.tests.test_structure_cache:StructureCacheTestCase.test_load_structure
+
+        dsd = xml_samples.DSD_ECB
+        filepath = dsd["filepaths"]["datastructure"]
+        key = structure_cache.get_key("ECB", "ECB", dsd["dsd_id"])
+
+        xml = xml_utils.XMLStructure_2_1(provider_name="ECB")
+        self.assertFalse(structure_cache.load_structure(xml, key))
+
+        structure_cache.configure_structure_cache(cache_path=self.cache_path)
+        validator = structure_cache.get_validator(filepath)
+
+        xml.process(filepath)
+        structure_cache.store_structure(xml, key, validator)
+        expected = xml_utils.dataset_converter(xml, dsd["dataset_code"], dsd_id=dsd["dsd_id"])
+
+        '''next run'''
+        structure_cache.configure_structure_cache(cache_path=self.cache_path)
+        xml_cached = xml_utils.XMLStructure_2_1(provider_name="ECB")
+        self.assertFalse(structure_cache.load_structure(xml_cached, key))
+        self.assertTrue(structure_cache.load_structure(xml_cached, key, validator))
+
+        result = xml_utils.dataset_converter(xml_cached, dsd["dataset_code"], dsd_id=dsd["dsd_id"])
+        self.assertEqual(result, expected)
+        self.assertEqual(xml_cached.get_state(), xml.get_state())
+
+        '''state of cache is not shared with instances'''
+        xml_cached.codelists.clear()
+        xml_cached = xml_utils.XMLStructure_2_1(provider_name="ECB")
+        self.assertTrue(structure_cache.load_structure(xml_cached, key))
+        self.assertEqual(len(xml_cached.codelists), len(xml.codelists))
@@ -1,9 +1,26 @@
 # -*- coding: utf-8 -*-
 
+import os
+import multiprocessing
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+import csv
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+import unittest
+from unittest import mock
+
+import requests
+import httpretty
+
 from dlstats.tests.base import BaseTestCase
 
 from dlstats import utils
 from dlstats import cache
+from dlstats import download_cache
 
 class UtilsTestCase(BaseTestCase):
     
@@ -48,3 +65,375 @@ class UtilsTestCase(BaseTestCase):
         for date_str, freq, result in TEST_VALUES:
             self.assertEquals(utils.get_ordinal_from_period(date_str, freq), result) 
     
+
+class ZipMemberTestCase(BaseTestCase):
+    
+    # nosetests -s -v dlstats.tests.test_utils:ZipMemberTestCase
+    
+    def setUp(self):
+        BaseTestCase.setUp(self)
+        self.store_path = tempfile.mkdtemp()
+        self.zip_filepath = os.path.join(self.store_path, "data.zip")
+        with zipfile.ZipFile(self.zip_filepath, "w", zipfile.ZIP_DEFLATED) as zfile:
+            zfile.writestr("data.csv", "A,B\r\n\u00e9,2\r\n")
+            zfile.writestr("data.xml", b"<root><Obs/></root>")
+        
+    def tearDown(self):
+        BaseTestCase.tearDown(self)
+        shutil.rmtree(self.store_path, ignore_errors=True)
+    
+    def _open_fds(self):
+        return len(os.listdir("/proc/self/fd"))
+
+    def test_zip_namelist(self):
+        
+        # nosetests -s -v dlstats.tests.test_utils:ZipMemberTestCase.test_zip_namelist
+        
+        self.assertEqual(utils.zip_namelist(self.zip_filepath), 
+                         ["data.csv", "data.xml"])
+
+    @unittest.skipUnless(os.path.isdir("/proc/self/fd"), "Skip - no /proc/self/fd")
+    def test_open_zip_member(self):
+        
+        # nosetests -s -v dlstats.tests.test_utils:ZipMemberTestCase.test_open_zip_member
+
+        fds = self._open_fds()
+        
+        '''binary: first member by default'''
+        fileobj = utils.open_zip_member(self.zip_filepath)
+        self.assertEqual(fileobj.read(), b"A,B\r\n\xc3\xa9,2\r\n")
+        fileobj.close()
+        
+        with utils.open_zip_member(self.zip_filepath, "data.xml") as fileobj:
+            self.assertEqual(fileobj.read(), b"<root><Obs/></root>")
+        
+        '''text for csv.reader'''
+        with utils.open_zip_member(self.zip_filepath, "data.csv", encoding="utf-8") as fileobj:
+            self.assertEqual(list(csv.reader(fileobj)), [["A", "B"], ["\u00e9", "2"]])
+        
+        '''zip file is closed with the member'''
+        self.assertEqual(self._open_fds(), fds)
+
+        with self.assertRaises(KeyError):
+            utils.open_zip_member(self.zip_filepath, "other.xml")
+        self.assertEqual(self._open_fds(), fds)
+
+class FlakyRangeHandler(BaseHTTPRequestHandler):
+    """Close connection in middle of first response, accept Range after"""
+    
+    content = b"0123456789" * 10000
+    etag = '"v1"'
+    requests = []
+    
+    def do_GET(self):
+        self.requests.append(dict(self.headers))
+        range_header = self.headers.get("Range")
+        if range_header and (not self.etag or self.headers.get("If-Range") == self.etag):
+            position = int(range_header.split("=")[1].rstrip("-"))
+            body = self.content[position:]
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes %s-%s/%s" % (position, 
+                                                                 len(self.content) - 1,
+                                                                 len(self.content)))
+        else:
+            body = self.content
+            self.send_response(200)
+        if self.etag:
+            self.send_header("ETag", self.etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if len(self.requests) == 1:
+            self.wfile.write(body[:1000])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+class FlakyNoValidatorHandler(FlakyRangeHandler):
+    """Same as FlakyRangeHandler without ETag"""
+    
+    etag = None
+    requests = []
+
+def _store_in_cache(cache_path, name):
+    cache = download_cache.DownloadCache(cache_path=cache_path)
+    filepath = os.path.join(cache_path, "data-%s" % name)
+    for i in range(20):
+        with open(filepath, "w") as fp:
+            fp.write("%s-%s" % (name, i))
+        cache.store("http://localhost/%s/%s" % (name, i), filepath)
+
+class DownloaderTestCase(BaseTestCase):
+    
+    # nosetests -s -v dlstats.tests.test_utils:DownloaderTestCase
+    
+    def setUp(self):
+        BaseTestCase.setUp(self)
+        self.store_path = tempfile.mkdtemp()
+        
+    def tearDown(self):
+        BaseTestCase.tearDown(self)
+        shutil.rmtree(self.store_path, ignore_errors=True)
+    
+    @httpretty.activate
+    def test_download_chunks(self):
+        
+        # nosetests -s -v dlstats.tests.test_utils:DownloaderTestCase.test_download_chunks
+        
+        url = "http://localhost/data.csv"
+        content = "A,B\n" * 100000
+        httpretty.register_uri(httpretty.GET, url, body=content)
+        
+        download = utils.Downloader(url=url, filename="data.csv",
+                                    store_filepath=self.store_path,
+                                    chunk_size=1024)
+        filepath = download.get_filepath()
+        
+        with open(filepath) as fp:
+            self.assertEqual(fp.read(), content)
+        self.assertFalse(os.path.exists(filepath + ".part"))
+
+    @httpretty.activate
+    def test_download_retry(self):
+        
+        # nosetests -s -v dlstats.tests.test_utils:DownloaderTestCase.test_download_retry
+        
+        url = "http://localhost/data.csv"
+        httpretty.register_uri(httpretty.GET, url, 
+                               responses=[
+                                   httpretty.Response(body="error", status=503),
+                                   httpretty.Response(body="error", status=502),
+                                   httpretty.Response(body="A,B"),
+                               ])
+        
+        download = utils.Downloader(url=url, filename="data.csv",
+                                    store_filepath=self.store_path,
+                                    max_retries=2, backoff_factor=0)
+        with mock.patch.object(requests.Response, "close", autospec=True,
+                               side_effect=requests.Response.close) as close:
+            filepath, response = download.get_filepath_and_response()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(httpretty.latest_requests()), 3)
+        '''responses of the retried attempts are closed'''
+        self.assertEqual(close.call_count, 2)
+        with open(filepath) as fp:
+            self.assertEqual(fp.read(), "A,B")
+        
+        '''retries exhausted'''
+        httpretty.reset()
+        httpretty.register_uri(httpretty.GET, url, body="error", status=500)
+        download = utils.Downloader(url=url, filename="data2.csv",
+                                    store_filepath=self.store_path,
+                                    max_retries=1, backoff_factor=0)
+        with self.assertRaises(requests.exceptions.HTTPError):
+            download.get_filepath()
+        self.assertFalse(os.path.exists(download.filepath))
+
+    def test_download_resume(self):
+        
+        # nosetests -s -v dlstats.tests.test_utils:DownloaderTestCase.test_download_resume
+        
+        FlakyRangeHandler.requests = []
+        server = HTTPServer(("127.0.0.1", 0), FlakyRangeHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        url = "http://127.0.0.1:%s/data.zip" % server.server_port
+        download = utils.Downloader(url=url, filename="data.zip",
+                                    store_filepath=self.store_path,
+                                    max_retries=2, backoff_factor=0,
+                                    chunk_size=100,
+                                    client=requests.Session())
+        filepath = download.get_filepath()
+        
+        with open(filepath, "rb") as fp:
+            self.assertEqual(fp.read(), FlakyRangeHandler.content)
+        
+        self.assertEqual(len(FlakyRangeHandler.requests), 2)
+        self.assertEqual(FlakyRangeHandler.requests[1]["Range"], "bytes=1000-")
+        self.assertEqual(FlakyRangeHandler.requests[1]["If-Range"], '"v1"')
+
+    def test_download_resume_without_validator(self):
+        
+        # nosetests -s -v dlstats.tests.test_utils:DownloaderTestCase.test_download_resume_without_validator
+        
+        FlakyNoValidatorHandler.requests = []
+        server = HTTPServer(("127.0.0.1", 0), FlakyNoValidatorHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        url = "http://127.0.0.1:%s/data.zip" % server.server_port
+        download = utils.Downloader(url=url, filename="data.zip",
+                                    store_filepath=self.store_path,
+                                    max_retries=2, backoff_factor=0,
+                                    chunk_size=100,
+                                    client=requests.Session())
+        filepath = download.get_filepath()
+        
+        with open(filepath, "rb") as fp:
+            self.assertEqual(fp.read(), FlakyNoValidatorHandler.content)
+        
+        '''no ETag/Last-Modified: restart from zero'''
+        self.assertEqual(len(FlakyNoValidatorHandler.requests), 2)
+        self.assertNotIn("Range", FlakyNoValidatorHandler.requests[1])
+
+    @httpretty.activate
+    def test_download_cache(self):
+        
+        # nosetests -s -v dlstats.tests.test_utils:DownloaderTestCase.test_download_cache
+        
+        cache_path = os.path.join(self.store_path, "cache")
+        download_cache.configure_download_cache(cache_path=cache_path)
+        self.addCleanup(download_cache.remove_download_cache)
+        
+        url = "http://localhost/data.csv"
+        
+        def get_filepath():
+            download = utils.Downloader(url=url, filename="data.csv",
+                                        store_filepath=self.store_path,
+                                        max_retries=0)
+            return download, download.get_filepath()
+        
+        '''first download: stored in cache'''
+        httpretty.register_uri(httpretty.GET, url, body="A,B",
+                               adding_headers={"ETag": '"v1"'})
+        download, filepath = get_filepath()
+        self.assertTrue(download.is_changed)
+        self.assertIsNone(httpretty.last_request().headers.get("If-None-Match"))
+        
+        '''304: served from cache'''
+        httpretty.reset()
+        httpretty.register_uri(httpretty.GET, url, body="", status=304)
+        first_digest = download.digest
+        download, filepath = get_filepath()
+        self.assertFalse(download.is_changed)
+        self.assertEqual(download.digest, first_digest)
+        self.assertEqual(httpretty.last_request().headers.get("If-None-Match"), '"v1"')
+        with open(filepath) as fp:
+            self.assertEqual(fp.read(), "A,B")
+
+        '''200 with same content'''
+        httpretty.reset()
+        httpretty.register_uri(httpretty.GET, url, body="A,B",
+                               adding_headers={"ETag": '"v2"'})
+        download, filepath = get_filepath()
+        self.assertFalse(download.is_changed)
+
+        '''200 with new content'''
+        httpretty.reset()
+        httpretty.register_uri(httpretty.GET, url, body="A,B,C",
+                               adding_headers={"ETag": '"v3"'})
+        download, filepath = get_filepath()
+        self.assertTrue(download.is_changed)
+        objects = [f for path, dirs, files in os.walk(cache_path + "/objects") for f in files]
+        self.assertEqual(len(objects), 1)
+        
+        entry = download_cache.download_cache.get(url)
+        self.assertEqual(entry["etag"], '"v3"')
+        self.assertEqual(entry["size"], 5)
+        self.assertEqual(entry["digest"], download.digest)
+        self.assertNotEqual(download.digest, first_digest)
+
+    def test_download_cache_evict(self):
+        
+        # nosetests -s -v dlstats.tests.test_utils:DownloaderTestCase.test_download_cache_evict
+
+        cache = download_cache.DownloadCache(cache_path=self.store_path,
+                                             max_size=10, max_age=3600)
+        filepath = os.path.join(self.store_path, "data")
+        for i, content in enumerate(["aaaa", "bbbb", "cccc"]):
+            with open(filepath, "w") as fp:
+                fp.write(content)
+            cache.store("http://localhost/%s" % i, filepath)
+        
+        '''size 12 > 10: the least recently used is removed'''
+        self.assertIsNone(cache.get("http://localhost/0"))
+        self.assertIsNotNone(cache.get("http://localhost/1"))
+        self.assertIsNotNone(cache.get("http://localhost/2"))
+        
+        '''max age'''
+        index = cache._load_index()
+        index["http://localhost/1"]["last_access"] -= 7200
+        cache.evict(index)
+        cache._save_index(index)
+        self.assertIsNone(cache.get("http://localhost/1"))
+        self.assertIsNotNone(cache.get("http://localhost/2"))
+        
+        '''objects not in index (stored by other process) are not removed'''
+        other_path = cache.object_path("ff" + "0" * 62)
+        os.makedirs(os.path.dirname(other_path), exist_ok=True)
+        open(other_path, "w").close()
+        index["http://localhost/2"]["last_access"] -= 7200
+        cache.evict(index)
+        self.assertTrue(os.path.exists(other_path))
+        objects = [f for path, dirs, files in os.walk(cache.objects_path) for f in files]
+        self.assertEqual(objects, [os.path.basename(other_path)])
+
+    def test_download_cache_processes(self):
+        
+        # nosetests -s -v dlstats.tests.test_utils:DownloaderTestCase.test_download_cache_processes
+
+        processes = [multiprocessing.Process(target=_store_in_cache, 
+                                             args=(self.store_path, name))
+                     for name in ["a", "b", "c"]]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+        
+        cache = download_cache.DownloadCache(cache_path=self.store_path)
+        self.assertEqual(len(cache._load_index()), 60)
+
+    def test_iter_downloads(self):
+        
+        # nosetests -s -v dlstats.tests.test_utils:DownloaderTestCase.test_iter_downloads
+        
+        active = {"count": 0, "max": 0}
+        lock = threading.Lock()
+        
+        class SlowDownloader(utils.Downloader):
+            def get_filepath_and_response(self):
+                with lock:
+                    active["count"] += 1
+                    active["max"] = max(active["max"], active["count"])
+                try:
+                    if self.filename == "error":
+                        raise Exception("DOWNLOAD ERROR")
+                    '''last slices are faster'''
+                    time.sleep(0.05 / (int(self.filename) + 1))
+                finally:
+                    with lock:
+                        active["count"] -= 1
+                return self.filepath, self.filename
+
+        def downloads(names):
+            for name in names:
+                url = "http://localhost/%s" % name
+                yield name, SlowDownloader(url=url, filename=name,
+                                           store_filepath=self.store_path)
+        
+        names = [str(i) for i in range(12)]
+        results = list(utils.iter_downloads(downloads(names), workers=6, 
+                                            max_by_host=3))
+        self.assertEqual([r[0] for r in results], names)
+        self.assertEqual([r[2] for r in results], names)
+        self.assertTrue(active["max"] > 1)
+        self.assertTrue(active["max"] <= 3)
+        
+        '''error raised when reached'''
+        names = ["0", "1", "error", "3"]
+        results = []
+        with self.assertRaises(Exception) as err:
+            for key, filepath, response in utils.iter_downloads(downloads(names), 
+                                                                workers=4):
+                results.append(key)
+        self.assertEqual(str(err.exception), "DOWNLOAD ERROR")
+        self.assertEqual(results, ["0", "1"])
@@ -140,11 +140,38 @@ class UtilsTestCase(BaseTestCase):
         self.assertEqual(position, 0)
         self.assertEqual(sorted(dimension_values), [])
 
+    def test_get_nsmap_tag_filter(self):
+
+        # nosetests -s -v dlstats.tests.test_xml_utils:UtilsTestCase.test_get_nsmap_tag_filter
+
+        from io import BytesIO
+        from lxml import etree
+
+        xml = b"""<message:Data xmlns:message="urn:message" xmlns:data="urn:data">
+        <message:Header><message:ID>1</message:ID></message:Header>
+        <data:DataSet><data:Series KEY="1"/><data:Series KEY="2"/></data:DataSet>
+        </message:Data>"""
+
+        tree_iterator = etree.iterparse(BytesIO(xml), events=['end', 'start-ns'],
+                                        tag="{*}Series")
+        pending = []
+        nsmap = xml_utils.get_nsmap(tree_iterator, pending)
+        self.assertEqual(nsmap, {"message": "urn:message", "data": "urn:data"})
+        self.assertEqual(len(pending), 1)
+
+        keys = [element.attrib["KEY"] for event, element in pending + list(tree_iterator)]
+        self.assertEqual(keys, ["1", "2"])
+
+        self.assertTrue(xml_utils.is_localname("{urn:data}Series", "Series"))
+        self.assertTrue(xml_utils.is_localname("Series", "Series"))
+        self.assertFalse(xml_utils.is_localname("{urn:data}DataSeries", "Series"))
+
 class BaseXMLStructureTestCase(BaseTestCase):
     
     XMLStructureKlass = None
     SAMPLES = None
     DEBUG_MODE = False
+    STREAMING = False
 
     def setUp(self):
         super().setUp()
@@ -374,7 +401,8 @@ class BaseXMLStructureTestCase(BaseTestCase):
             
             logger.debug("PROVIDER : %s" % provider_name)
             
-            xml = self.xml_klass(provider_name=provider_name)
+            xml = self.xml_klass(provider_name=provider_name, 
+                                 streaming=self.STREAMING)
 
             if test_name in provider["filepaths"]:
                 filepath = provider["filepaths"][test_name]
@@ -505,6 +533,27 @@ class XMLStructure_2_1_TestCase(BaseXMLStructureTestCase):
         # nosetests -s -v dlstats.tests.test_xml_utils:XMLStructure_2_1_TestCase.test_datastructure
         self._test_datastructure()    
     
+class XMLStructure_2_1_Streaming_TestCase(XMLStructure_2_1_TestCase):
+    
+    # nosetests -s -v dlstats.tests.test_xml_utils:XMLStructure_2_1_Streaming_TestCase
+
+    SAMPLES = {"ECB": xml_samples.DSD_ECB}
+    STREAMING = True
+
+    def test_categoryscheme_nested(self):
+        # nosetests -s -v dlstats.tests.test_xml_utils:XMLStructure_2_1_Streaming_TestCase.test_categoryscheme_nested
+
+        provider = xml_samples.DSD_INSEE
+        filepath = provider["filepaths"]["categoryscheme"]
+
+        xml = self.xml_klass(provider_name="INSEE", streaming=True)
+        xml.process(filepath)
+        self.assert_categoryscheme(xml, provider, "INSEE")
+
+        xml_tree = self.xml_klass(provider_name="INSEE")
+        xml_tree.process(filepath)
+        self.assertEqual(xml.categories, xml_tree.categories)
+
 """
 TODO:
 class XMLStructure_2_1_Dataflow_TestCase(BaseXMLStructureTestCase):
@@ -5,13 +5,21 @@ import time
 import os
 import logging
 import tempfile
-from io import StringIO
+import zipfile
+from io import StringIO, TextIOWrapper
 import traceback
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
 
 import requests
 import arrow
 from bson import ObjectId
 
+from dlstats import download_cache
+from dlstats import periods
+
 logger = logging.getLogger(__name__)
 
 MONGO_DENIED_KEY_CHARS = [".", "$"]
@@ -47,20 +55,41 @@ class Downloader:
         'user-agent': 'dlstats - https://github.com/Widukind/dlstats'
     }
     
+    DEFAULT_CHUNK_SIZE = 512 * 1024
+    
+    RETRY_STATUS_CODES = [500, 502, 503, 504]
+    
     def __init__(self, url=None, filename=None, store_filepath=None, 
-                 timeout=None, max_retries=0, 
+                 timeout=None, max_retries=0, backoff_factor=1.0,
+                 chunk_size=None, resume=True,
                  replace=True, force_replace=True, use_existing_file=False,
-                 headers={}, client=None):
+                 headers={}, client=None, use_cache=True):
+        """
+        :param bool use_cache: Use download cache if configured (see :mod:`dlstats.download_cache`)
+        """
         
         self.url = url
         self.filename = filename
         self.store_filepath = store_filepath
         self.timeout = timeout
         self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.chunk_size = chunk_size or self.DEFAULT_CHUNK_SIZE
+        self.resume = resume
         self.force_replace = force_replace
-        self.headers = headers
+        self.headers = dict(headers)
         self.client = client or requests
         self.use_existing_file = use_existing_file
+        self.use_cache = use_cache
+        
+        # False if content is the same as in download cache (None without cache)
+        self.is_changed = None
+        
+        # sha256 of content with download cache (None without cache)
+        self.digest = None
+        
+        # headers of the last response (ETag, Last-Modified...)
+        self.response_headers = {}
 
         if not self.url:
             raise ValueError("url is required")
@@ -82,45 +111,147 @@ class Downloader:
         if os.path.exists(self.filepath) and not self.use_existing_file and not replace:
             raise Exception("filepath is already exist : %s" % self.filepath)
 
+    def _wait_retry(self, attempt, reason):
+        wait = self.backoff_factor * (2 ** (attempt - 1))
+        msg = "download url[%s] - retry[%s/%s] in %.1f seconds - %s"
+        logger.warning(msg % (self.url, attempt, self.max_retries, wait, reason))
+        time.sleep(wait)
+
     def _download(self, raise_errors=True):
+        """Download url to filepath
+        
+        Content is written by chunks of chunk_size in filepath.part and 
+        renamed at end. 5xx status and connection errors are retried 
+        max_retries times with exponential backoff. A retry resume the 
+        partial file with a Range request (If-Range with ETag or 
+        Last-Modified of first response) - without ETag or Last-Modified
+        in first response, the retry restart from zero.
+        
+        With a download cache, If-None-Match/If-Modified-Since are sent 
+        and a 304 response is served from cache. is_changed is False if 
+        content is not modified and digest is the sha256 of content.
+        """
         
-        #TODO: max_retries (self.max_retries)
         #TODO: analyse rate limit dans headers
         
         start = time.time()
-        try:
-            response = self.client.get(self.url, 
-                                    timeout=self.timeout, 
-                                    stream=True,
-                                    allow_redirects=True,
-                                    verify=False,
-                                    headers=self.headers)
-
-            code = int(response.status_code)
-            
-            if code == 304 or code >= 400:
-                msg = "download url[%s] - status_code[%s] - reason[%s]" % (self.url, 
-                                                                           code, 
-                                                                           response.reason)
-                if raise_errors:
-                    logger.error(msg)
-                    raise response.raise_for_status()
+        partpath = "%s.part" % self.filepath
+        if os.path.exists(partpath):
+            os.remove(partpath)
+        
+        cache = None
+        cache_headers = {}
+        if self.use_cache and download_cache.download_cache:
+            cache = download_cache.download_cache
+            if not "If-Modified-Since" in self.headers \
+                    and not "If-None-Match" in self.headers:
+                cache_headers = cache.conditional_headers(self.url)
+        
+        attempt = 0
+        validator = None
+        while True:
+            headers = dict(self.headers)
+            headers.update(cache_headers)
+            position = 0
+            if os.path.exists(partpath):
+                if self.resume and validator:
+                    position = os.path.getsize(partpath)
+                    if position:
+                        headers["Range"] = "bytes=%s-" % position
+                        headers["If-Range"] = validator
                 else:
-                    logger.warning(msg)
-                    return response
+                    '''without ETag/Last-Modified, content can change between attempts: restart from zero'''
+                    os.remove(partpath)
+            try:
+                response = self.client.get(self.url, 
+                                        timeout=self.timeout, 
+                                        stream=True,
+                                        allow_redirects=True,
+                                        verify=False,
+                                        headers=headers)
+    
+                code = int(response.status_code)
+                self.response_headers = response.headers
+                
+                if code in self.RETRY_STATUS_CODES and attempt < self.max_retries:
+                    response.close()
+                    attempt += 1
+                    self._wait_retry(attempt, "status_code[%s]" % code)
+                    continue
 
-            with open(self.filepath, mode='wb') as f:
-                for chunk in response.iter_content():
-                    f.write(chunk)
+                if code == 416 and position:
+                    '''range not satisfiable: restart from zero'''
+                    response.close()
+                    os.remove(partpath)
+                    validator = None
+                    continue
+                
+                if code == 304 and cache_headers:
+                    self.digest = cache.restore(self.url, self.filepath)
+                    if self.digest:
+                        self.is_changed = False
+                        msg = "download url[%s] - not modified - use download cache"
+                        logger.info(msg % self.url)
+                        return response
+                    '''evicted from cache: full download'''
+                    response.close()
+                    cache_headers = {}
+                    continue
+                
+                if code == 304 or code >= 400:
+                    msg = "download url[%s] - status_code[%s] - reason[%s]" % (self.url, 
+                                                                               code, 
+                                                                               response.reason)
+                    if raise_errors:
+                        logger.error(msg)
+                        raise response.raise_for_status()
+                    else:
+                        logger.warning(msg)
+                        return response
+                
+                if code == 206:
+                    mode = 'ab'
+                else:
+                    mode = 'wb'
+                    position = 0
+                    validator = response.headers.get("ETag") or \
+                        response.headers.get("Last-Modified")
+    
+                with open(partpath, mode=mode) as f:
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        if chunk:
+                            f.write(chunk)
+                
+                break
+            
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout,
+                    requests.exceptions.ChunkedEncodingError) as err:
+                if attempt >= self.max_retries:
+                    logger.critical("download url[%s] - error : %s" % (self.url, str(err)))
+                    raise
+                attempt += 1
+                self._wait_retry(attempt, str(err))
+            
+            except Exception as err:
+                logger.critical("Not captured exception : %s" % str(err))
+                raise
 
-            return response
+        os.replace(partpath, self.filepath)
         
-        except Exception as err:
-            logger.critical("Not captured exception : %s" % str(err))
-            raise
+        if cache:
+            self.digest = download_cache.file_digest(self.filepath)
+            self.is_changed = cache.store(self.url, self.filepath, 
+                                          headers=response.headers,
+                                          digest=self.digest)
 
         end = time.time() - start
-        logger.info("download file[%s] - END - time[%.3f seconds]" % (self.url, end))
+        size = os.path.getsize(self.filepath)
+        msg = "download file[%s] - END - time[%.3f seconds] - size[%s] - speed[%.1f KB/s] - retries[%s]"
+        logger.info(msg % (self.url, end, size, 
+                           size / 1024.0 / max(end, 0.001), attempt))
+        
+        return response
     
     def get_filepath(self):
         
@@ -151,6 +282,137 @@ class Downloader:
         return self.filepath, response
 
 
+def zip_namelist(zip_filepath):
+    with zipfile.ZipFile(zip_filepath) as zfile:
+        return zfile.namelist()
+
+def open_zip_member(zip_filepath, filename=None, encoding=None):
+    """Open a member of a zip file without extraction
+    
+    Content is decompressed on the fly while reading: use it as source
+    of etree.iterparse (binary) or csv.reader (text).
+    
+    The zip file stay open until the member is closed.
+    
+    :param str filename: Member name - first member if None
+    :param str encoding: Return text file object with this encoding
+    
+    >>> fileobj = open_zip_member('/tmp/file1.zip', encoding="utf-8")
+    >>> rows = csv.reader(fileobj)
+    """
+    zfile = zipfile.ZipFile(zip_filepath)
+    try:
+        if filename is None:
+            filename = zfile.namelist()[0]
+        fileobj = zfile.open(filename)
+    finally:
+        zfile.close()
+    
+    if encoding:
+        return TextIOWrapper(fileobj, encoding=encoding, newline="")
+    return fileobj
+
+MAX_DOWNLOADS_BY_HOST = 4
+
+_host_semaphores = {}
+_host_semaphores_lock = threading.Lock()
+
+def _host_semaphore(url, max_by_host):
+    host = urlparse(url).netloc
+    with _host_semaphores_lock:
+        if not host in _host_semaphores:
+            _host_semaphores[host] = threading.BoundedSemaphore(max_by_host)
+        return _host_semaphores[host]
+
+def iter_concurrent(func, items, workers=4, prefetch=None):
+    """Call func(item) in a pool of threads and yield results in order
+    
+    The next prefetch items are processed by workers threads while the 
+    caller use the current result. items is consumed lazily.
+    
+    Errors are raised when the failed item is reached.
+    
+    :return: generator of (item, result)
+    """
+    
+    if workers <= 1:
+        for item in items:
+            yield item, func(item)
+        return
+
+    prefetch = prefetch or workers
+    items = iter(items)
+    pending = deque()
+    
+    def submit():
+        for item in items:
+            pending.append((item, executor.submit(func, item)))
+            return
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for i in range(prefetch + 1):
+            submit()
+        
+        while pending:
+            item, future = pending.popleft()
+            result = future.result()
+            submit()
+            yield item, result
+    finally:
+        for item, future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+def iter_downloads(downloads, workers=4, prefetch=None, 
+                   max_by_host=MAX_DOWNLOADS_BY_HOST):
+    """Download files concurrently and yield results in order
+    
+    The next prefetch downloads run in a pool of workers threads while
+    the caller process the current file. Concurrent requests by host 
+    are limited to max_by_host for all callers in the process.
+    
+    Errors are raised when the failed download is reached.
+    
+    :param downloads: iterable of (key, Downloader)
+    :return: generator of (key, filepath, response)
+    """
+    
+    def get_file(item):
+        key, download = item
+        if workers <= 1:
+            return download.get_filepath_and_response()
+        with _host_semaphore(download.url, max_by_host):
+            return download.get_filepath_and_response()
+
+    for (key, download), (filepath, response) in iter_concurrent(get_file, 
+                                                                 downloads, 
+                                                                 workers=workers, 
+                                                                 prefetch=prefetch):
+        yield key, filepath, response
+
+class RateLimiter:
+    """Limit calls to rate by second for all threads
+    
+    >>> limiter = RateLimiter(rate=10)
+    >>> limiter.wait()
+    """
+    
+    def __init__(self, rate=10):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_time = 0
+        self.lock = threading.Lock()
+        
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.time()
+            wait = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
 def clean_datetime(dt=None,
                    rm_hour=False, 
                    rm_minute=False, 
@@ -341,29 +603,11 @@ def get_ordinal_from_period(date_str, freq=None):
     { "_id" : "W-THU", "count" : 2 }    
     """
     
-    from dlstats.cache import cache
-    from dlstats import constants
-    from pandas import Period
-        
-    if not cache or not freq in constants.CACHE_FREQUENCY:
-        return Period(date_str, freq=freq).ordinal
-    
-    key = "%s.%s" % (date_str, freq)
-    period_from_cache = cache.get(key)
-    if not period_from_cache is None:
-        return period_from_cache
-    
-    period_ordinal = None
-    if freq == "A":
-        year = int(get_year(date_str))
-        period_ordinal = year - 1970
-        return period_ordinal
+    return periods.get_ordinal(date_str, freq)
 
-    if not period_ordinal:
-        period_ordinal = Period(date_str, freq=freq).ordinal
-    cache.set(key, period_ordinal)
-    
-    return period_ordinal
+def get_ordinals_from_periods(date_list, freq=None):
+    """Return ordinals of a list of periods with the same frequency"""
+    return periods.get_ordinals(date_list, freq)
 
 def clean_key(key):
     if not key:
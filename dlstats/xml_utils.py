@@ -2,7 +2,9 @@
 
 import logging
 from collections import OrderedDict
+from copy import deepcopy
 from datetime import datetime
+from itertools import chain
 import re
 
 from lxml import etree
@@ -29,7 +31,13 @@ def xml_get_name(element):
     else:
         return None
 
-def get_nsmap(iterator):
+def get_nsmap(iterator, pending=None):
+    """Read the start-ns events of iterator
+
+    :param list pending: If not None, the first event which is not a
+                         start-ns is appended - use it with a tag filtered
+                         iterparse: this event is an element to process
+    """
     nsmap = {}
     for event, element in iterator:
         if event == 'start-ns':
@@ -37,9 +45,31 @@ def get_nsmap(iterator):
             if len(ns) > 0:
                 nsmap[ns] = url
         else:
+            if pending is not None:
+                pending.append((event, element))
             break
     return nsmap
 
+def release_element(element):
+    """Clear a processed element and delete its preceding siblings of the
+    same tag (already released)
+
+    Other siblings (Name, Description...) are kept: they can be used by
+    the handler of the parent element.
+    """
+    element.clear()
+    parent = element.getparent()
+    if parent is None:
+        return
+    previous = element.getprevious()
+    while previous is not None and previous.tag == element.tag:
+        parent.remove(previous)
+        previous = element.getprevious()
+
+def is_localname(tag, localname):
+    """Same as etree.QName(tag).localname == localname without QName instance"""
+    return tag == localname or tag.endswith('}' + localname)
+
 SPECIAL_DATE_FORMATS = ['P1Y', 'P3M', 'P1M', 'P1D']
 
 def parse_special_date(period, time_format, dataset_code=None):
@@ -257,16 +287,47 @@ class XMLStructureBase:
     TAGS_MAP = {
         'structure': 'structure'
     }
+
+    """Elements processed by process(): (ns, tag, method name)"""
+    PROCESS_TAGS = []
+
+    """Containers released at their end in streaming mode: (ns, tag)"""
+    STREAMING_RELEASE_TAGS = []
+
+    """Attributes saved by get_state() - see dlstats.structure_cache"""
+    STATE_FIELDS = [
+        "agencies",
+        "categories",
+        "categorisations",
+        "categorisations_dataflows",
+        "categorisations_categories",
+        "dataflows",
+        "datastructures",
+        "codelists",
+        "concepts",
+        "dimension_keys_by_dsd",
+        "attribute_keys_by_dsd",
+        "dimensions_by_dsd",
+        "attributes_by_dsd",
+        "last_update",
+    ]
     
     def __init__(self, 
                  provider_name=None,
                  field_time_dimension="TIME_PERIOD",
-                 sdmx_client=None):
+                 sdmx_client=None,
+                 streaming=False):
+        """
+        :param bool streaming: Release the processed elements - only the 
+                               extracted codelists, concepts, dataflows... 
+                               stay in memory
+        """
         
         self.provider_name = provider_name
         self.field_time_dimension = field_time_dimension
 
         self.sdmx_client = sdmx_client
+        self.streaming = streaming
 
         self.nsmap = {}
 
@@ -289,9 +350,71 @@ class XMLStructureBase:
         self.annotations = []
         self.last_update = None        
         
+    @property
+    def nsmap(self):
+        return self._nsmap
+
+    @nsmap.setter
+    def nsmap(self, value):
+        self._nsmap = value
+        self._tags = {}
+
     def fixtag(self, ns, tag):
-        ns = self.TAGS_MAP.get(ns, ns)
-        return '{' + self.nsmap[ns] + '}' + tag
+        key = (ns, tag)
+        if not key in self._tags:
+            ns = self.TAGS_MAP.get(ns, ns)
+            self._tags[key] = '{' + self.nsmap[ns] + '}' + tag
+        return self._tags[key]
+
+    def get_state(self):
+        """Return a copy of the parsed structures (STATE_FIELDS)"""
+        return deepcopy(dict([(field, getattr(self, field)) 
+                              for field in self.STATE_FIELDS]))
+
+    def set_state(self, state):
+        """Merge parsed structures of get_state() in this instance"""
+        for field, value in deepcopy(state).items():
+            if isinstance(value, dict):
+                getattr(self, field).update(value)
+            elif value is not None:
+                setattr(self, field, value)
+
+    def get_iterparse_tags(self):
+        """Tag filter of iterparse for PROCESS_TAGS - any namespace"""
+        tags = [tag for ns, tag, name in self.PROCESS_TAGS]
+        if self.streaming:
+            tags.extend([tag for ns, tag in self.STREAMING_RELEASE_TAGS])
+        return sorted(set(['{*}' + tag for tag in tags]))
+
+    def get_tag_handlers(self):
+        """Return dict of the Clark notation tag to bound method for
+        PROCESS_TAGS - call after loading nsmap"""
+        return dict([(self.fixtag(ns, tag), getattr(self, name)) 
+                     for ns, tag, name in self.PROCESS_TAGS])
+
+    def _iterparse(self, filepath):
+        """Return iterator of tag filtered events and load nsmap"""
+        tree_iterator = etree.iterparse(filepath, events=['end', 'start-ns'],
+                                        tag=self.get_iterparse_tags())
+        pending = []
+        self.nsmap = get_nsmap(tree_iterator, pending)
+        return chain(pending, tree_iterator)
+
+    def process_tags(self, tree_iterator):
+        handlers = self.get_tag_handlers()
+        releases = set()
+        if self.streaming:
+            releases = set([self.fixtag(ns, tag) 
+                            for ns, tag in self.STREAMING_RELEASE_TAGS])
+        for event, element in tree_iterator:
+            if event == 'end':
+                handler = handlers.get(element.tag)
+                if handler:
+                    handler(element)
+                    if self.streaming:
+                        release_element(element)
+                elif element.tag in releases:
+                    release_element(element)
 
     def process_agency(self, element):
         raise NotImplementedError()
@@ -375,6 +498,12 @@ class XMLStructureBase:
 class XMLStructure_1_0(XMLStructureBase):
     """Parsing SDMX 1.0
     """
+
+    PROCESS_TAGS = [
+        ("structure", "CodeList", "process_codelist"),
+        ("structure", "Concept", "process_concept"),
+        ("structure", "KeyFamily", "process_datastructure"),
+    ]
     
     def get_name_element(self, element):
         return element[0].text
@@ -548,19 +677,7 @@ class XMLStructure_1_0(XMLStructureBase):
         element.clear()    
     
     def process(self, filepath):
-        
-        tree_iterator = etree.iterparse(filepath, events=['end', 'start-ns'])
-        
-        self.nsmap = get_nsmap(tree_iterator)
-        
-        for event, element in tree_iterator:
-            if event == 'end':
-                if element.tag == self.fixtag('structure', 'CodeList'):
-                    self.process_codelist(element)
-                elif element.tag == self.fixtag('structure', 'Concept'):
-                    self.process_concept(element)
-                elif element.tag == self.fixtag("structure", "KeyFamily"):
-                    self.process_datastructure(element)
+        self.process_tags(self._iterparse(filepath))
 
 class XMLStructure_2_0(XMLStructure_1_0):
     """Parsing SDMX 2.0
@@ -576,6 +693,12 @@ class XMLStructure_2_0(XMLStructure_1_0):
              'xsi': 'http://www.w3.org/2001/XMLSchema-instance',
              'message': 'http://www.SDMX.org/resources/SDMXML/schemas/v2_0/message'}
 
+    PROCESS_TAGS = [
+        ("structure", "CodeList", "process_codelist"),
+        ("structure", "Concept", "process_concept"),
+        ("structure", "KeyFamily", "process_keyfamily"),
+    ]
+
     def get_name_element(self, element):
         return xml_get_name(element)
 
@@ -590,24 +713,19 @@ class XMLStructure_2_0(XMLStructure_1_0):
 
     def process(self, filepath):
         
-        tree_iterator = etree.iterparse(filepath, events=['end', 'start-ns'])
-
         if not self.NSMAP:
-            self.nsmap = get_nsmap(tree_iterator)
+            tree_iterator = self._iterparse(filepath)
         else:
+            tree_iterator = etree.iterparse(filepath, events=['end'],
+                                            tag=self.get_iterparse_tags())
             self.nsmap = self.NSMAP
 
-        for event, element in tree_iterator:
-            if event == 'end':
-                
-                if element.tag == self.fixtag('structure', 'CodeList'):
-                    self.process_codelist(element)
-                elif element.tag == self.fixtag('structure', 'Concept'):
-                    self.process_concept(element)
-                elif element.tag == self.fixtag("structure", "KeyFamily"):
-                    self.process_datastructure(element)
-                    self.process_last_update(element)
-                    element.clear()
+        self.process_tags(tree_iterator)
+
+    def process_keyfamily(self, element):
+        self.process_datastructure(element)
+        self.process_last_update(element)
+        element.clear()
                     
     def process_last_update(self, element):
         if self.annotations:
@@ -626,6 +744,29 @@ class XMLStructure_2_1(XMLStructure_2_0):
     TAGS_MAP = {
         'structure': 'str'
     }
+
+    PROCESS_TAGS = [
+        ("structure", "Agency", "process_agency"),
+        ("structure", "Category", "process_category"),
+        ("structure", "Categorisation", "process_categorisation"),
+        ("structure", "Dataflow", "process_dataflow"),
+        ("structure", "Codelist", "process_codelist"),
+        ("structure", "Concept", "process_concept"),
+        ("structure", "DataStructure", "process_datastructure"),
+    ]
+
+    """Children of message:Structures - Constraints, HierarchicalCodelists...
+    are not processed"""
+    STREAMING_RELEASE_TAGS = [
+        ("structure", tag) for tag in ["OrganisationSchemes", "Dataflows",
+                                       "Metadataflows", "CategorySchemes",
+                                       "Categorisations", "Codelists",
+                                       "HierarchicalCodelists", "Concepts",
+                                       "MetadataStructures", "DataStructures",
+                                       "StructureSets", "ReportingTaxonomies",
+                                       "Processes", "Constraints",
+                                       "ProvisionAgreements"]
+    ]
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -684,30 +825,31 @@ class XMLStructure_2_1(XMLStructure_2_0):
                 "name": xml_get_name(element),
                 'attrs': dict(element.attrib),
                 "dsd_id": dataflow.attrib.get('id'),
+                "dsd_version": dataflow.attrib.get('version'),
             }
         
         element.clear()
     
     def process_category(self, element):
+        """Sub categories are processed before their parent: the parent id
+        is read from the parent element (start tag already parsed)
+        """
 
         _id = element.attrib.get('id')
+        
+        parent = element.getparent()
+        if parent is not None and parent.tag == element.tag:
+            parent_id = parent.attrib.get('id')
+        else:
+            parent_id = None
 
         if not _id in self.categories:
             self.categories[_id] = {
                 'id': _id,
                 'name': xml_get_name(element),
                 'attrs': dict(element.attrib),
-                'parent': None
-            }
-        for child in element.iterchildren(self.fixtag("str", "Category")):
-            child_id = child.attrib.get('id')
-            self.categories[child_id] = {
-                'id': child_id,
-                'name': xml_get_name(child),
-                'attrs': dict(child.attrib),
-                'parent': _id
+                'parent': parent_id
             }
-            child.clear()
     
     def process_categorisation(self, element):
         _id = element.attrib.get('id')
@@ -863,38 +1005,8 @@ class XMLStructure_2_1(XMLStructure_2_0):
         element.clear()    
         
     def process(self, filepath):
-        
-        tree_iterator = etree.iterparse(filepath, events=['end', 'start-ns'])
-        
-        self.nsmap = get_nsmap(tree_iterator)
-        
-        for event, element in tree_iterator:
-            if event == 'end':
-                
-                #TODO: OrganisationSchemes
-
-                if element.tag == self.fixtag("structure", "Agency"):
-                    self.process_agency(element)
-                
-                elif element.tag == self.fixtag("structure", "Category"):                    
-                    self.process_category(element)
-
-                elif element.tag == self.fixtag("structure", "Categorisation"):
-                    self.process_categorisation(element)
-
-                elif element.tag == self.fixtag("structure", "Dataflow"):
-                    self.process_dataflow(element)
-
-                elif element.tag == self.fixtag("structure", "Codelist"):
-                    self.process_codelist(element)
-
-                elif element.tag == self.fixtag("structure", "Concept"):
-                    self.process_concept(element)
-                    
-                elif element.tag == self.fixtag("structure", "DataStructure"):
-                    self.process_datastructure(element)
-                                
-            #element.clear()
+        #TODO: OrganisationSchemes
+        self.process_tags(self._iterparse(filepath))
 
 def series_converter_v2(bson, xml):
     
@@ -919,6 +1031,10 @@ class XMLDataBase:
     NS_TAG_DATA = None
     PROVIDER_NAME = None
     XMLStructureKlass = None
+
+    """Tag filter of iterparse: other elements are not returned by
+    the iterator"""
+    ITERPARSE_TAG = "{*}Series"
     
     def __init__(self, 
                  provider_name=None,
@@ -975,6 +1091,7 @@ class XMLDataBase:
 
         self.nsmap = {}
         self.tree_iterator = None
+        self.series_tag = None
         
         self._ns_tag_data = ns_tag_data
                 
@@ -985,21 +1102,40 @@ class XMLDataBase:
         else:
             return self.NS_TAG_DATA
         
-    def _get_nsmap(self, tree_iterator):
-        return get_nsmap(tree_iterator)
+    @property
+    def nsmap(self):
+        return self._nsmap
+
+    @nsmap.setter
+    def nsmap(self, value):
+        self._nsmap = value
+        self._tags = {}
+        self.series_tag = None
+
+    def _get_nsmap(self, tree_iterator, pending=None):
+        return get_nsmap(tree_iterator, pending)
         
     def _load_data(self, filepath):
-        self.tree_iterator = etree.iterparse(filepath, events=['end', 'start-ns'])
-        self.nsmap = self._get_nsmap(self.tree_iterator)
+        tree_iterator = etree.iterparse(filepath, 
+                                        events=['end', 'start-ns'],
+                                        tag=self.ITERPARSE_TAG)
+        pending = []
+        self.nsmap = self._get_nsmap(tree_iterator, pending)
+        self.tree_iterator = chain(pending, tree_iterator)
 
     def fixtag(self, ns, tag):
-        if not ns in self.nsmap:
-            msg = "Namespace not found[%s] - tag[%s] - provider[%s] - nsmap[%s]"
-            raise Exception(msg %(ns, tag, self.provider_name, self.nsmap))
-        return '{' + self.nsmap[ns] + '}' + tag
+        key = (ns, tag)
+        if not key in self._tags:
+            if not ns in self.nsmap:
+                msg = "Namespace not found[%s] - tag[%s] - provider[%s] - nsmap[%s]"
+                raise Exception(msg %(ns, tag, self.provider_name, self.nsmap))
+            self._tags[key] = '{' + self.nsmap[ns] + '}' + tag
+        return self._tags[key]
 
     def is_series_tag(self, element):
-        return element.tag == self.fixtag(self.ns_tag_data, 'Series')
+        if self.series_tag is None:
+            self.series_tag = self.fixtag(self.ns_tag_data, 'Series')
+        return element.tag == self.series_tag
 
     def process(self, filepath):
         
@@ -1118,10 +1254,8 @@ class XMLDataMixIn:
 
             item = {"period": None, "value": None, "attributes": {}}
         
-            localname = etree.QName(obs.tag).localname
-                
             #if obs.tag == self.fixtag(self.ns_tag_data, 'Obs'):
-            if localname == "Obs":
+            if is_localname(obs.tag, "Obs"):
                 item["period"] = obs.attrib["TIME_PERIOD"]
                 item["ordinal"] = get_ordinal_from_period(item["period"], freq=frequency)
 
@@ -1175,8 +1309,7 @@ class XMLData_1_0(XMLDataMixIn, XMLDataBase):
     XMLStructureKlass = XMLStructure_1_0
 
     def is_series_tag(self, element):
-        localname = etree.QName(element.tag).localname
-        return localname == 'Series'
+        return is_localname(element.tag, 'Series')
     
 class XMLData_1_0_FED(XMLData_1_0):
     """
@@ -1185,6 +1318,7 @@ class XMLData_1_0_FED(XMLData_1_0):
 
     PROVIDER_NAME = "FED"
     NS_TAG_DATA = "frb"
+    ITERPARSE_TAG = "{*}DataSet"
      
     _frequency_map = {
         "8": "D",
@@ -1212,7 +1346,7 @@ class XMLData_1_0_FED(XMLData_1_0):
         if not self.frequencies_supported:
             self.frequencies_supported = list(self._frequency_map.values())
 
-    def _get_nsmap(self, iterator):
+    def _get_nsmap(self, iterator, pending=None):
         return {'common': 'http://www.SDMX.org/resources/SDMXML/schemas/v1_0/common',
                 'frb': 'http://www.federalreserve.gov/structure/compact/common',
                 'message': 'http://www.SDMX.org/resources/SDMXML/schemas/v1_0/message',
@@ -1300,8 +1434,7 @@ class XMLCompactData_2_0_IMF(XMLCompactData_2_0):
         return "%s.%s" % (self.dataset_code, attributes["SERIESCODE"])
     
     def is_series_tag(self, element):
-        localname = etree.QName(element.tag).localname
-        return localname == 'Series'
+        return is_localname(element.tag, 'Series')
 
     def get_observations(self, series, frequency):
         """
@@ -1316,9 +1449,7 @@ class XMLCompactData_2_0_IMF(XMLCompactData_2_0):
 
             item = {"period": None, "value": None, "attributes": {}}
         
-            localname = etree.QName(obs.tag).localname
-                
-            if localname == "Obs":
+            if is_localname(obs.tag, "Obs"):
                  
                 period = obs.attrib["TIME_PERIOD"]                
                 if frequency == "Q" and len(period.split("-")) == 2:
@@ -1376,7 +1507,7 @@ class XMLGenericData_2_0(XMLDataBase):
         self.field_frequency = "FREQUENCY"                
 
     def is_series_tag(self, element):
-        return etree.QName(element.tag).localname == 'Series'
+        return is_localname(element.tag, 'Series')
     
     def _get_values(self, element):
         """
@@ -1402,17 +1533,17 @@ class XMLGenericData_2_0(XMLDataBase):
             
             for child in element.getchildren():
                 
-                if etree.QName(child.tag).localname == "Time":
+                if is_localname(child.tag, "Time"):
                     item["period"] = child.text
                     #item["period_o"] = item["period"]
                     item["ordinal"] = get_ordinal_from_period(item["period"], freq=frequency)
                 
-                elif etree.QName(child.tag).localname == 'ObsValue':
+                elif is_localname(child.tag, 'ObsValue'):
                     #TODO: valeur manquante
                     item["value"] = child.attrib["value"]
                 
                 #TODO:
-                elif etree.QName(child.tag).localname == 'Attributes':
+                elif is_localname(child.tag, 'Attributes'):
                     """
                     <Attributes><Value concept="OBS_STATUS" value="M"/></Attributes>                    
                     AUS.LCEATT02.ST.Q                
@@ -1666,8 +1797,7 @@ class XMLSpecificData_2_1(XMLDataBase):
     XMLStructureKlass = XMLStructure_2_1
 
     def is_series_tag(self, element):
-        localname = etree.QName(element.tag).localname
-        return localname == 'Series'
+        return is_localname(element.tag, 'Series')
 
     def get_observations(self, series, frequency):
         